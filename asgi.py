@@ -0,0 +1,455 @@
+"""
+Async (ASGI) serving mode.
+
+The URL generation endpoints are served by async handlers: content is extracted
+with the async Tavily client and the generator agents run with agno's arun over
+one shared OpenAI connection pool, so a worker can hold hundreds of upstream
+calls in flight instead of one per thread. Every other route falls through to
+the Flask app, which runs unchanged in a thread pool.
+
+    gunicorn -w 2 -k uvicorn.workers.UvicornWorker asgi:app
+    uvicorn asgi:app --port 5000
+
+The sync deployment (gunicorn main:app) keeps working as before.
+"""
+import copy
+import asyncio
+import contextlib
+from functools import partial
+
+import httpx
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+
+from main import (
+    app as flask_app, ALLOWED_ORIGINS, GENERATION_MODE, GENERATION_MODES, MAP_REDUCE_MODES,
+    MAP_REDUCE_THRESHOLD_TOKENS, MAP_REDUCE_CHUNK_TOKENS, MAP_REDUCE_MAX_WORKERS, MAP_REDUCE_MAX_ROUNDS,
+    FLASHCARDS_GOAL, SUMMARY_GOAL, NOTES_GOAL, quiz_goal,
+    registry, token_budget, response_cache, single_flight,
+    copy_agent, estimate_run_usage, response_token_usage, stream_token_usage, record_run_metrics, token_limit_error, team_run_error,
+    extracted_text, search_text, build_content_task, build_chunk_task, build_reduce_goal, map_chunks,
+    map_wait, reduce_wait, join_sections, truncate_content, generation_payload, parse_structured_output, sse_event, stream_error,
+    is_valid_url, is_fresh, flashcards_cache_key, summary_cache_key, notes_cache_key, quiz_cache_key,
+    build_flashcards, build_summary, build_notes, build_quiz
+)
+from metrics import track
+from streaming_json import JsonArrayStream
+from token_counter import count_tokens
+
+# One connection pool for every async OpenAI call in the process; agno would
+# otherwise open a new client and pool for each model call
+openai_http_client = None
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    global openai_http_client
+    openai_http_client = httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=1000, max_keepalive_connections=100)
+    )
+    yield
+    await openai_http_client.aclose()
+
+def async_agent(agent, **update):
+    """
+    Per-request copy of an agent whose model sends through the shared connection pool.
+    Agents keep per-run state on the instance, so concurrent runs each need their own copy.
+    """
+    model = copy.copy(agent.model)
+    model.http_client = openai_http_client
+    return copy_agent(agent, model=model, **update)
+
+async def abudgeted_run(agent, task, max_wait=None, **kwargs):
+    """
+    budgeted_run() with agno's arun; waiting for budget doesn't block the event loop
+    """
+    tokens, calls = estimate_run_usage(agent, task)
+    reservation = await token_budget.areserve(tokens, calls, max_wait=max_wait)
+    if kwargs.get("stream"):
+        return areconciled_stream(agent, await agent.arun(task, **kwargs), reservation)
+
+    with track(f"run:{agent.name}"):
+        result = await agent.arun(task, **kwargs)
+    await token_budget.areconcile(reservation, response_token_usage(result))
+    record_run_metrics(agent, result)
+    return result
+
+async def areconciled_stream(agent, stream, reservation):
+    """
+    reconciled_stream() for an async stream
+    """
+    run_id, streamed, finished = None, [], False
+    try:
+        async for event in stream:
+            run_id = run_id or getattr(event, "run_id", None)
+            if isinstance(getattr(event, "content", None), str):
+                streamed.append(event.content)
+            yield event
+        finished = True
+    finally:
+        usage = stream_token_usage(agent, run_id, streamed, reservation) if finished else None
+        await token_budget.areconcile(reservation, usage)
+
+async def asafe_run(agent, task, max_tokens=25000, max_wait=None):
+    """
+    safe_team_run() for a single agent, returning (result, error)
+    """
+    try:
+        error = token_limit_error(task, max_tokens)
+        if error:
+            return None, error
+        return await abudgeted_run(async_agent(agent), task, max_wait=max_wait), None
+    except Exception as e:
+        return None, team_run_error(e)
+
+async def aextract_url_content(url):
+    return extracted_text(await registry.extract_toolkit.aextract_results([url]))
+
+async def asearch_query_content(query):
+    return search_text(await registry.search_toolkit.asearch_results(query))
+
+async def acondense_content(url, content):
+    """
+    condense_content() with the map step's agent runs awaited concurrently
+    """
+    limit = asyncio.Semaphore(MAP_REDUCE_MAX_WORKERS)
+
+    async def summarize(index, total, chunk):
+        async with limit:
+            return await asafe_run(
+                registry.chunk_summary_agent, build_chunk_task(url, index, total, chunk), max_wait=map_wait(total)
+            )
+
+    for _ in range(MAP_REDUCE_MAX_ROUNDS):
+        chunks = map_chunks(url, content)
+        outcomes = await asyncio.gather(*(
+            summarize(index, len(chunks), chunk) for index, chunk in enumerate(chunks)
+        ))
+
+        content, error = join_sections(outcomes)
+        if error:
+            return None, error
+
+        if count_tokens(content) <= MAP_REDUCE_THRESHOLD_TOKENS:
+            return content, None
+
+    return truncate_content(content, MAP_REDUCE_THRESHOLD_TOKENS), None
+
+async def arun_url_generation(team_build, agent, agent_goal, url, mode, output_key, default, map_reduce=False):
+    """
+    run_url_generation() followed by generation_payload(), returning (payload, status_code).
+    Team mode, and the team fallback when extraction returns nothing, call the sync
+    team_build in a worker thread since the team's Tavily tools are sync.
+    """
+    if mode in ("pipeline", "mapreduce"):
+        try:
+            content = await aextract_url_content(url)
+        except Exception as e:
+            flask_app.logger.error(f"Direct extraction failed, falling back to team: {str(e)}")
+            content = ""
+
+        if content:
+            max_wait = None
+            if map_reduce and (mode == "mapreduce" or count_tokens(content) > MAP_REDUCE_THRESHOLD_TOKENS):
+                if count_tokens(content) > MAP_REDUCE_CHUNK_TOKENS:
+                    content, error = await acondense_content(url, content)
+                    if error:
+                        return error, 500
+                    agent_goal = build_reduce_goal(agent_goal)
+                    max_wait = reduce_wait()
+            else:
+                content = truncate_content(content)
+            result, error = await asafe_run(agent, build_content_task(url, agent_goal, content), max_wait=max_wait)
+            return generation_payload(result, error, output_key, default)
+
+        flask_app.logger.info(f"No content extracted for {url}, falling back to team")
+
+    return await run_in_threadpool(team_build)
+
+async def abuild_flashcards(url, mode):
+    return await arun_url_generation(
+        partial(build_flashcards, url, "team"), registry.flashcard_agent, FLASHCARDS_GOAL, url, mode, "flashcards", []
+    )
+
+async def abuild_summary(url, mode):
+    return await arun_url_generation(
+        partial(build_summary, url, "team"), registry.summary_agent, SUMMARY_GOAL, url, mode, "summary", "", map_reduce=True
+    )
+
+async def abuild_notes(url, mode):
+    return await arun_url_generation(
+        partial(build_notes, url, "team"), registry.note_agent, NOTES_GOAL, url, mode, "notes", {}, map_reduce=True
+    )
+
+async def abuild_quiz(url, query, num_questions, difficulty, mode):
+    if not url:
+        # Search-query quizzes are generated by the tool-calling team
+        return await run_in_threadpool(build_quiz, url, query, num_questions, difficulty, mode)
+    return await arun_url_generation(
+        partial(build_quiz, url, None, num_questions, difficulty, "team"),
+        registry.quiz_agent, quiz_goal(num_questions, difficulty), url, mode, "quiz", {}
+    )
+
+async def acached_generation(key, fresh, fn, *args):
+    """
+    cached_generation() for coroutine functions; shares the response cache and
+    in-flight coalescing with the sync workers
+    """
+    if not fresh:
+        payload = await asyncio.to_thread(response_cache.get, key)
+        if payload is not None:
+            return payload, 200
+
+    async def generate():
+        payload, status_code = await fn(*args)
+        if status_code == 200:
+            await asyncio.to_thread(response_cache.set, key, payload)
+        return payload, status_code
+
+    return await single_flight.ado(key, generate)
+
+async def astream_agent_content(agent, task, max_wait=None):
+    """
+    stream_agent_content() with agno's arun
+    """
+    agent = async_agent(agent, response_model=None)
+    async for chunk in await abudgeted_run(agent, task, max_wait=max_wait, stream=True):
+        event = getattr(chunk, "event", None)
+        if event in ("RunError", "TeamRunError"):
+            raise Exception(chunk.content or "Streaming run failed")
+        if event in ("RunResponseContent", "TeamRunResponseContent") and isinstance(chunk.content, str) and chunk.content:
+            yield chunk.content
+
+async def astream_url_generation(agent, agent_goal, url, output_key, default, map_reduce=False,
+                                 item_path=None, item_event=None, query=None):
+    """
+    Event generator for streamed generations; emits the same events as stream_url_generation()
+    """
+    try:
+        if url:
+            yield sse_event("status", {"stage": "extracting"})
+            content = await aextract_url_content(url)
+        else:
+            yield sse_event("status", {"stage": "searching"})
+            content = await asearch_query_content(query)
+        if not content:
+            yield sse_event("error", {
+                "status": "error",
+                "message": "No content could be extracted from the URL" if url else "No search results found for the query"
+            })
+            return
+        source = url or query
+
+        max_wait = None
+        if map_reduce and count_tokens(content) > MAP_REDUCE_THRESHOLD_TOKENS:
+            yield sse_event("status", {"stage": "condensing"})
+            content, error = await acondense_content(source, content)
+            if error:
+                yield sse_event("error", error)
+                return
+            agent_goal = build_reduce_goal(agent_goal)
+            max_wait = reduce_wait()
+
+        task = build_content_task(source, agent_goal, truncate_content(content))
+        error = token_limit_error(task)
+        if error:
+            yield sse_event("error", error)
+            return
+
+        yield sse_event("status", {"stage": "generating"})
+        items = JsonArrayStream(item_path) if item_path else None
+        item_index = 0
+        raw_output = ""
+        async for delta in astream_agent_content(agent, task, max_wait=max_wait):
+            raw_output += delta
+            if items is None:
+                yield sse_event("token", {"delta": delta})
+                continue
+            for item in items.feed(delta):
+                yield sse_event(item_event, {"index": item_index, item_event: item})
+                item_index += 1
+
+        response_data = parse_structured_output(raw_output)
+        yield sse_event("result", {
+            "status": "success",
+            "data": {
+                output_key: response_data.get(output_key, default)
+            }
+        })
+
+    except Exception as e:
+        yield sse_event("error", stream_error(e))
+
+def sse_response(generator):
+    return StreamingResponse(
+        generator,
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+def error_response(message, status_code=400):
+    return JSONResponse({"status": "error", "message": message}, status_code=status_code)
+
+def with_cors(handler):
+    """
+    Answer preflight requests and add the CORS headers the Flask app's after_request sets
+    """
+    async def endpoint(request):
+        if request.method == "OPTIONS":
+            response = Response("", status_code=200)
+        else:
+            response = await handler(request)
+        origin = request.headers.get("origin")
+        response.headers["Access-Control-Allow-Origin"] = origin if origin in ALLOWED_ORIGINS else "*"
+        response.headers["Access-Control-Allow-Methods"] = "GET, POST, OPTIONS"
+        response.headers["Access-Control-Allow-Headers"] = "Content-Type, Accept, Authorization"
+        response.headers["Access-Control-Allow-Credentials"] = "true"
+        return response
+    return endpoint
+
+async def read_json(request):
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+def parse_url_request(data, modes=None):
+    """
+    Validate the url (and mode, if modes is given) of a request body.
+    Returns (url, mode, error_response).
+    """
+    if not data:
+        return None, None, error_response("No JSON data provided")
+
+    url = data.get('url')
+    if not url:
+        return None, None, error_response("URL is required")
+
+    if not is_valid_url(url):
+        return None, None, error_response("Invalid URL provided")
+
+    # Normalize URL if needed
+    if not url.startswith(("http://", "https://")):
+        url = "https://" + url
+
+    mode = data.get('mode', GENERATION_MODE)
+    if modes is not None and mode not in modes:
+        return None, None, error_response(f"Mode must be one of: {', '.join(modes)}")
+
+    return url, mode, None
+
+def parse_quiz_request(data, check_mode=True):
+    """
+    Validate a quiz request body.
+    Returns (url, query, num_questions, difficulty, mode, error_response).
+    """
+    if not data:
+        return None, None, None, None, None, error_response("No JSON data provided")
+
+    # Accept either url or query
+    url = data.get('url')
+    query = data.get('query')
+    if not url and not query:
+        return None, None, None, None, None, error_response("Either 'url' or 'query' is required")
+
+    num_questions = data.get('num_questions', 5)
+    difficulty = data.get('difficulty', 'medium')
+
+    if url and not is_valid_url(url):
+        return None, None, None, None, None, error_response("Invalid URL provided")
+
+    if not isinstance(num_questions, int) or num_questions < 1 or num_questions > 20:
+        return None, None, None, None, None, error_response("Number of questions must be between 1 and 20")
+
+    if difficulty not in ['easy', 'medium', 'hard']:
+        return None, None, None, None, None, error_response("Difficulty must be 'easy', 'medium', or 'hard'")
+
+    # Normalize URL if needed
+    if url and not url.startswith(("http://", "https://")):
+        url = "https://" + url
+
+    mode = data.get('mode', GENERATION_MODE)
+    if check_mode and mode not in GENERATION_MODES:
+        return None, None, None, None, None, error_response(f"Mode must be one of: {', '.join(GENERATION_MODES)}")
+
+    return url, query, num_questions, difficulty, mode, None
+
+def cached_endpoint(modes, key_fn, build_fn):
+    """
+    Async handler for a cached url/mode generation endpoint
+    """
+    async def endpoint(request):
+        try:
+            data = await read_json(request)
+            url, mode, error = parse_url_request(data, modes)
+            if error:
+                return error
+            payload, status_code = await acached_generation(
+                key_fn(url, mode), is_fresh(data), build_fn, url, mode
+            )
+            return JSONResponse(payload, status_code=status_code)
+        except Exception as e:
+            flask_app.logger.error(f"General error: {str(e)}")
+            return error_response(str(e), 500)
+    return endpoint
+
+async def generate_quiz(request):
+    try:
+        data = await read_json(request)
+        url, query, num_questions, difficulty, mode, error = parse_quiz_request(data)
+        if error:
+            return error
+        payload, status_code = await acached_generation(
+            quiz_cache_key(url, query, num_questions, difficulty, mode),
+            is_fresh(data), abuild_quiz, url, query, num_questions, difficulty, mode
+        )
+        return JSONResponse(payload, status_code=status_code)
+    except Exception as e:
+        flask_app.logger.error(f"General error: {str(e)}")
+        return error_response(str(e), 500)
+
+def stream_endpoint(agent_name, agent_goal, output_key, default, **options):
+    """
+    Async handler for a streamed url generation endpoint; the agent is looked up in the registry per request
+    """
+    async def endpoint(request):
+        url, _, error = parse_url_request(await read_json(request))
+        if error:
+            return error
+        return sse_response(astream_url_generation(registry.get(agent_name), agent_goal, url, output_key, default, **options))
+    return endpoint
+
+async def generate_quiz_stream(request):
+    url, query, num_questions, difficulty, _, error = parse_quiz_request(await read_json(request), check_mode=False)
+    if error:
+        return error
+    return sse_response(astream_url_generation(
+        registry.quiz_agent, quiz_goal(num_questions, difficulty), url, "quiz", {},
+        item_path=("quiz", "questions"), item_event="question", query=query
+    ))
+
+routes = [
+    Route('/generate-flashcards', with_cors(cached_endpoint(GENERATION_MODES, flashcards_cache_key, abuild_flashcards)), methods=['POST', 'OPTIONS']),
+    Route('/generate-summary', with_cors(cached_endpoint(MAP_REDUCE_MODES, summary_cache_key, abuild_summary)), methods=['POST', 'OPTIONS']),
+    Route('/generate-notes', with_cors(cached_endpoint(MAP_REDUCE_MODES, notes_cache_key, abuild_notes)), methods=['POST', 'OPTIONS']),
+    Route('/generate-quiz', with_cors(generate_quiz), methods=['POST', 'OPTIONS']),
+    Route('/generate-flashcards/stream', with_cors(stream_endpoint(
+        "flashcard_agent", FLASHCARDS_GOAL, "flashcards", [], item_path=("flashcards",), item_event="flashcard"
+    )), methods=['POST', 'OPTIONS']),
+    Route('/generate-summary/stream', with_cors(stream_endpoint(
+        "summary_agent", SUMMARY_GOAL, "summary", "", map_reduce=True
+    )), methods=['POST', 'OPTIONS']),
+    Route('/generate-notes/stream', with_cors(stream_endpoint(
+        "note_agent", NOTES_GOAL, "notes", {}, map_reduce=True
+    )), methods=['POST', 'OPTIONS']),
+    Route('/generate-quiz/stream', with_cors(generate_quiz_stream), methods=['POST', 'OPTIONS']),
+    # Everything else is served by the Flask app
+    Mount('/', app=WSGIMiddleware(flask_app)),
+]
+
+app = Starlette(routes=routes, lifespan=lifespan)
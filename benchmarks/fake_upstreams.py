@@ -0,0 +1,373 @@
+"""
+Local stand-ins for the OpenAI, Tavily and ElevenLabs APIs, for load tests that
+must not spend real quota.
+
+    python benchmarks/fake_upstreams.py --port 8900 --openai-latency lognormal:1.5,0.4
+
+Then point the app at it:
+
+    OPENAI_BASE_URL=http://127.0.0.1:8900/v1
+    TAVILY_API_BASE_URL=http://127.0.0.1:8900/tavily
+    ELEVENLABS_BASE_URL=http://127.0.0.1:8900/elevenlabs
+
+Latencies and payload sizes are distributions, written as "fixed:X",
+"uniform:LOW,HIGH", "normal:MEAN,STDDEV" or "lognormal:MEDIAN,SIGMA".
+Chat completions are generated from the JSON schema sent as response_format,
+so structured-output agents get schema-valid answers. Plain-text requests get
+one document that carries every key the endpoints look for.
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import schemas
+
+WORDS = (
+    "photosynthesis energy light plants chlorophyll glucose carbon dioxide oxygen water cell "
+    "membrane process reaction molecule enzyme structure function system example result"
+).split()
+
+
+class Distribution:
+    """
+    A latency or size distribution parsed from "kind:arg1,arg2"
+    """
+
+    def __init__(self, spec):
+        self.spec = spec
+        kind, _, args = spec.partition(":")
+        self.kind = kind
+        self.args = [float(arg) for arg in args.split(",") if arg]
+        if kind not in ("fixed", "uniform", "normal", "lognormal"):
+            raise ValueError(f"Unknown distribution: {spec}")
+
+    def sample(self):
+        if self.kind == "fixed":
+            value = self.args[0]
+        elif self.kind == "uniform":
+            value = random.uniform(self.args[0], self.args[1])
+        elif self.kind == "normal":
+            value = random.gauss(self.args[0], self.args[1])
+        else:
+            value = random.lognormvariate(math.log(self.args[0]), self.args[1])
+        return max(0.0, value)
+
+    def __repr__(self):
+        return self.spec
+
+
+def words(count):
+    return " ".join(random.choice(WORDS) for _ in range(max(1, int(count))))
+
+
+def sample_from_schema(schema, defs, text_words, array_items):
+    """
+    Build a value that satisfies a (strict) JSON schema
+    """
+    if "$ref" in schema:
+        return sample_from_schema(defs[schema["$ref"].split("/")[-1]], defs, text_words, array_items)
+    if "anyOf" in schema:
+        return sample_from_schema(schema["anyOf"][0], defs, text_words, array_items)
+
+    kind = schema.get("type")
+    if kind == "object":
+        return {
+            name: sample_from_schema(prop, defs, text_words, array_items)
+            for name, prop in schema.get("properties", {}).items()
+        }
+    if kind == "array":
+        return [sample_from_schema(schema["items"], defs, text_words, array_items) for _ in range(array_items)]
+    if kind == "integer":
+        return 1
+    if kind == "number":
+        return 1.0
+    if kind == "boolean":
+        return True
+    return words(text_words)
+
+
+def universal_document(text_words, array_items):
+    """
+    One JSON document with the top-level keys of every response model
+    """
+    document = {}
+    for model in (
+        schemas.FlashcardsOutput, schemas.SummaryOutput, schemas.NotesOutput, schemas.QuizOutput,
+        schemas.AudiobookScriptOutput, schemas.StoryboardsOutput, schemas.BrainstormOutput
+    ):
+        schema = model.model_json_schema()
+        document.update(sample_from_schema(schema, schema.get("$defs", {}), text_words, array_items))
+    return document
+
+
+class FakeUpstreams:
+    """
+    Configuration and counters shared by the request handlers
+    """
+
+    def __init__(self, args):
+        self.openai_latency = Distribution(args.openai_latency)
+        self.openai_words = Distribution(args.openai_words)
+        self.openai_items = args.openai_items
+        self.stream_chunk_delay = args.stream_chunk_delay
+        self.image_latency = Distribution(args.image_latency)
+        self.image_bytes = Distribution(args.image_bytes)
+        self.tavily_latency = Distribution(args.tavily_latency)
+        self.tavily_bytes = Distribution(args.tavily_bytes)
+        self.tts_latency = Distribution(args.tts_latency)
+        self.tts_bytes_per_char = args.tts_bytes_per_char
+        self.requests = {}
+        self.lock = threading.Lock()
+
+    def count(self, name):
+        with self.lock:
+            self.requests[name] = self.requests.get(name, 0) + 1
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    upstreams = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path.startswith("/files/"):
+            self.upstreams.count("image_download")
+            self.send_bytes(os.urandom(int(self.upstreams.image_bytes.sample())), "image/png")
+        elif path.startswith("/elevenlabs/v1/history"):
+            self.upstreams.count("elevenlabs_history")
+            self.send_json({"history": [], "has_more": False, "last_history_item_id": None})
+        elif path == "/stats":
+            self.send_json(self.upstreams.requests)
+        else:
+            self.send_json({"error": f"Unknown path {path}"}, 404)
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+
+        if path == "/v1/chat/completions":
+            self.chat_completion(body)
+        elif path == "/v1/images/generations":
+            self.upstreams.count("openai_images")
+            time.sleep(self.upstreams.image_latency.sample())
+            host = self.headers.get("Host")
+            self.send_json({
+                "created": int(time.time()),
+                "data": [{"url": f"http://{host}/files/image_{random.getrandbits(64):x}.png", "revised_prompt": body.get("prompt")}]
+            })
+        elif path.startswith("/tavily/"):
+            self.tavily(path.rsplit("/", 1)[-1], body)
+        elif path.startswith("/elevenlabs/v1/text-to-speech/"):
+            self.text_to_speech(body, stream=path.endswith("/stream"))
+        else:
+            self.send_json({"error": f"Unknown path {path}"}, 404)
+
+    def chat_completion(self, body):
+        upstreams = self.upstreams
+        upstreams.count("openai_chat")
+        text_words = upstreams.openai_words.sample()
+        response_format = body.get("response_format") or {}
+        if response_format.get("type") == "json_schema":
+            schema = response_format["json_schema"]["schema"]
+            content = json.dumps(sample_from_schema(schema, schema.get("$defs", {}), text_words, upstreams.openai_items))
+        else:
+            content = json.dumps(universal_document(text_words, upstreams.openai_items))
+
+        prompt_tokens = sum(len(str(message.get("content", ""))) for message in body.get("messages", [])) // 4
+        completion_tokens = len(content) // 4
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+        latency = upstreams.openai_latency.sample()
+
+        if not body.get("stream"):
+            time.sleep(latency)
+            self.send_json({
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "gpt-4o"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content, "refusal": None},
+                    "finish_reason": "stop",
+                    "logprobs": None
+                }],
+                "usage": usage
+            })
+            return
+
+        # Streamed: the sampled latency is time to first token, then small deltas
+        def chunk(delta, finish_reason=None):
+            return {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "gpt-4o"),
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            }
+
+        def events():
+            time.sleep(latency)
+            yield chunk({"role": "assistant", "content": ""})
+            for i in range(0, len(content), 16):
+                time.sleep(upstreams.stream_chunk_delay)
+                yield chunk({"content": content[i:i + 16]})
+            yield chunk({}, "stop")
+            if (body.get("stream_options") or {}).get("include_usage"):
+                yield {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "choices": [], "usage": usage}
+
+        self.send_chunked(
+            (f"data: {json.dumps(event)}\n\n".encode() for event in events()),
+            "text/event-stream",
+            trailer=b"data: [DONE]\n\n"
+        )
+
+    def tavily(self, operation, body):
+        upstreams = self.upstreams
+        upstreams.count(f"tavily_{operation}")
+        time.sleep(upstreams.tavily_latency.sample())
+
+        def page(url):
+            return {"url": url, "raw_content": words(upstreams.tavily_bytes.sample() / 8)}
+
+        if operation == "extract":
+            urls = body.get("urls") or []
+            urls = urls if isinstance(urls, list) else [urls]
+            self.send_json({"results": [page(url) for url in urls], "failed_results": [], "response_time": 0.1})
+        elif operation == "search":
+            self.send_json({
+                "query": body.get("query"),
+                "answer": words(40),
+                "results": [dict(page("https://bench.example/search"), title="Result", content=words(60), score=0.9)],
+                "response_time": 0.1
+            })
+        elif operation == "crawl":
+            base_url = body.get("url")
+            limit = min(int(body.get("limit") or 10), 10)
+            self.send_json({
+                "base_url": base_url,
+                "results": [page(f"{base_url}/page-{i}") for i in range(limit)],
+                "response_time": 0.1
+            })
+        elif operation == "map":
+            base_url = body.get("url")
+            self.send_json({
+                "base_url": base_url,
+                "results": [f"{base_url}/page-{i}" for i in range(50)],
+                "response_time": 0.1
+            })
+        else:
+            self.send_json({"error": f"Unknown Tavily operation {operation}"}, 404)
+
+    def text_to_speech(self, body, stream):
+        upstreams = self.upstreams
+        upstreams.count("elevenlabs_stream" if stream else "elevenlabs_convert")
+        total = max(1024, int(len(body.get("text", "")) * upstreams.tts_bytes_per_char))
+        time.sleep(upstreams.tts_latency.sample())
+
+        def chunks():
+            sent = 0
+            while sent < total:
+                size = min(16 * 1024, total - sent)
+                sent += size
+                yield os.urandom(size)
+
+        self.send_chunked(chunks(), "audio/mpeg", headers={"history-item-id": f"{random.getrandbits(64):x}"})
+
+    def send_json(self, payload, status=200):
+        self.send_bytes(json.dumps(payload).encode(), "application/json", status)
+
+    def send_bytes(self, data, content_type, status=200):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_chunked(self, chunks, content_type, trailer=None, headers=None):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        for data in chunks:
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+        if trailer:
+            self.wfile.write(f"{len(trailer):x}\r\n".encode() + trailer + b"\r\n")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+def add_arguments(parser):
+    parser.add_argument("--openai-latency", default="lognormal:1.0,0.4", help="Chat completion latency / time to first token (s)")
+    parser.add_argument("--openai-words", default="uniform:20,60", help="Words per generated text field")
+    parser.add_argument("--openai-items", type=int, default=5, help="Items per generated array")
+    parser.add_argument("--stream-chunk-delay", type=float, default=0.005, help="Delay between streamed deltas (s)")
+    parser.add_argument("--image-latency", default="lognormal:8,0.3", help="DALL-E generation latency (s)")
+    parser.add_argument("--image-bytes", default="uniform:800000,2000000", help="Generated image size (bytes)")
+    parser.add_argument("--tavily-latency", default="lognormal:0.8,0.5", help="Tavily call latency (s)")
+    parser.add_argument("--tavily-bytes", default="lognormal:20000,0.8", help="Extracted page size (bytes)")
+    parser.add_argument("--tts-latency", default="lognormal:0.6,0.3", help="ElevenLabs time to first byte (s)")
+    parser.add_argument("--tts-bytes-per-char", type=float, default=1000, help="Audio bytes per input character")
+
+
+def start_server(args, host="127.0.0.1", port=0):
+    """
+    Start the fake upstreams on a background thread and return the server
+    """
+    handler = type("BoundHandler", (Handler,), {"upstreams": FakeUpstreams(args)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def upstream_env(server):
+    """
+    Environment variables that point the app at a running fake server
+    """
+    base = f"http://{server.server_address[0]}:{server.server_address[1]}"
+    return {
+        "OPENAI_BASE_URL": f"{base}/v1",
+        "TAVILY_API_BASE_URL": f"{base}/tavily",
+        "ELEVENLABS_BASE_URL": f"{base}/elevenlabs",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    server = start_server(args, args.host, args.port)
+    for name, value in upstream_env(server).items():
+        print(f"{name}={value}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Check that importing the app stays within a startup time budget.
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --module asgi --budget 1.5 --runs 7
+
+Imports the module in fresh interpreters without any API keys set, reports the
+median import time and which heavy SDKs got imported along the way, and exits
+with status 1 when the median is over budget or an SDK was imported eagerly.
+Agents, teams and API clients are meant to be built on first use (registry.py).
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that should only be imported once a request needs them
+LAZY_MODULES = ["agno", "openai", "tavily", "elevenlabs", "PIL"]
+
+PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {lazy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module, workdir):
+    env = {
+        key: value for key, value in os.environ.items()
+        if not key.endswith("_API_KEY")
+    }
+    env["PYTHONPATH"] = REPO_DIR
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE.format(module=module, lazy=LAZY_MODULES)],
+        cwd=workdir, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main", help="Module to import (main or asgi)")
+    parser.add_argument("--budget", type=float, default=1.0, help="Maximum median import time in seconds")
+    parser.add_argument("--runs", type=int, default=5, help="Number of fresh interpreters to time")
+    parser.add_argument("--workdir", default=REPO_DIR, help="Working directory (caches are created relative to it)")
+    args = parser.parse_args()
+
+    results = [measure(args.module, args.workdir) for _ in range(args.runs)]
+    median = statistics.median(result["seconds"] for result in results)
+    loaded = sorted(set(name for result in results for name in result["loaded"]))
+
+    print(f"import {args.module}: median {median * 1000:.0f} ms over {args.runs} runs (budget {args.budget * 1000:.0f} ms)")
+    if loaded:
+        print(f"eagerly imported: {', '.join(loaded)}")
+
+    if median > args.budget or loaded:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Load-test the Flask app against local stand-ins for OpenAI, Tavily and ElevenLabs.
+
+    python benchmarks/run_benchmarks.py --clients 16 --requests 100
+    python benchmarks/run_benchmarks.py --endpoints flashcards,quiz --openai-latency fixed:0.5 --json baseline.json
+
+By default the app is imported and served in-process on a threaded WSGI server
+(or with uvicorn and asgi.py with --asgi), with caches, job store and outputs in
+a temporary directory. Use --target to drive a server started separately
+(e.g. gunicorn with the environment printed by fake_upstreams.py).
+
+Every request uses a new URL/topic unless --repeat is given, so the numbers
+measure the full pipeline rather than the response cache.
+Reports throughput and p50/p95/p99 latency per endpoint.
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCHMARKS_DIR)
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+
+import fake_upstreams
+
+
+def url_for(i):
+    return f"https://bench.example/articles/{i}"
+
+
+# name: (path, request body for request number i, streamed response)
+SCENARIOS = {
+    "flashcards": ("/generate-flashcards", lambda i: {"url": url_for(i)}, False),
+    "summary": ("/generate-summary", lambda i: {"url": url_for(i)}, False),
+    "notes": ("/generate-notes", lambda i: {"url": url_for(i)}, False),
+    "quiz": ("/generate-quiz", lambda i: {"url": url_for(i), "num_questions": 5, "difficulty": "medium"}, False),
+    "quiz-search": ("/generate-quiz", lambda i: {"query": f"benchmark topic {i}", "num_questions": 5}, False),
+    "summary-team": ("/generate-summary", lambda i: {"url": url_for(i), "mode": "team"}, False),
+    "summary-stream": ("/generate-summary/stream", lambda i: {"url": url_for(i)}, True),
+    "flashcards-stream": ("/generate-flashcards/stream", lambda i: {"url": url_for(i)}, True),
+    "quiz-stream": ("/generate-quiz/stream", lambda i: {"url": url_for(i), "num_questions": 5}, True),
+    "study-pack": ("/generate-study-pack", lambda i: {"url": url_for(i)}, False),
+    "image": ("/generate-image", lambda i: {"prompt": f"A diagram of topic {i}"}, False),
+    "storyboards": ("/generate-storyboards", lambda i: {"description": f"Topic {i}", "number_of_boards": 3, "skip_images": True}, False),
+    "audiobook": ("/audiobook-to-audio", lambda i: {"topic": f"Topic {i}", "duration": 30}, False),
+    "tts-stream": ("/text-to-audio/stream", lambda i: {"text": f"Benchmark sentence number {i}. " * 20}, True),
+}
+
+DEFAULT_ENDPOINTS = "flashcards,summary,notes,quiz,quiz-search,summary-stream,flashcards-stream,tts-stream"
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def run_scenario(base_url, name, count, clients, offset, repeat):
+    path, body_for, streamed = SCENARIOS[name]
+    local = threading.local()
+    latencies = []
+    first_bytes = []
+    errors = {}
+    lock = threading.Lock()
+
+    def one(i):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        body = body_for(0 if repeat else offset + i)
+        start = time.perf_counter()
+        first_byte = None
+        try:
+            with session.post(base_url + path, json=body, stream=streamed, timeout=600) as response:
+                if streamed:
+                    for _ in response.iter_content(chunk_size=None):
+                        if first_byte is None:
+                            first_byte = time.perf_counter() - start
+                else:
+                    response.content
+                status = response.status_code
+        except requests.RequestException as e:
+            status = type(e).__name__
+        elapsed = time.perf_counter() - start
+
+        with lock:
+            latencies.append(elapsed)
+            if first_byte is not None:
+                first_bytes.append(first_byte)
+            if status != 200:
+                errors[str(status)] = errors.get(str(status), 0) + 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        list(executor.map(one, range(count)))
+    wall = time.perf_counter() - start
+
+    result = {
+        "endpoint": name,
+        "requests": count,
+        "clients": clients,
+        "errors": errors,
+        "throughput_rps": count / wall if wall else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+    if first_bytes:
+        result["first_byte_p50_ms"] = percentile(first_bytes, 0.50) * 1000
+    return result
+
+
+def start_app(server, workdir, asgi=False):
+    """
+    Import main with the fake upstreams and temporary state, and serve it on a
+    threaded WSGI server, or with uvicorn when asgi is set
+    """
+    os.environ.update(fake_upstreams.upstream_env(server))
+    os.environ.setdefault("TAVILY_API_KEY", "bench")
+    os.environ.setdefault("OPENAI_API_KEY", "bench")
+    os.environ.setdefault("ELEVENLABS_API_KEY", "bench")
+    os.environ.setdefault("OPENAI_TPM_LIMIT", "100000000")
+    os.environ.setdefault("OPENAI_RPM_LIMIT", "1000000")
+    for name, filename in (
+        ("CONTENT_CACHE_PATH", "content_cache.sqlite3"),
+        ("RESPONSE_CACHE_PATH", "response_cache.sqlite3"),
+        ("JOB_STORE_PATH", "jobs.sqlite3"),
+        ("RATE_BUDGET_PATH", "rate_budget.sqlite3"),
+        ("SINGLE_FLIGHT_PATH", "singleflight.sqlite3"),
+        ("AUDIO_CACHE_INDEX_PATH", "audio_index.sqlite3"),
+    ):
+        os.environ.setdefault(name, os.path.join(workdir, "cache", filename))
+    os.chdir(workdir)
+
+    if asgi:
+        import socket
+        import uvicorn
+        import asgi as asgi_app
+
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        uvicorn_server = uvicorn.Server(uvicorn.Config(asgi_app.app, host="127.0.0.1", port=port, log_level="warning"))
+        threading.Thread(target=uvicorn_server.run, daemon=True).start()
+        while not uvicorn_server.started:
+            time.sleep(0.05)
+        return f"http://127.0.0.1:{port}"
+
+    from werkzeug.serving import make_server
+    import main
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    app_server = make_server("127.0.0.1", 0, main.app, threaded=True)
+    threading.Thread(target=app_server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{app_server.server_port}"
+
+
+def print_report(results):
+    header = f"{'endpoint':<20}{'reqs':>6}{'err':>6}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ttfb p50':>10}"
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        print(
+            f"{result['endpoint']:<20}{result['requests']:>6}{sum(result['errors'].values()):>6}"
+            f"{result['throughput_rps']:>9.2f}{result['p50_ms']:>10.0f}{result['p95_ms']:>10.0f}{result['p99_ms']:>10.0f}"
+            f"{result.get('first_byte_p50_ms', 0):>10.0f}"
+        )
+        if result["errors"]:
+            print(f"{'':<20}errors: {result['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", default=DEFAULT_ENDPOINTS, help=f"Comma-separated, from: {', '.join(SCENARIOS)}")
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent clients per endpoint")
+    parser.add_argument("--requests", type=int, default=40, help="Requests per endpoint")
+    parser.add_argument("--repeat", action="store_true", help="Send identical requests (measures cache and coalescing)")
+    parser.add_argument("--target", help="Base URL of an already running app; skips the in-process server")
+    parser.add_argument("--asgi", action="store_true", help="Serve the in-process app through asgi.py with uvicorn")
+    parser.add_argument("--fake-port", type=int, default=0, help="Port for the fake upstreams (0 picks a free one)")
+    parser.add_argument("--json", help="Write results to this file")
+    fake_upstreams.add_arguments(parser)
+    args = parser.parse_args()
+
+    endpoints = [name.strip() for name in args.endpoints.split(",") if name.strip()]
+    unknown = [name for name in endpoints if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"Unknown endpoints: {', '.join(unknown)}")
+
+    json_path = os.path.abspath(args.json) if args.json else None
+
+    upstream_server = fake_upstreams.start_server(args, port=args.fake_port)
+    if args.target:
+        base_url = args.target.rstrip("/")
+        print("Fake upstreams:", ", ".join(f"{k}={v}" for k, v in fake_upstreams.upstream_env(upstream_server).items()))
+    else:
+        base_url = start_app(upstream_server, tempfile.mkdtemp(prefix="bench-"), asgi=args.asgi)
+
+    results = []
+    offset = int(time.time())
+    for name in endpoints:
+        results.append(run_scenario(base_url, name, args.requests, args.clients, offset, args.repeat))
+        offset += args.requests
+
+    print_report(results)
+    print(f"\nupstream calls: {json.dumps(upstream_server.RequestHandlerClass.upstreams.requests)}")
+
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Micro-benchmark for token_counter against the old len(text) // 4 estimate.
+
+    python benchmarks/token_counter_bench.py
+
+Reports per-call latency for short prompts, a typical extracted page and a
+large crawl, plus how far the heuristic is from the real token count.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from token_counter import count_tokens, within_token_limit, truncate_to_tokens, get_encoding
+
+SAMPLES = {
+    "short_prompt": "Generate a quiz with 5 questions at medium difficulty about photosynthesis.",
+    "article_page": (
+        "Photosynthesis is the process by which green plants convert light energy into chemical energy. "
+        "See https://en.wikipedia.org/wiki/Photosynthesis?oldid=12345#Overview for details. "
+    ) * 200,
+    "code_page": "def handler(event, context):\n    return {'statusCode': 200, 'body': json.dumps(event)}\n" * 300,
+    "non_english_page": "光合作用是植物利用光能将二氧化碳和水转化为有机物的过程。" * 400,
+    "large_crawl": ("# Heading\n\nSome documentation paragraph with `inline_code()` and a link. " * 4000),
+}
+
+
+def time_call(fn, text, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(text)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    start = time.perf_counter()
+    get_encoding()
+    print(f"encoder load: {(time.perf_counter() - start) * 1000:.1f} ms (once per process)\n")
+
+    print(f"{'sample':<18}{'chars':>9}{'tokens':>9}{'len//4':>9}{'count us':>11}{'limit us':>11}{'trunc us':>11}")
+    for name, text in SAMPLES.items():
+        repeat = 2000 if len(text) < 1000 else 20
+        tokens = count_tokens(text)
+        print(
+            f"{name:<18}{len(text):>9}{tokens:>9}{len(text) // 4:>9}"
+            f"{time_call(count_tokens, text, repeat):>11.1f}"
+            f"{time_call(lambda t: within_token_limit(t, 25000), text, repeat):>11.1f}"
+            f"{time_call(lambda t: truncate_to_tokens(t, 20000), text, repeat):>11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+from contextlib import contextmanager
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from metrics import record_cache
+
+
+def normalize_url(url):
+    """
+    Normalize a URL so equivalent spellings share one cache entry
+    (scheme/host case, default ports, fragments, query order, trailing slash)
+    """
+    url = url.strip()
+    if not url.lower().startswith(("http://", "https://")):
+        url = "https://" + url
+
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    port = parts.port
+    if port and not ((scheme == "http" and port == 80) or (scheme == "https" and port == 443)):
+        host = f"{host}:{port}"
+
+    path = parts.path or "/"
+    if len(path) > 1 and path.endswith("/"):
+        path = path.rstrip("/")
+
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+def make_cache_key(*parts):
+    """
+    Build a stable cache key from arbitrary JSON-serializable parts
+    """
+    raw = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ContentCache:
+    """
+    SQLite-backed key/value cache with TTL expiry and size-bounded LRU eviction.
+    The database file is shared, so every gunicorn worker sees the same entries.
+    Usage:
+        cache = ContentCache("cache/content_cache.sqlite3", ttl=3600, max_entries=500)
+        cache.set(make_cache_key("extract", url), {"url": url, "raw_content": "..."})
+        cache.get(make_cache_key("extract", url))  # {'url': ..., 'raw_content': '...'} or None
+    """
+
+    def __init__(self, path="cache/content_cache.sqlite3", ttl=3600, max_entries=500, max_bytes=200 * 1024 * 1024,
+                 name="content"):
+        self.path = path
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_accessed ON cache_entries (accessed_at)")
+
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per operation keeps this safe across threads and processes
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key):
+        """
+        Return the cached value for key, or None if missing or expired
+        """
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value, created_at FROM cache_entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                record_cache(self.name, False)
+                return None
+
+            value, created_at = row
+            if self.ttl and now - created_at > self.ttl:
+                conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+                record_cache(self.name, False)
+                return None
+
+            conn.execute("UPDATE cache_entries SET accessed_at = ? WHERE key = ?", (now, key))
+        record_cache(self.name, True)
+        return json.loads(value)
+
+    def set(self, key, value):
+        """
+        Store a JSON-serializable value under key and evict old entries if over budget
+        """
+        payload = json.dumps(value)
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, payload, len(payload), now, now),
+            )
+            self._evict(conn, now)
+
+    def delete(self, key):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM cache_entries")
+
+    def stats(self):
+        """
+        Return entry count and total stored size
+        """
+        with self._connect() as conn:
+            count, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries"
+            ).fetchone()
+        return {"entries": count, "bytes": size}
+
+    def _evict(self, conn, now):
+        if self.ttl:
+            conn.execute("DELETE FROM cache_entries WHERE created_at < ?", (now - self.ttl,))
+
+        count, size = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries"
+        ).fetchone()
+        if count <= self.max_entries and size <= self.max_bytes:
+            return
+
+        # Drop least recently used entries until both limits are satisfied
+        rows = conn.execute("SELECT key, size FROM cache_entries ORDER BY accessed_at ASC").fetchall()
+        stale_keys = []
+        for key, entry_size in rows:
+            if count <= self.max_entries and size <= self.max_bytes:
+                break
+            stale_keys.append((key,))
+            count -= 1
+            size -= entry_size
+        conn.executemany("DELETE FROM cache_entries WHERE key = ?", stale_keys)
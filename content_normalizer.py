@@ -0,0 +1,177 @@
+import re
+import hashlib
+
+# Lines that are site chrome rather than page content
+BOILERPLATE_PATTERNS = [
+    re.compile(pattern, re.IGNORECASE) for pattern in (
+        r"^skip to (main )?content$",
+        r"^(toggle|open|close) (navigation|menu|sidebar|search)$",
+        r"^(menu|search|sign in|log in|sign up|subscribe|share|print|back to top|edit this page)$",
+        r"^(on this page|table of contents|contents|in this article)$",
+        r"^[«‹←]?\s*(previous|next)( (page|article|post|chapter))?\s*([»›→]|:\s.{0,60})?$",
+        r"^(copyright|©|\(c\))\s*(©\s*)?\d{4}\b",
+        r"all rights reserved",
+        r"\b(we|this (web)?site) uses? cookies\b",
+        r"^(accept|reject|manage) (all )?cookies$",
+        r"^(privacy policy|terms( of (use|service))?|cookie policy)([\s|·•-]+(privacy policy|terms( of (use|service))?|cookie policy|contact( us)?|sitemap))*$",
+        r"^was this (page|article) helpful\??$",
+        r"^(last updated|updated on)\b.{0,40}$",
+    )
+]
+
+MARKDOWN_IMAGE = re.compile(r"!\[[^\]]*\]\([^)]*\)")
+MARKDOWN_LINK = re.compile(r"\[([^\]]*)\]\((?:[^()]|\([^)]*\))*\)")
+HTML_TAG = re.compile(r"</?[a-zA-Z][^>]*>")
+BARE_URL_LINE = re.compile(r"^\W*(https?://\S+)\W*$")
+WORD = re.compile(r"[a-z0-9]+")
+
+# Paragraphs shorter than this (headings, labels) are never treated as duplicates
+MIN_DEDUPE_WORDS = 6
+# A paragraph found on more than half of the pages, and on at least this many, is site boilerplate
+MIN_PAGES_FOR_BOILERPLATE = 3
+
+
+def is_navigation_line(line):
+    """
+    A line made almost entirely of links, like a menu, breadcrumb or footer link row
+    """
+    links = MARKDOWN_LINK.findall(line)
+    if len(links) < 2:
+        return False
+    remaining = MARKDOWN_LINK.sub("", line)
+    return len(re.sub(r"[\s|·•>/*-]", "", remaining)) <= 3
+
+
+def clean_text(text):
+    """
+    Strip navigation, boilerplate lines, images, link targets and HTML tags from page
+    text, keeping code blocks verbatim. Returns the cleaned paragraphs.
+    """
+    paragraphs = []
+    current = []
+    in_code = False
+
+    def flush():
+        if current:
+            paragraphs.append("\n".join(current))
+            current.clear()
+
+    for raw_line in (text or "").splitlines():
+        line = raw_line.rstrip()
+        if line.lstrip().startswith("```"):
+            in_code = not in_code
+            current.append(line)
+            continue
+        if in_code:
+            current.append(line)
+            continue
+
+        if not line.strip():
+            flush()
+            continue
+        if is_navigation_line(line) or BARE_URL_LINE.match(line):
+            continue
+
+        line = MARKDOWN_IMAGE.sub("", line)
+        line = MARKDOWN_LINK.sub(r"\1", line)
+        line = HTML_TAG.sub("", line)
+        line = re.sub(r"[ \t]+", " ", line).strip()
+        stripped = line.strip("#*_>|-•· ").strip()
+        if not stripped or any(pattern.search(stripped) for pattern in BOILERPLATE_PATTERNS):
+            continue
+        current.append(line)
+    flush()
+    return paragraphs
+
+
+def fingerprint(paragraph):
+    """
+    Key shared by near-identical paragraphs (case, punctuation, markup and spacing ignored),
+    or None for paragraphs too short to dedupe
+    """
+    words = WORD.findall(paragraph.lower())
+    if len(words) < MIN_DEDUPE_WORDS:
+        return None
+    return hashlib.sha1(" ".join(words).encode("utf-8")).hexdigest()
+
+
+def dedupe_documents(documents):
+    """
+    Clean [(source, text)] and drop repeated paragraphs: those found on more than half of
+    the pages are site boilerplate and removed everywhere, other near-duplicates are kept once.
+    Returns [(source, paragraphs)] for the documents with anything left.
+    """
+    cleaned = [(source, clean_text(text)) for source, text in documents]
+
+    boilerplate = set()
+    pages = [paragraphs for _, paragraphs in cleaned if paragraphs]
+    if len(pages) >= MIN_PAGES_FOR_BOILERPLATE:
+        page_counts = {}
+        for paragraphs in pages:
+            # Code blocks repeated across pages (install snippets etc.) are kept once, not dropped
+            prose = [paragraph for paragraph in paragraphs if not paragraph.startswith("```")]
+            for key in set(filter(None, map(fingerprint, prose))):
+                page_counts[key] = page_counts.get(key, 0) + 1
+        boilerplate = {
+            key for key, count in page_counts.items()
+            if count >= MIN_PAGES_FOR_BOILERPLATE and count * 2 > len(pages)
+        }
+
+    seen = set()
+    deduped = []
+    for source, paragraphs in cleaned:
+        kept = []
+        for paragraph in paragraphs:
+            key = fingerprint(paragraph)
+            if key is not None:
+                if key in boilerplate or key in seen:
+                    continue
+                seen.add(key)
+            kept.append(paragraph)
+        # Headings left without any body text under them
+        while kept and kept[-1].startswith("#"):
+            kept.pop()
+        if kept:
+            deduped.append((source, kept))
+    return deduped
+
+
+def source_marker(source):
+    return f"[Source: {source}]" if source else "[Source]"
+
+
+def normalize_documents(documents):
+    """
+    Turn [(source, text)] into compact text for a model prompt: boilerplate stripped,
+    repeated paragraphs removed (see dedupe_documents), and each document introduced
+    by a [Source: ...] marker.
+    """
+    return "\n\n".join(
+        source_marker(source) + "\n" + "\n\n".join(paragraphs)
+        for source, paragraphs in dedupe_documents(documents)
+    )
+
+
+def normalize_extract_response(response):
+    """
+    Compact text from a Tavily extract or crawl response
+    """
+    return normalize_documents([
+        (result.get("url", ""), result.get("raw_content") or "")
+        for result in response.get("results", [])
+        if result.get("raw_content")
+    ])
+
+
+def normalize_search_response(response):
+    """
+    Compact text from a Tavily search response: the answer followed by each result's page text
+    """
+    text = normalize_documents([
+        (result.get("url", ""), result.get("raw_content") or result.get("content") or "")
+        for result in response.get("results", [])
+        if result.get("raw_content") or result.get("content")
+    ])
+    if response.get("answer"):
+        text = f"[Answer]\n{response['answer']}" + (f"\n\n{text}" if text else "")
+    return text
@@ -0,0 +1,316 @@
+import os
+import re
+import json
+import time
+import uuid
+import sqlite3
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from content_cache import normalize_url
+
+# Links a site map turns up that are not readable pages
+ASSET_EXTENSIONS = (
+    ".png", ".jpg", ".jpeg", ".gif", ".svg", ".webp", ".ico", ".css", ".js", ".json", ".xml",
+    ".zip", ".gz", ".tar", ".mp3", ".mp4", ".woff", ".woff2", ".ttf",
+)
+
+
+def prioritize_urls(urls, root_url, include_paths=None, exclude_paths=None, max_pages=100):
+    """
+    De-duplicate mapped URLs and order them for crawling.
+    Keeps pages on the root URL's host that match include_paths (if given) and none of
+    exclude_paths (regular expressions matched against the path), skips static assets,
+    and ranks the root and shallow pages under the root path first.
+    Returns [(url, priority)] for at most max_pages URLs; lower priority is fetched first.
+    """
+    root = urlsplit(normalize_url(root_url))
+    root_path = root.path.rstrip("/") + "/"
+    include = [re.compile(pattern) for pattern in include_paths or []]
+    exclude = [re.compile(pattern) for pattern in exclude_paths or []]
+
+    ranked = {}
+    for url in [root_url] + list(urls):
+        if not url:
+            continue
+        key = normalize_url(url)
+        if key in ranked:
+            continue
+
+        parts = urlsplit(key)
+        if parts.netloc != root.netloc or parts.path.lower().endswith(ASSET_EXTENSIONS):
+            continue
+        if key != normalize_url(root_url):
+            if include and not any(pattern.search(parts.path) for pattern in include):
+                continue
+            if any(pattern.search(parts.path) for pattern in exclude):
+                continue
+
+        depth = len([segment for segment in parts.path.split("/") if segment])
+        outside_root = 0 if (parts.path + "/").startswith(root_path) else 1
+        # Query-string variants are usually duplicates of the page without one
+        ranked[key] = (outside_root, depth, 1 if parts.query else 0, len(key))
+
+    ordered = sorted(ranked, key=lambda key: ranked[key])[:max_pages]
+    return [(url, priority) for priority, url in enumerate(ordered)]
+
+
+class CrawlStore:
+    """
+    SQLite-backed crawl progress: the options of each crawl and the status and content
+    of every page it fetches. Pages are written as each extract call returns, so an
+    interrupted crawl resumes with only the pages that are still pending.
+    Usage:
+        store = CrawlStore("cache/crawls.sqlite3")
+        crawl_id = store.create("https://docs.example.com", {"max_depth": 2})
+        store.add_pages(crawl_id, [("https://docs.example.com", 0)])
+        store.claim(crawl_id)                 # True for the one worker that runs it
+        store.record_pages(crawl_id, {url: {"status": "extracted", "result": {...}}})
+        store.finish(crawl_id, "completed")
+    """
+
+    def __init__(self, path="cache/crawls.sqlite3", stale_after=300):
+        self.path = path
+        # A running crawl that has not recorded progress for this long is treated as abandoned
+        self.stale_after = stale_after
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS crawls (
+                    id TEXT PRIMARY KEY,
+                    root_url TEXT NOT NULL,
+                    options TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    mapped INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS crawl_pages (
+                    crawl_id TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    priority INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    characters INTEGER,
+                    content TEXT,
+                    error TEXT,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (crawl_id, url)
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_crawl_pages_status ON crawl_pages (crawl_id, status, priority)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE serializes claims across processes
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def create(self, root_url, options):
+        """
+        Create a pending crawl and return its id
+        """
+        crawl_id = uuid.uuid4().hex
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO crawls (id, root_url, options, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, 'pending', ?, ?)",
+                (crawl_id, root_url, json.dumps(options), now, now),
+            )
+        return crawl_id
+
+    def claim(self, crawl_id):
+        """
+        Mark the crawl as running. Returns False if it is finished, unknown, or
+        already being run by a live worker.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT status, updated_at FROM crawls WHERE id = ?", (crawl_id,)
+            ).fetchone()
+            if row is None or row[0] == "completed":
+                return False
+            if row[0] == "running" and row[1] > now - self.stale_after:
+                return False
+            conn.execute(
+                "UPDATE crawls SET status = 'running', error = NULL, updated_at = ? WHERE id = ?",
+                (now, crawl_id),
+            )
+        return True
+
+    def add_pages(self, crawl_id, pages):
+        """
+        Record the prioritized [(url, priority)] list and mark the crawl as mapped
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO crawl_pages (crawl_id, url, priority, status, updated_at) "
+                "VALUES (?, ?, ?, 'pending', ?)",
+                [(crawl_id, url, priority, now) for url, priority in pages],
+            )
+            conn.execute("UPDATE crawls SET mapped = 1, updated_at = ? WHERE id = ?", (now, crawl_id))
+
+    def page_contents(self, crawl_id):
+        """
+        [(url, content)] of the fetched pages, in priority order
+        """
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT url, content FROM crawl_pages WHERE crawl_id = ? AND status = 'done' ORDER BY priority",
+                (crawl_id,),
+            ).fetchall()
+
+    def content_version(self, crawl_id):
+        """
+        Identifies the fetched content of a crawl: changes whenever a page is stored or
+        re-fetched. None until a page has been fetched.
+        """
+        with self._connect() as conn:
+            count, updated_at = conn.execute(
+                "SELECT COUNT(*), MAX(updated_at) FROM crawl_pages WHERE crawl_id = ? AND status = 'done'",
+                (crawl_id,),
+            ).fetchone()
+        return f"{count}:{updated_at:.6f}" if count else None
+
+    def pending_urls(self, crawl_id):
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT url FROM crawl_pages WHERE crawl_id = ? AND status = 'pending' ORDER BY priority",
+                (crawl_id,),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def record_pages(self, crawl_id, outcomes):
+        """
+        Store {normalized url: outcome} from one extract call; also counts as a heartbeat
+        """
+        now = time.time()
+        rows = []
+        for url, outcome in outcomes.items():
+            if "result" in outcome:
+                content = outcome["result"].get("raw_content") or ""
+                rows.append(("done", len(content), content, None, now, crawl_id, url))
+            else:
+                rows.append(("failed", None, None, outcome.get("error"), now, crawl_id, url))
+
+        with self._transaction() as conn:
+            conn.executemany(
+                "UPDATE crawl_pages SET status = ?, characters = ?, content = ?, error = ?, updated_at = ? "
+                "WHERE crawl_id = ? AND url = ?",
+                rows,
+            )
+            conn.execute("UPDATE crawls SET updated_at = ? WHERE id = ?", (now, crawl_id))
+
+    def retry_failed(self, crawl_id):
+        """
+        Put failed pages back in the queue, reopening a completed crawl; returns how many
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            count = conn.execute(
+                "UPDATE crawl_pages SET status = 'pending', error = NULL, updated_at = ? "
+                "WHERE crawl_id = ? AND status = 'failed'",
+                (now, crawl_id),
+            ).rowcount
+            if count:
+                conn.execute(
+                    "UPDATE crawls SET status = 'pending', updated_at = ? WHERE id = ? AND status = 'completed'",
+                    (now, crawl_id),
+                )
+        return count
+
+    def finish(self, crawl_id, status, error=None):
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE crawls SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, error, time.time(), crawl_id),
+            )
+
+    def get(self, crawl_id):
+        """
+        Return the crawl with per-status page counts, or None if it does not exist
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, root_url, options, status, mapped, error, created_at, updated_at FROM crawls WHERE id = ?",
+                (crawl_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            counts = dict(conn.execute(
+                "SELECT status, COUNT(*) FROM crawl_pages WHERE crawl_id = ? GROUP BY status", (crawl_id,)
+            ).fetchall())
+
+        return {
+            "crawl_id": row[0],
+            "root_url": row[1],
+            "options": json.loads(row[2]),
+            "status": row[3],
+            "mapped": bool(row[4]),
+            "error": row[5],
+            "pages": {
+                "total": sum(counts.values()),
+                "done": counts.get("done", 0),
+                "failed": counts.get("failed", 0),
+                "pending": counts.get("pending", 0),
+            },
+            "created_at": row[6],
+            "updated_at": row[7],
+        }
+
+    def pages(self, crawl_id, status=None, offset=0, limit=50, include_content=False):
+        """
+        Return crawled pages in priority order, optionally filtered by status
+        """
+        columns = "url, status, characters, error" + (", content" if include_content else "")
+        query = f"SELECT {columns} FROM crawl_pages WHERE crawl_id = ?"
+        params = [crawl_id]
+        if status:
+            query += " AND status = ?"
+            params.append(status)
+        query += " ORDER BY priority LIMIT ? OFFSET ?"
+        params.extend([limit, offset])
+
+        with self._connect() as conn:
+            rows = conn.execute(query, params).fetchall()
+
+        pages = []
+        for row in rows:
+            page = {"url": row[0], "status": row[1]}
+            if row[2] is not None:
+                page["characters"] = row[2]
+            if row[3]:
+                page["error"] = row[3]
+            if include_content and row[4] is not None:
+                page["content"] = row[4]
+            pages.append(page)
+        return pages
@@ -1,5 +1,186 @@
 import os
+import re
+import json
+import time
+import uuid
+import sqlite3
+import hashlib
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from elevenlabs import ElevenLabs
+from metrics import track, record_cache
+
+
+def split_text_for_tts(text, max_chars=1500):
+    """
+    Split text into segments of at most max_chars, breaking at paragraph
+    and sentence boundaries where possible.
+    """
+    # (paragraph number, text) so pieces of one paragraph are rejoined as running prose
+    pieces = []
+    for number, paragraph in enumerate(re.split(r"\n\s*\n", text.strip())):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            pieces.append((number, paragraph))
+            continue
+        for sentence in re.split(r"(?<=[.!?])\s+", paragraph):
+            # Fall back to word boundaries for sentences that are still too long
+            while len(sentence) > max_chars:
+                cut = sentence.rfind(" ", 0, max_chars)
+                if cut <= 0:
+                    cut = max_chars
+                pieces.append((number, sentence[:cut].strip()))
+                sentence = sentence[cut:].strip()
+            if sentence:
+                pieces.append((number, sentence))
+
+    # Pack the pieces greedily so each request carries as much text as allowed
+    segments = []
+    current = ""
+    current_number = None
+    for number, piece in pieces:
+        separator = " " if number == current_number else "\n\n"
+        candidate = f"{current}{separator}{piece}" if current else piece
+        if len(candidate) <= max_chars:
+            current = candidate
+        else:
+            segments.append(current)
+            current = piece
+        current_number = number
+    if current:
+        segments.append(current)
+    return segments
+
+
+def history_item_ids(responses):
+    """
+    ElevenLabs history item ids of synthesis requests, read from their response headers
+    """
+    return [
+        response.headers["history-item-id"]
+        for response in responses
+        if response.headers.get("history-item-id")
+    ]
+
+
+class AudioStore:
+    """
+    Content-addressed index of synthesized audio files.
+    Entries are keyed by a hash of (text, voice_id, model_id, output_format) and
+    evicted least-recently-used first once the files exceed max_bytes. The index
+    and the hit/miss counters live in SQLite so every gunicorn worker shares them.
+    """
+
+    def __init__(self, directory, index_path="cache/audio_index.sqlite3", max_bytes=500 * 1024 * 1024):
+        self.directory = directory
+        self.index_path = index_path
+        self.max_bytes = max_bytes
+        index_dir = os.path.dirname(self.index_path)
+        if index_dir:
+            os.makedirs(index_dir, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS audio_entries (
+                    key TEXT PRIMARY KEY,
+                    filename TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS audio_stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.index_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def make_key(text, voice_id, model_id, output_format):
+        raw = json.dumps([text, voice_id, model_id, output_format], separators=(",", ":"))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def filename_for(key, output_format):
+        extension = output_format.split("_")[0]
+        return f"tts_{key[:40]}.{extension}"
+
+    def get(self, key):
+        """
+        Return the cached filename for key, or None on a miss
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT filename FROM audio_entries WHERE key = ?", (key,)).fetchone()
+            if row is not None and not os.path.exists(os.path.join(self.directory, row[0])):
+                conn.execute("DELETE FROM audio_entries WHERE key = ?", (key,))
+                row = None
+
+            if row is None:
+                self._increment(conn, "misses")
+                record_cache("audio", False)
+                return None
+
+            conn.execute("UPDATE audio_entries SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._increment(conn, "hits")
+            record_cache("audio", True)
+            return row[0]
+
+    def put(self, key, filename):
+        size = os.path.getsize(os.path.join(self.directory, filename))
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO audio_entries (key, filename, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, filename, size, now, now),
+            )
+            self._evict(conn, keep_key=key)
+
+    def stats(self):
+        with self._connect() as conn:
+            entries, total_bytes = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM audio_entries"
+            ).fetchone()
+            counters = dict(conn.execute("SELECT name, value FROM audio_stats").fetchall())
+        return {
+            "entries": entries,
+            "bytes": total_bytes,
+            "hits": counters.get("hits", 0),
+            "misses": counters.get("misses", 0)
+        }
+
+    def _increment(self, conn, name):
+        conn.execute(
+            "INSERT INTO audio_stats (name, value) VALUES (?, 1) ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,),
+        )
+
+    def _evict(self, conn, keep_key=None):
+        total_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM audio_entries").fetchone()[0]
+        if total_bytes <= self.max_bytes:
+            return
+
+        rows = conn.execute("SELECT key, filename, size FROM audio_entries ORDER BY accessed_at ASC").fetchall()
+        for key, filename, size in rows:
+            if total_bytes <= self.max_bytes:
+                break
+            if key == keep_key:
+                continue
+            conn.execute("DELETE FROM audio_entries WHERE key = ?", (key,))
+            for path in (os.path.join(self.directory, filename), os.path.join(self.directory, f"{filename}.json")):
+                if os.path.exists(path):
+                    os.remove(path)
+            total_bytes -= size
+
 
 class ElevenLabsToolkit:
     """
@@ -14,25 +195,174 @@ class ElevenLabsToolkit:
             filename="output.mp3"
         )
         print(result)  # {'audio_file': 'audio_generations/output.mp3', 'audio_file_name': 'output.mp3'}
+
+    Synthesized results also carry "history_item_ids", read from the ElevenLabs response headers.
+    With an AudioStore, files are named by content hash and identical requests
+    return the stored file without calling ElevenLabs (result has "cached": True).
     """
-    def __init__(self, api_key=None, output_dir="audio_generations"):
+    def __init__(self, api_key=None, output_dir="audio_generations", segment_chars=1500, max_workers=4, audio_store=None,
+                 base_url=None):
         self.api_key = api_key or os.environ.get("ELEVEN_LABS_API_KEY")
         self.output_dir = output_dir
+        self.segment_chars = segment_chars
+        self.max_workers = max_workers
+        self.audio_store = audio_store
         os.makedirs(self.output_dir, exist_ok=True)
-        self.client = ElevenLabs(api_key=self.api_key)
+        self.client = ElevenLabs(api_key=self.api_key, base_url=base_url)
 
-    def text_to_speech(self, text, voice_id, model_id, output_format="mp3_44100_128", filename="output.mp3"):
-        output_path = os.path.join(self.output_dir, filename)
-        audio_bytes = self.client.text_to_speech.convert(
-            voice_id=voice_id,
-            output_format=output_format,
-            text=text,
-            model_id=model_id,
+    def audio_file_name_for(self, text, voice_id, model_id, output_format="mp3_44100_128", filename="output.mp3"):
+        """
+        Name of the file a synthesis request will be written to
+        """
+        if self.audio_store is None:
+            return filename
+        return self.audio_store.filename_for(
+            self.audio_store.make_key(text, voice_id, model_id, output_format), output_format
         )
-        with open(output_path, "wb") as f:
-            for chunk in audio_bytes:
-                f.write(chunk)
+
+    def text_to_speech(self, text, voice_id, model_id, output_format="mp3_44100_128", filename="output.mp3"):
+        cached = self._lookup(text, voice_id, model_id, output_format)
+        if cached is not None:
+            return cached
+
+        output_path = os.path.join(self.output_dir, self.audio_file_name_for(text, voice_id, model_id, output_format, filename))
+        # The response body is streamed, so the request completes while writing
+        with track("tts"):
+            with self.client.text_to_speech.with_raw_response.convert(
+                voice_id=voice_id,
+                output_format=output_format,
+                text=text,
+                model_id=model_id,
+            ) as response:
+                self._write_audio(output_path, response.data)
+        result = self._stored_result(text, voice_id, model_id, output_format, output_path)
+        result["history_item_ids"] = history_item_ids([response])
+        return result
+
+    def text_to_speech_parallel(self, text, voice_id, model_id, output_format="mp3_44100_128", filename="output.mp3"):
+        """
+        Synthesize long text as concurrent segments and stitch the MP3 frames in order.
+        Each segment is sent with its neighbours as previous_text/next_text so prosody
+        stays consistent across the joins. Short text and non-MP3 formats (whose
+        container headers can't simply be concatenated) use a single request.
+        """
+        segments = split_text_for_tts(text, self.segment_chars)
+        if len(segments) <= 1 or not output_format.startswith("mp3"):
+            return self.text_to_speech(text, voice_id, model_id, output_format=output_format, filename=filename)
+
+        cached = self._lookup(text, voice_id, model_id, output_format)
+        if cached is not None:
+            return cached
+
+        def synthesize(index):
+            context = {}
+            if index > 0:
+                context["previous_text"] = segments[index - 1]
+            if index < len(segments) - 1:
+                context["next_text"] = segments[index + 1]
+            with track("tts_segment"):
+                with self.client.text_to_speech.with_raw_response.convert(
+                    voice_id=voice_id,
+                    output_format=output_format,
+                    text=segments[index],
+                    model_id=model_id,
+                    **context
+                ) as response:
+                    return b"".join(response.data), response
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(segments))) as executor:
+            audio_segments, responses = zip(*executor.map(synthesize, range(len(segments))))
+
+        output_path = os.path.join(self.output_dir, self.audio_file_name_for(text, voice_id, model_id, output_format, filename))
+        self._write_audio(output_path, audio_segments)
+        result = self._stored_result(text, voice_id, model_id, output_format, output_path)
+        result["segments"] = len(segments)
+        result["history_item_ids"] = history_item_ids(responses)
+        return result
+
+    def stream_text_to_speech(self, text, voice_id, model_id, output_format="mp3_44100_128", filename="output.mp3"):
+        """
+        Yield audio chunks as ElevenLabs produces them while writing them to disk.
+        The file only appears under its final name once the stream has completed,
+        so a dropped connection never leaves a truncated file behind.
+        Cached audio is replayed from disk.
+        """
+        cached = self._lookup(text, voice_id, model_id, output_format)
+        if cached is not None:
+            with open(cached["audio_file"], "rb") as f:
+                for chunk in iter(lambda: f.read(64 * 1024), b""):
+                    yield chunk
+            return
+
+        output_path = os.path.join(self.output_dir, self.audio_file_name_for(text, voice_id, model_id, output_format, filename))
+        partial_path = f"{output_path}.{uuid.uuid4().hex}.part"
+        completed = False
+        try:
+            audio_stream = self.client.text_to_speech.stream(
+                voice_id=voice_id,
+                output_format=output_format,
+                text=text,
+                model_id=model_id,
+            )
+            with open(partial_path, "wb") as f:
+                for chunk in audio_stream:
+                    f.write(chunk)
+                    yield chunk
+            os.replace(partial_path, output_path)
+            completed = True
+            self._stored_result(text, voice_id, model_id, output_format, output_path)
+        finally:
+            if not completed and os.path.exists(partial_path):
+                os.remove(partial_path)
+
+    def _lookup(self, text, voice_id, model_id, output_format):
+        if self.audio_store is None:
+            return None
+        filename = self.audio_store.get(self.audio_store.make_key(text, voice_id, model_id, output_format))
+        if filename is None:
+            return None
+        return {
+            "audio_file": os.path.join(self.output_dir, filename),
+            "audio_file_name": filename,
+            "cached": True
+        }
+
+    def _stored_result(self, text, voice_id, model_id, output_format, output_path):
+        if self.audio_store is not None:
+            self.audio_store.put(
+                self.audio_store.make_key(text, voice_id, model_id, output_format),
+                os.path.basename(output_path)
+            )
         return {
             "audio_file": output_path,
             "audio_file_name": os.path.basename(output_path)
-        }
\ No newline at end of file
+        }
+
+    def _write_audio(self, output_path, chunks):
+        # Write then rename so concurrent requests for the same content never see a partial file
+        temp_path = f"{output_path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(temp_path, output_path)
+
+    def save_audio_record(self, audio_file_name, record):
+        """
+        Write the metadata record stored next to an audio file
+        """
+        record_path = os.path.join(self.output_dir, f"{audio_file_name}.json")
+        temp_path = f"{record_path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(record, f)
+        os.replace(temp_path, record_path)
+        return record
+
+    def read_audio_record(self, audio_file_name):
+        """
+        Read the metadata record for an audio file, or None if there is none
+        """
+        record_path = os.path.join(self.output_dir, f"{audio_file_name}.json")
+        if not os.path.exists(record_path):
+            return None
+        with open(record_path) as f:
+            return json.load(f)
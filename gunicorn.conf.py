@@ -0,0 +1,31 @@
+import os
+import shutil
+
+# Prometheus multiprocess mode: every worker writes its metrics to files in this
+# directory and /metrics aggregates them. It must be set before main is imported.
+prometheus_multiproc_dir = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/prometheus_multiproc")
+os.makedirs(prometheus_multiproc_dir, exist_ok=True)
+
+
+def on_starting(server):
+    # Drop metric files left over from a previous run
+    shutil.rmtree(prometheus_multiproc_dir, ignore_errors=True)
+    os.makedirs(prometheus_multiproc_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:
+        return
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def when_ready(server):
+    # With --preload the app is imported once in the master; build its agents, teams
+    # and API clients there as well so forked workers start with them ready.
+    # Nothing they hold has opened a connection or thread yet, so sharing them across fork is safe.
+    if server.cfg.preload_app:
+        import main
+        for name, error in main.registry.preload().items():
+            server.log.warning(f"Could not preload {name}, it will be built on first use: {error}")
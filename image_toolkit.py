@@ -2,7 +2,10 @@ import os
 import uuid
 import requests
 import openai
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from agno.tools import Toolkit
+from metrics import track
 
 class ImageGenerationToolkit(Toolkit):
     """
@@ -18,7 +21,8 @@ class ImageGenerationToolkit(Toolkit):
         print(result)  # {'image_url': '...', 'image_path': '...', 'filename': '...'}
     """
     
-    def __init__(self, api_key=None, output_dir="src/generated_images"):
+    def __init__(self, api_key=None, output_dir="src/generated_images", timeout=120, max_retries=2,
+                 download_timeout=(5, 60), pool_size=10):
         super().__init__(name="image_generation_toolkit")
         self.api_key = api_key or os.environ.get("OPENAI_API_KEY")
         if not self.api_key:
@@ -27,6 +31,22 @@ class ImageGenerationToolkit(Toolkit):
         self.output_dir = output_dir
         os.makedirs(self.output_dir, exist_ok=True)
         
+        # Long-lived OpenAI client so connections are reused across calls
+        self.client = openai.OpenAI(api_key=self.api_key, timeout=timeout, max_retries=max_retries)
+        
+        # Pooled keep-alive session for image downloads, retrying transient failures with backoff
+        self.download_timeout = download_timeout
+        self.session = requests.Session()
+        retry = Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["GET"]
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        
         # Register the main method
         self.register(self.generate_image)
     
@@ -44,32 +64,26 @@ class ImageGenerationToolkit(Toolkit):
             dict: Dictionary containing image_url, image_path, and filename
         """
         try:
-            # Initialize OpenAI client
-            client = openai.OpenAI(api_key=self.api_key)
-            
             # Generate image using DALL-E 3
-            response = client.images.generate(
-                model="dall-e-3",
-                prompt=prompt,
-                size=size,
-                quality=quality,
-                n=1,
-            )
+            with track("image_generate"):
+                response = self.client.images.generate(
+                    model="dall-e-3",
+                    prompt=prompt,
+                    size=size,
+                    quality=quality,
+                    n=1,
+                )
             
             # Get the image URL
             image_url = response.data[0].url
             
-            # Download and save the image
-            image_response = requests.get(image_url)
-            image_response.raise_for_status()
-            
             # Generate unique filename
             filename = f"image_{uuid.uuid4().hex}.png"
             filepath = os.path.join(self.output_dir, filename)
             
-            # Save image
-            with open(filepath, "wb") as f:
-                f.write(image_response.content)
+            # Stream the image to disk instead of buffering it in memory
+            with track("image_download"):
+                self._download(image_url, filepath)
             
             return {
                 "image_url": image_url,
@@ -84,6 +98,22 @@ class ImageGenerationToolkit(Toolkit):
         except Exception as e:
             raise Exception(f"Image generation failed: {str(e)}")
     
+    def _download(self, url, filepath, chunk_size=64 * 1024):
+        """
+        Download url to filepath in chunks over the pooled session
+        """
+        temp_path = f"{filepath}.part"
+        try:
+            with self.session.get(url, stream=True, timeout=self.download_timeout) as image_response:
+                image_response.raise_for_status()
+                with open(temp_path, "wb") as f:
+                    for chunk in image_response.iter_content(chunk_size=chunk_size):
+                        f.write(chunk)
+            os.replace(temp_path, filepath)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    
     def generate_square_image(self, prompt, quality="standard"):
         """
         Generate a square image (1:1 aspect ratio)
@@ -0,0 +1,200 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+
+class JobStore:
+    """
+    SQLite-backed job records so any gunicorn worker can answer status queries
+    for work submitted to another worker. The worker that owns a pending or running
+    job refreshes its updated_at lease; a job whose lease expires is reported as failed.
+    """
+
+    def __init__(self, path="cache/jobs.sqlite3", ttl=24 * 60 * 60, stale_after=300):
+        self.path = path
+        self.ttl = ttl
+        # A pending or running job not refreshed for this long belonged to a worker that died
+        self.stale_after = stale_after
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    status_code INTEGER,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def create(self, kind):
+        """
+        Create a pending job record and return its id
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("DELETE FROM jobs WHERE updated_at < ?", (now - self.ttl,))
+            conn.execute(
+                "INSERT INTO jobs (id, kind, status, created_at, updated_at) VALUES (?, ?, 'pending', ?, ?)",
+                (job_id, kind, now, now),
+            )
+        return job_id
+
+    def update(self, job_id, status, status_code=None, result=None, error=None):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, status_code = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+                (
+                    status,
+                    status_code,
+                    json.dumps(result) if result is not None else None,
+                    error,
+                    time.time(),
+                    job_id,
+                ),
+            )
+
+    def heartbeat(self, job_ids):
+        """
+        Renew the lease of jobs that are still pending or running
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE jobs SET updated_at = ? WHERE id = ? AND status IN ('pending', 'running')",
+                [(now, job_id) for job_id in job_ids],
+            )
+
+    def get(self, job_id):
+        """
+        Return the job as a dict, or None if it does not exist
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, kind, status, status_code, result, error, created_at, updated_at FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+
+        job = {
+            "job_id": row[0],
+            "kind": row[1],
+            "status": row[2],
+            "status_code": row[3],
+            "result": json.loads(row[4]) if row[4] is not None else None,
+            "error": row[5],
+            "created_at": row[6],
+            "updated_at": row[7],
+        }
+        if job["status"] in ("pending", "running") and job["updated_at"] < time.time() - self.stale_after:
+            job.update(status="failed", status_code=500, error="Job was lost when its worker stopped; please retry")
+        return job
+
+
+class JobQueue:
+    """
+    Runs long generations on a bounded worker pool and records their outcome in a JobStore.
+    Job functions return a (payload, status_code) tuple, the same shape the endpoints respond with.
+    Usage:
+        jobs = JobQueue(JobStore("cache/jobs.sqlite3"), max_workers=4)
+        job_id = jobs.submit("storyboards", run_storyboard_generation, "Solar system", 3, False)
+        jobs.wait(job_id, timeout=25)  # job dict once finished, None if still running
+    """
+
+    def __init__(self, store, max_workers=4):
+        self.store = store
+        self.max_workers = max_workers
+        # Renew leases well within the store's stale_after
+        self.heartbeat_interval = max(store.stale_after / 3, 1)
+        self._executor = None
+        self._heartbeat = None
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # Created on first use so the pool and heartbeat thread are never shared across a fork
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+                self._heartbeat = threading.Thread(target=self._renew_leases, name="job-heartbeat", daemon=True)
+                self._heartbeat.start()
+            return self._executor
+
+    def _renew_leases(self):
+        while True:
+            time.sleep(self.heartbeat_interval)
+            with self._lock:
+                job_ids = list(self._futures)
+            if job_ids:
+                try:
+                    self.store.heartbeat(job_ids)
+                except sqlite3.Error:
+                    # Retried on the next beat, well before the lease runs out
+                    pass
+
+    def submit(self, kind, fn, *args, **kwargs):
+        """
+        Queue fn(*args, **kwargs) and return the job id immediately
+        """
+        job_id = self.store.create(kind)
+        future = self._get_executor().submit(self._run, job_id, fn, args, kwargs)
+        with self._lock:
+            self._futures[job_id] = future
+        future.add_done_callback(lambda _: self._forget(job_id))
+        return job_id
+
+    def wait(self, job_id, timeout=None):
+        """
+        Block until a job submitted by this worker finishes.
+        Returns the job record, or None if it is still running after timeout.
+        """
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is not None:
+            try:
+                future.result(timeout=timeout)
+            except FutureTimeoutError:
+                return None
+        return self.store.get(job_id)
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    def _forget(self, job_id):
+        with self._lock:
+            self._futures.pop(job_id, None)
+
+    def _run(self, job_id, fn, args, kwargs):
+        self.store.update(job_id, "running")
+        try:
+            payload, status_code = fn(*args, **kwargs)
+            status = "completed" if status_code < 400 else "failed"
+            error = payload.get("message") if status == "failed" else None
+            self.store.update(job_id, status, status_code=status_code, result=payload, error=error)
+        except Exception as e:
+            self.store.update(job_id, "failed", status_code=500, error=str(e))
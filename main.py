@@ -1,38 +1,33 @@
 import os
 import sys
+import re
+import json
+import uuid
 from dotenv import load_dotenv
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, Response, stream_with_context
 from flask_cors import CORS
-from agno.agent import Agent
-from agno.team import Team
-from agno.models.openai import OpenAIChat
-from agno.tools.eleven_labs import ElevenLabsTools
-from tavily_toolkit import TavilyCrawlToolkit, TavilyExtractToolkit, TavilySearchToolkit, TavilyMapToolkit
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from elabs_toolkit import ElevenLabsToolkit
-from image_toolkit import ImageGenerationToolkit
-import uuid
-import requests
-import base64
-from PIL import Image
-import io
-import datetime
-import openai  # Move openai import to top level
+from registry import Registry
+from content_cache import ContentCache, make_cache_key, normalize_url
+from job_queue import JobStore, JobQueue
+from crawl_store import CrawlStore, prioritize_urls
+from content_normalizer import normalize_extract_response, normalize_search_response
+from retrieval import RetrievalIndex, format_chunks, terms
+from rate_limiter import TokenBudget
+from singleflight import SingleFlight
+from streaming_json import JsonArrayStream
+from metrics import track, observe_stage, record_error, record_tokens, render_metrics
+from schemas import (
+    FlashcardsOutput, SummaryOutput, NotesOutput, QuizOutput,
+    AudiobookScriptOutput, StoryboardsOutput, BrainstormOutput
+)
+from token_counter import count_tokens, within_token_limit, truncate_to_tokens, split_into_token_chunks
+from concurrent.futures import ThreadPoolExecutor
+from pydantic import BaseModel
 
 # Load environment variables from .env file
 load_dotenv()
 
-import re
-import json
-from flask import Flask, request, jsonify, send_file
-from flask_cors import CORS
-from agno.agent import Agent
-from agno.team import Team
-from agno.models.openai import OpenAIChat
-from agno.tools.eleven_labs import ElevenLabsTools
-from tavily_toolkit import TavilyCrawlToolkit, TavilyExtractToolkit, TavilySearchToolkit, TavilyMapToolkit
-from elabs_toolkit import ElevenLabsToolkit
-
 app = Flask(__name__)
 
 # More flexible CORS configuration
@@ -69,324 +64,608 @@ else:
          supports_credentials=True)
 
 # Get API keys
-TAVILY_API_KEY = os.environ["TAVILY_API_KEY"]
+TAVILY_API_KEY = os.environ.get("TAVILY_API_KEY")
 ELEVENLABS_API_KEY = os.environ.get("ELEVENLABS_API_KEY")
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
 
-# Setup Tavily toolkits
-crawl_toolkit = TavilyCrawlToolkit(TAVILY_API_KEY)
-extract_toolkit = TavilyExtractToolkit(TAVILY_API_KEY)
-search_toolkit = TavilySearchToolkit(TAVILY_API_KEY)
-map_toolkit = TavilyMapToolkit(TAVILY_API_KEY)
+# Upstream API hosts can be pointed elsewhere, e.g. at the local stand-ins in benchmarks/.
+# The OpenAI SDK reads OPENAI_BASE_URL itself.
+TAVILY_API_BASE_URL = os.environ.get("TAVILY_API_BASE_URL")
+ELEVENLABS_BASE_URL = os.environ.get("ELEVENLABS_BASE_URL")
+
+# Shared on-disk cache for extracted content (visible to every gunicorn worker)
+content_cache = ContentCache(
+    path=os.environ.get("CONTENT_CACHE_PATH", "cache/content_cache.sqlite3"),
+    ttl=int(os.environ.get("CONTENT_CACHE_TTL", 6 * 60 * 60)),
+    max_entries=int(os.environ.get("CONTENT_CACHE_MAX_ENTRIES", 1000)),
+    max_bytes=int(os.environ.get("CONTENT_CACHE_MAX_BYTES", 200 * 1024 * 1024))
+)
 
-# Setup image generation toolkit
-image_toolkit = ImageGenerationToolkit(OPENAI_API_KEY)
+# Finished flashcards/summaries/notes/quizzes, keyed by endpoint, normalized input,
+# parameters and prompt version
+response_cache = ContentCache(
+    path=os.environ.get("RESPONSE_CACHE_PATH", "cache/response_cache.sqlite3"),
+    ttl=int(os.environ.get("RESPONSE_CACHE_TTL", 24 * 60 * 60)),
+    max_entries=int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", 5000)),
+    max_bytes=int(os.environ.get("RESPONSE_CACHE_MAX_BYTES", 100 * 1024 * 1024)),
+    name="response"
+)
 
-# Setup ElevenLabs toolkit
-elabs_toolkit = ElevenLabsToolkit(ELEVENLABS_API_KEY)
+# Agents, teams and API clients are built on first use (see registry.py), so
+# importing this module stays fast and doesn't pull in agno, openai, tavily or
+# elevenlabs until a request needs them. Under gunicorn --preload they are built
+# once in the master and shared by the forked workers (see gunicorn.conf.py).
+registry = Registry()
+
+def tavily_api_key():
+    if not TAVILY_API_KEY:
+        raise RuntimeError("TAVILY_API_KEY is not set")
+    return TAVILY_API_KEY
+
+# Tavily toolkits
+@registry.register
+def crawl_toolkit():
+    from tavily_toolkit import TavilyCrawlToolkit
+    return TavilyCrawlToolkit(
+        tavily_api_key(),
+        cache=content_cache,
+        api_base_url=TAVILY_API_BASE_URL,
+        max_depth=int(os.environ.get("TAVILY_CRAWL_MAX_DEPTH", 1)),
+        max_breadth=int(os.environ.get("TAVILY_CRAWL_MAX_BREADTH", 20)),
+        limit=int(os.environ.get("TAVILY_CRAWL_LIMIT", 50)),
+        instructions=os.environ.get("TAVILY_CRAWL_INSTRUCTIONS") or None
+    )
 
-# Create directories for storyboard images
-os.makedirs("src/storyboard_generations", exist_ok=True)
+@registry.register
+def extract_toolkit():
+    from tavily_toolkit import TavilyExtractToolkit
+    return TavilyExtractToolkit(tavily_api_key(), cache=content_cache, api_base_url=TAVILY_API_BASE_URL)
+
+@registry.register
+def search_toolkit():
+    from tavily_toolkit import TavilySearchToolkit
+    return TavilySearchToolkit(tavily_api_key(), api_base_url=TAVILY_API_BASE_URL)
+
+@registry.register
+def map_toolkit():
+    from tavily_toolkit import TavilyMapToolkit
+    return TavilyMapToolkit(tavily_api_key(), api_base_url=TAVILY_API_BASE_URL)
+
+# Image generation toolkit
+@registry.register
+def image_toolkit():
+    from image_toolkit import ImageGenerationToolkit
+    return ImageGenerationToolkit(OPENAI_API_KEY)
+
+# OpenAI client for embeddings (agents create their own through agno)
+@registry.register
+def openai_client():
+    from openai import OpenAI
+    return OpenAI(api_key=OPENAI_API_KEY)
+
+# ElevenLabs toolkit
+@registry.register
+def elabs_toolkit():
+    from elabs_toolkit import ElevenLabsToolkit, AudioStore
+    return ElevenLabsToolkit(
+        ELEVENLABS_API_KEY,
+        segment_chars=int(os.environ.get("TTS_SEGMENT_CHARS", 1500)),
+        max_workers=int(os.environ.get("TTS_MAX_WORKERS", 4)),
+        audio_store=AudioStore(
+            "audio_generations",
+            index_path=os.environ.get("AUDIO_CACHE_INDEX_PATH", "cache/audio_index.sqlite3"),
+            max_bytes=int(os.environ.get("AUDIO_CACHE_MAX_BYTES", 500 * 1024 * 1024))
+        ),
+        base_url=ELEVENLABS_BASE_URL
+    )
 
-# Agents
-tavily_agent = Agent(
-    name="Tavily Agent",
-    role=(
-        "You are a smart Tavily assistant. "
-        "Choose between crawl, extract, or search tools based on the input. "
-        "Use Search toolkit, if Input type is not URL"
-        "Always return valid JSON with the tool output. No explanations."
-    ),
-    model=OpenAIChat("gpt-4o"),
-    tools=[crawl_toolkit, extract_toolkit, search_toolkit],
+# Shared OpenAI TPM/RPM budget; every agent/team run reserves its estimated tokens first
+token_budget = TokenBudget(
+    path=os.environ.get("RATE_BUDGET_PATH", "cache/rate_budget.sqlite3"),
+    tokens_per_minute=int(os.environ.get("OPENAI_TPM_LIMIT", 30000)),
+    requests_per_minute=int(os.environ.get("OPENAI_RPM_LIMIT", 500)),
+    max_wait=float(os.environ.get("RATE_BUDGET_MAX_WAIT", 30))
 )
 
-flashcard_agent = Agent(
-    name="Flashcard Agent",
-    role=(
-        "You are a flashcard generator. "
-        "Given extracted content, generate 5-10 flashcards as JSON: "
-        '{"flashcards": [{"question": "...", "answer": "..."}]}'
-        "No explanations or markdown. Only valid JSON."
-    ),
-    model=OpenAIChat("gpt-4o"),
-)
+# Output allowance per model call, and model calls per run for coordinate-mode teams
+RUN_OUTPUT_TOKENS = 2000
+TEAM_CALLS_PER_RUN = 3
 
-summary_agent = Agent(
-    name="Summary Agent",
-    role=(
-        "You are a content summarizer. "
-        "Given extracted content, generate a concise summary as JSON: "
-        '{"summary": "..."}'
-        "The summary should be 2-3 paragraphs long and capture the main points. "
-        "No explanations or markdown. Only valid JSON."
+# Background jobs for long-running generations; the store is shared by all workers,
+# and a job whose worker stops renewing its lease for JOB_STALE_AFTER seconds is failed
+job_queue = JobQueue(
+    JobStore(
+        path=os.environ.get("JOB_STORE_PATH", "cache/jobs.sqlite3"),
+        stale_after=float(os.environ.get("JOB_STALE_AFTER", 300))
     ),
-    model=OpenAIChat("gpt-4o"),
+    max_workers=int(os.environ.get("JOB_MAX_WORKERS", 4))
 )
 
-quiz_agent = Agent(
-    name="Quiz Agent",
-    role=(
-        "You are a quiz generator. "
-        "Given content and parameters, generate a quiz as JSON: "
-        '{"quiz": {"title": "...", "description": "...", "questions": [{"question": "...", "options": ["...", "...", "...", "..."], "correct_answer": "..."}]}}'
-        "Generate questions based on the specified difficulty level (easy/medium/hard). "
-        "For easy questions, focus on basic facts and definitions. "
-        "For medium questions, include some analysis and understanding. "
-        "For hard questions, include complex concepts and critical thinking. "
-        "No explanations or markdown. Only valid JSON."
-    ),
-    model=OpenAIChat("gpt-4o"),
+# Identical generations in flight at the same time share one run, across threads and workers
+single_flight = SingleFlight(
+    path=os.environ.get("SINGLE_FLIGHT_PATH", "cache/singleflight.sqlite3"),
+    lease=float(os.environ.get("SINGLE_FLIGHT_LEASE", 300))
 )
 
+# ElevenLabs accepts at most 10k characters per streaming request
+MAX_TTS_STREAM_CHARS = 10000
+
+# URL endpoints either call the extractor and generator agent directly ("pipeline")
+# or let the coordinate-mode team drive the tools ("team")
+GENERATION_MODES = ["pipeline", "team"]
+GENERATION_MODE = os.environ.get("GENERATION_MODE", "pipeline")
+
+# Summaries and notes can also condense long documents chunk by chunk ("map") and
+# generate from the combined section summaries ("reduce") instead of truncating them.
+# Pipeline mode switches to map-reduce automatically above the threshold.
+MAP_REDUCE_MODES = GENERATION_MODES + ["mapreduce"]
+MAP_REDUCE_THRESHOLD_TOKENS = int(os.environ.get("MAP_REDUCE_THRESHOLD_TOKENS", 20000))
+MAP_REDUCE_CHUNK_TOKENS = int(os.environ.get("MAP_REDUCE_CHUNK_TOKENS", 6000))
+MAP_REDUCE_MAX_WORKERS = int(os.environ.get("MAP_REDUCE_MAX_WORKERS", 4))
+MAP_REDUCE_MAX_ROUNDS = 2
+
+# Every chunk of a long document is mapped. Its run reserves about MAP_REDUCE_CHUNK_COST
+# tokens (the chunk, the prompt and RUN_OUTPUT_TOKENS of output), so a document of N chunks
+# needs N * MAP_REDUCE_CHUNK_COST tokens of budget before its reduce run. Map and reduce runs
+# may wait for as many budget windows as that takes (see paced_wait): with the defaults
+# (30k TPM, 6000-token chunks) an idle budget maps 3 chunks per minute, so budget adds
+# about N * MAP_REDUCE_CHUNK_COST / OPENAI_TPM_LIMIT minutes on top of the model latency.
+MAP_REDUCE_CHUNK_COST = MAP_REDUCE_CHUNK_TOKENS + 2 * RUN_OUTPUT_TOKENS
+
+# Study packs extract once and run the generator agents side by side
+STUDY_PACK_ARTIFACTS = ["flashcards", "summary", "notes", "quiz"]
+STUDY_PACK_MAX_WORKERS = int(os.environ.get("STUDY_PACK_MAX_WORKERS", 4))
+
+# Reading lists are extracted in groups of up to 20 URLs (Tavily's per-request
+# maximum), with this many extract calls in flight at once
+EXTRACT_BATCH_MAX_URLS = int(os.environ.get("EXTRACT_BATCH_MAX_URLS", 200))
+EXTRACT_BATCH_MAX_WORKERS = int(os.environ.get("EXTRACT_BATCH_MAX_WORKERS", 4))
+
+# Site crawls map the site, then extract the prioritized pages in batches; progress and
+# page content are kept in a shared store so an interrupted crawl can be resumed
+crawl_store = CrawlStore(
+    path=os.environ.get("CRAWL_STORE_PATH", "cache/crawls.sqlite3"),
+    stale_after=float(os.environ.get("CRAWL_STALE_AFTER", 300))
+)
+CRAWL_MAX_PAGES = int(os.environ.get("CRAWL_MAX_PAGES", 500))
+CRAWL_MAX_DEPTH = int(os.environ.get("CRAWL_MAX_DEPTH", 3))
+CRAWL_MAX_WORKERS = int(os.environ.get("CRAWL_MAX_WORKERS", 4))
 
-audiobook_agent = Agent(
-    name="Audiobook Agent",
-    role=(
-        "You are an audiobook script generator. "
-        "Given a topic, storytelling style, and duration, generate a script for an audiobook. "
-        "The script should be structured according to the requested style: "
-        "- Educational: informative and structured\n"
-        "- Conversational: casual and engaging\n"
-        "- Storytelling: narrative and immersive\n"
-        "- Interview: Q&A format\n"
-        "The script must be the correct length for the requested duration (e.g., 5 minutes of spoken audio, not more or less). "
-        "Always return valid JSON: {\"script\": \"...\"}. No explanations or markdown."
-    ),
-    model=OpenAIChat("gpt-4o"),
+def embed_texts(texts):
+    """
+    Embedding vectors for texts, in batches the embeddings API accepts
+    """
+    vectors = []
+    for start in range(0, len(texts), 256):
+        with track("openai_embeddings"):
+            response = registry.openai_client.embeddings.create(
+                model=RETRIEVAL_EMBEDDING_MODEL, input=texts[start:start + 256]
+            )
+        vectors.extend(item.embedding for item in response.data)
+    return vectors
+
+# Crawled pages are chunked into a local BM25 index, plus embedding vectors in a NumPy
+# memory-mapped file when RETRIEVAL_EMBEDDING_MODEL is set and NumPy is installed.
+# Crawl generations get the top chunks for their topic, so the prompt stays the same
+# size however large the site is.
+RETRIEVAL_EMBEDDING_MODEL = os.environ.get("RETRIEVAL_EMBEDDING_MODEL")
+retrieval_index = RetrievalIndex(
+    path=os.environ.get("RETRIEVAL_INDEX_PATH", "cache/retrieval.sqlite3"),
+    embed=embed_texts if RETRIEVAL_EMBEDDING_MODEL else None,
+    chunk_tokens=int(os.environ.get("RETRIEVAL_CHUNK_TOKENS", 400))
 )
+RETRIEVAL_TOP_K = int(os.environ.get("RETRIEVAL_TOP_K", 12))
+RETRIEVAL_MAX_TOKENS = int(os.environ.get("RETRIEVAL_MAX_TOKENS", 6000))
+
+def openai_chat(model_id):
+    from agno.models.openai import OpenAIChat
+    return OpenAIChat(model_id)
+
+def new_agent(overrides=None, **kwargs):
+    from agno.agent import Agent
+    return Agent(**{**kwargs, **(overrides or {})})
+
+def new_team(overrides=None, **kwargs):
+    from agno.team import Team
+    return Team(**{**kwargs, **(overrides or {})})
+
+# Agents
+@registry.register
+def tavily_agent(**overrides):
+    return new_agent(
+        overrides,
+        name="Tavily Agent",
+        role=(
+            "You are a smart Tavily assistant. "
+            "Choose between crawl, extract, or search tools based on the input. "
+            "Use Search toolkit, if Input type is not URL"
+            "Always return valid JSON with the tool output. No explanations."
+        ),
+        model=openai_chat("gpt-4o"),
+        tools=[registry.crawl_toolkit, registry.extract_toolkit, registry.search_toolkit],
+    )
+
+@registry.register
+def flashcard_agent(**overrides):
+    return new_agent(
+        overrides,
+        name="Flashcard Agent",
+        role=(
+            "You are a flashcard generator. "
+            "Given extracted content, generate 5-10 flashcards as JSON: "
+            '{"flashcards": [{"question": "...", "answer": "..."}]}'
+            "No explanations or markdown. Only valid JSON."
+        ),
+        model=openai_chat("gpt-4o"),
+        response_model=FlashcardsOutput,
+    )
+
+@registry.register
+def summary_agent(**overrides):
+    return new_agent(
+        overrides,
+        name="Summary Agent",
+        role=(
+            "You are a content summarizer. "
+            "Given extracted content, generate a concise summary as JSON: "
+            '{"summary": "..."}'
+            "The summary should be 2-3 paragraphs long and capture the main points. "
+            "No explanations or markdown. Only valid JSON."
+        ),
+        model=openai_chat("gpt-4o"),
+        response_model=SummaryOutput,
+    )
+
+@registry.register
+def quiz_agent(**overrides):
+    return new_agent(
+        overrides,
+        name="Quiz Agent",
+        role=(
+            "You are a quiz generator. "
+            "Given content and parameters, generate a quiz as JSON: "
+            '{"quiz": {"title": "...", "description": "...", "questions": [{"question": "...", "options": ["...", "...", "...", "..."], "correct_answer": "..."}]}}'
+            "Generate questions based on the specified difficulty level (easy/medium/hard). "
+            "For easy questions, focus on basic facts and definitions. "
+            "For medium questions, include some analysis and understanding. "
+            "For hard questions, include complex concepts and critical thinking. "
+            "No explanations or markdown. Only valid JSON."
+        ),
+        model=openai_chat("gpt-4o"),
+        response_model=QuizOutput,
+    )
+
+
+@registry.register
+def audiobook_agent(**overrides):
+    return new_agent(
+        overrides,
+        name="Audiobook Agent",
+        role=(
+            "You are an audiobook script generator. "
+            "Given a topic, storytelling style, and duration, generate a script for an audiobook. "
+            "The script should be structured according to the requested style: "
+            "- Educational: informative and structured\n"
+            "- Conversational: casual and engaging\n"
+            "- Storytelling: narrative and immersive\n"
+            "- Interview: Q&A format\n"
+            "The script must be the correct length for the requested duration (e.g., 5 minutes of spoken audio, not more or less). "
+            "Always return valid JSON: {\"script\": \"...\"}. No explanations or markdown."
+        ),
+        model=openai_chat("gpt-4o"),
+        response_model=AudiobookScriptOutput,
+    )
 
 # Create a simpler audiobook agent that doesn't gather external content
-simple_audiobook_agent = Agent(
-    name="Simple Audiobook Agent",
-    role=(
-        "You are an audiobook script generator. "
-        "Generate a script based on the given topic, style, and duration. "
-        "Do NOT gather external information - create content based on your knowledge. "
-        "The script should be structured according to the requested style: "
-        "- Educational: informative and structured\n"
-        "- Conversational: casual and engaging\n"
-        "- Storytelling: narrative and immersive\n"
-        "- Interview: Q&A format\n"
-        "The script must be the correct length for the requested duration. "
-        "Always return valid JSON: {\"script\": \"...\"}. No explanations or markdown."
-    ),
-    model=OpenAIChat("gpt-4o"),
-)
+@registry.register
+def simple_audiobook_agent(**overrides):
+    return new_agent(
+        overrides,
+        name="Simple Audiobook Agent",
+        role=(
+            "You are an audiobook script generator. "
+            "Generate a script based on the given topic, style, and duration. "
+            "Do NOT gather external information - create content based on your knowledge. "
+            "The script should be structured according to the requested style: "
+            "- Educational: informative and structured\n"
+            "- Conversational: casual and engaging\n"
+            "- Storytelling: narrative and immersive\n"
+            "- Interview: Q&A format\n"
+            "The script must be the correct length for the requested duration. "
+            "Always return valid JSON: {\"script\": \"...\"}. No explanations or markdown."
+        ),
+        model=openai_chat("gpt-4o"),
+        response_model=AudiobookScriptOutput,
+    )
 
 # Storyboard Agents
-storyboard_content_agent = Agent(
-    name="Storyboard Content Agent",
-    role=(
-        "You are a storyboard creator. "
-        "Given a topic and number of scenes, create simple storyboard content. "
-        "Each storyboard should have: "
-        "- A clear image prompt for generating a visual "
-        "- Supporting text that describes the scene "
-        "Always return valid JSON: {\"storyboards\": [{\"scene_number\": 1, \"image_prompt\": \"...\", \"supporting_text\": \"...\"}]}. "
-        "No explanations or markdown. Only valid JSON."
-    ),
-    model=OpenAIChat("gpt-4o"),
-)
+@registry.register
+def storyboard_content_agent(**overrides):
+    return new_agent(
+        overrides,
+        name="Storyboard Content Agent",
+        role=(
+            "You are a storyboard creator. "
+            "Given a topic and number of scenes, create simple storyboard content. "
+            "Each storyboard should have: "
+            "- A clear image prompt for generating a visual "
+            "- Supporting text that describes the scene "
+            "Always return valid JSON: {\"storyboards\": [{\"scene_number\": 1, \"image_prompt\": \"...\", \"supporting_text\": \"...\"}]}. "
+            "No explanations or markdown. Only valid JSON."
+        ),
+        model=openai_chat("gpt-4o"),
+        response_model=StoryboardsOutput,
+    )
 
-image_agent = Agent(
-    name="Image Generation Agent",
-    role=(
-        "You are an image generation specialist. "
-        "Given an image prompt, generate a high-quality image using DALL-E 3. "
-        "Return the image URL as a simple string. "
-        "No JSON formatting, just the URL."
-    ),
-    model=OpenAIChat("gpt-4o"),
-    tools=[image_toolkit],
-)
+@registry.register
+def image_agent(**overrides):
+    return new_agent(
+        overrides,
+        name="Image Generation Agent",
+        role=(
+            "You are an image generation specialist. "
+            "Given an image prompt, generate a high-quality image using DALL-E 3. "
+            "Return the image URL as a simple string. "
+            "No JSON formatting, just the URL."
+        ),
+        model=openai_chat("gpt-4o"),
+        tools=[registry.image_toolkit],
+    )
 
-note_agent = Agent(
-    name="Note Agent",
-    role=(
-        "You are a note-taking specialist. "
-        "Given extracted content, generate detailed and structured notes as JSON: "
-        '{"notes": {"title": "...", "key_points": ["...", "..."], "detailed_summary": "..."}}'
-        "The notes should be comprehensive, well-organized, and capture the most important information. "
-        "Key points should be a list of bullet points. "
-        "The detailed summary should be a few paragraphs. "
-        "No explanations or markdown. Only valid JSON."
-    ),
-    model=OpenAIChat("gpt-4o"),
-)
+@registry.register
+def note_agent(**overrides):
+    return new_agent(
+        overrides,
+        name="Note Agent",
+        role=(
+            "You are a note-taking specialist. "
+            "Given extracted content, generate detailed and structured notes as JSON: "
+            '{"notes": {"title": "...", "key_points": ["...", "..."], "detailed_summary": "..."}}'
+            "The notes should be comprehensive, well-organized, and capture the most important information. "
+            "Key points should be a list of bullet points. "
+            "The detailed summary should be a few paragraphs. "
+            "No explanations or markdown. Only valid JSON."
+        ),
+        model=openai_chat("gpt-4o"),
+        response_model=NotesOutput,
+    )
 
-brainstorm_agent = Agent(
-    name="Brainstorm Agent",
-    role=(
-        "You are a creative brainstorming assistant. "
-        "Given a topic, problem, or prompt, generate a list of creative ideas, solutions, or approaches as JSON: "
-        '{"ideas": ["...", "...", "..."]}'
-        "Ideas should be diverse, actionable, and inspiring. "
-        "No explanations or markdown. Only valid JSON."
-    ),
-    model=OpenAIChat("gpt-4o"),
-)
+@registry.register
+def chunk_summary_agent(**overrides):
+    return new_agent(
+        overrides,
+        name="Chunk Summary Agent",
+        role=(
+            "You condense one section of a longer document. "
+            "Given a section, write a dense plain-text summary that keeps every key fact, "
+            "definition, name, number and example. "
+            "Do not add an introduction or conclusion. No JSON or markdown."
+        ),
+        model=openai_chat("gpt-4o"),
+    )
+
+@registry.register
+def brainstorm_agent(**overrides):
+    return new_agent(
+        overrides,
+        name="Brainstorm Agent",
+        role=(
+            "You are a creative brainstorming assistant. "
+            "Given a topic, problem, or prompt, generate a list of creative ideas, solutions, or approaches as JSON: "
+            '{"ideas": ["...", "...", "..."]}'
+            "Ideas should be diverse, actionable, and inspiring. "
+            "No explanations or markdown. Only valid JSON."
+        ),
+        model=openai_chat("gpt-4o"),
+        response_model=BrainstormOutput,
+    )
 
 # Teams
-tavily_flashcard_team = Team(
-    name="Tavily Flashcard Team",
-    mode="coordinate",
-    model=OpenAIChat("gpt-4o"),
-    members=[tavily_agent, flashcard_agent],
-    show_members_responses=True,
-    instructions=[
-        "If input looks like a search query, Tavily Agent handles it.",
-        "If input is a URL, Tavily Agent decides whether to crawl or extract.",
-        "If extracted content is available, Flashcard Agent generates flashcards.",
-        "Coordinate so flashcards are generated only after valid content extraction.",
-        "Return final JSON with either a 'result' or 'flashcards' key.",
-        "No markdown, explanations, or extra text — only valid JSON."
-    ],
-    success_criteria=(
-        "- Tavily Agent selects the correct tool and returns valid JSON.\n"
-        "- Flashcard Agent produces valid flashcard JSON when required.\n"
-        "- Final output is valid JSON with 'result' or 'flashcards'."
+@registry.register
+def tavily_flashcard_team(**overrides):
+    return new_team(
+        overrides,
+        name="Tavily Flashcard Team",
+        mode="coordinate",
+        model=openai_chat("gpt-4o"),
+        response_model=FlashcardsOutput,
+        members=[registry.tavily_agent, registry.flashcard_agent],
+        show_members_responses=True,
+        instructions=[
+            "If input looks like a search query, Tavily Agent handles it.",
+            "If input is a URL, Tavily Agent decides whether to crawl or extract.",
+            "If extracted content is available, Flashcard Agent generates flashcards.",
+            "Coordinate so flashcards are generated only after valid content extraction.",
+            "Return final JSON with either a 'result' or 'flashcards' key.",
+            "No markdown, explanations, or extra text — only valid JSON."
+        ],
+        success_criteria=(
+            "- Tavily Agent selects the correct tool and returns valid JSON.\n"
+            "- Flashcard Agent produces valid flashcard JSON when required.\n"
+            "- Final output is valid JSON with 'result' or 'flashcards'."
+        )
     )
-)
 
-tavily_summary_team = Team(
-    name="Tavily Summary Team",
-    mode="coordinate",
-    model=OpenAIChat("gpt-4o"),
-    members=[tavily_agent, summary_agent],
-    show_members_responses=True,
-    instructions=[
-        "If input is a URL, Tavily Agent extracts content.",
-        "If extracted content is available, Summary Agent generates a summary.",
-        "Coordinate so summary is generated only after valid content extraction.",
-        "Return final JSON with the summary.",
-        "No markdown, explanations, or extra text — only valid JSON."
-    ],
-    success_criteria="""
-    - Tavily Agent successfully extracts content from the URL.
-    - Summary Agent produces a concise summary of the content.
-    - Final output is valid JSON with the summary.
-    """
-)
+@registry.register
+def tavily_summary_team(**overrides):
+    return new_team(
+        overrides,
+        name="Tavily Summary Team",
+        mode="coordinate",
+        model=openai_chat("gpt-4o"),
+        response_model=SummaryOutput,
+        members=[registry.tavily_agent, registry.summary_agent],
+        show_members_responses=True,
+        instructions=[
+            "If input is a URL, Tavily Agent extracts content.",
+            "If extracted content is available, Summary Agent generates a summary.",
+            "Coordinate so summary is generated only after valid content extraction.",
+            "Return final JSON with the summary.",
+            "No markdown, explanations, or extra text — only valid JSON."
+        ],
+        success_criteria="""
+        - Tavily Agent successfully extracts content from the URL.
+        - Summary Agent produces a concise summary of the content.
+        - Final output is valid JSON with the summary.
+        """
+    )
 
-tavily_note_team = Team(
-    name="Tavily Note Team",
-    mode="coordinate",
-    model=OpenAIChat("gpt-4o"),
-    members=[tavily_agent, note_agent],
-    show_members_responses=True,
-    instructions=[
-        "If input is a URL, Tavily Agent extracts content.",
-        "If extracted content is available, Note Agent generates detailed notes.",
-        "Coordinate so notes are generated only after valid content extraction.",
-        "Return final JSON with the notes.",
-        "No markdown, explanations, or extra text — only valid JSON."
-    ],
-    success_criteria="""
-    - Tavily Agent successfully extracts content from the URL.
-    - Note Agent produces detailed, structured notes in valid JSON format.
-    - Final output is valid JSON with the notes.
-    """
-)
+@registry.register
+def tavily_note_team(**overrides):
+    return new_team(
+        overrides,
+        name="Tavily Note Team",
+        mode="coordinate",
+        model=openai_chat("gpt-4o"),
+        response_model=NotesOutput,
+        members=[registry.tavily_agent, registry.note_agent],
+        show_members_responses=True,
+        instructions=[
+            "If input is a URL, Tavily Agent extracts content.",
+            "If extracted content is available, Note Agent generates detailed notes.",
+            "Coordinate so notes are generated only after valid content extraction.",
+            "Return final JSON with the notes.",
+            "No markdown, explanations, or extra text — only valid JSON."
+        ],
+        success_criteria="""
+        - Tavily Agent successfully extracts content from the URL.
+        - Note Agent produces detailed, structured notes in valid JSON format.
+        - Final output is valid JSON with the notes.
+        """
+    )
 
-tavily_quiz_team = Team(
-    name="Tavily Quiz Team",
-    mode="coordinate",
-    model=OpenAIChat("gpt-4o"),
-    members=[tavily_agent, quiz_agent],
-    show_members_responses=True,
-    instructions=[
-        "If input is a URL, Tavily Agent extracts content.",
-        "If extracted content is available, Quiz Agent generates a quiz.",
-        "Generate the specified number of questions at the specified difficulty level.",
-        "Return final JSON with the quiz.",
-        "No markdown, explanations, or extra text — only valid JSON."
-    ],
-    success_criteria="""
-    - Tavily Agent successfully extracts content from the URL.
-    - Quiz Agent produces a quiz with the correct number of questions.
-    - Questions match the specified difficulty level.
-    - Final output is valid JSON with the quiz.
-    """,
-    show_tool_calls=True
-)
+@registry.register
+def tavily_quiz_team(**overrides):
+    return new_team(
+        overrides,
+        name="Tavily Quiz Team",
+        mode="coordinate",
+        model=openai_chat("gpt-4o"),
+        response_model=QuizOutput,
+        members=[registry.tavily_agent, registry.quiz_agent],
+        show_members_responses=True,
+        instructions=[
+            "If input is a URL, Tavily Agent extracts content.",
+            "If extracted content is available, Quiz Agent generates a quiz.",
+            "Generate the specified number of questions at the specified difficulty level.",
+            "Return final JSON with the quiz.",
+            "No markdown, explanations, or extra text — only valid JSON."
+        ],
+        success_criteria="""
+        - Tavily Agent successfully extracts content from the URL.
+        - Quiz Agent produces a quiz with the correct number of questions.
+        - Questions match the specified difficulty level.
+        - Final output is valid JSON with the quiz.
+        """,
+        show_tool_calls=True
+    )
 
-audiobook_team = Team(
-    name="Audiobook Team",
-    mode="coordinate",
-    model=OpenAIChat("gpt-4o"),
-    members=[tavily_agent, audiobook_agent],
-    show_members_responses=True,
-    instructions=[
-        "Tavily Agent gathers information on the topic.",
-        "Audiobook Agent generates a script in the requested style and duration.",
-        "Audio Agent converts the script to audio.",
-        "Return final JSON with the audio file path.",
-        "No markdown, explanations, or extra text — only valid JSON."
-    ],
-    success_criteria="""
-    - Tavily Agent gathers relevant content.
-    - Audiobook Agent produces a script matching the topic, style, and duration.
-    - Audio Agent generates audio from the script.
-    - Final output is valid JSON with the audio file path.
-    """
-)
+@registry.register
+def audiobook_team(**overrides):
+    return new_team(
+        overrides,
+        name="Audiobook Team",
+        mode="coordinate",
+        model=openai_chat("gpt-4o"),
+        response_model=AudiobookScriptOutput,
+        members=[registry.tavily_agent, registry.audiobook_agent],
+        show_members_responses=True,
+        instructions=[
+            "Tavily Agent gathers information on the topic.",
+            "Audiobook Agent generates a script in the requested style and duration.",
+            "Audio Agent converts the script to audio.",
+            "Return final JSON with the audio file path.",
+            "No markdown, explanations, or extra text — only valid JSON."
+        ],
+        success_criteria="""
+        - Tavily Agent gathers relevant content.
+        - Audiobook Agent produces a script matching the topic, style, and duration.
+        - Audio Agent generates audio from the script.
+        - Final output is valid JSON with the audio file path.
+        """
+    )
 
 # Simple audiobook team that doesn't gather external content
-simple_audiobook_team = Team(
-    name="Simple Audiobook Team",
-    mode="coordinate",
-    model=OpenAIChat("gpt-4o"),
-    members=[simple_audiobook_agent],
-    show_members_responses=True,
-    instructions=[
-        "Generate an audiobook script based on the topic, style, and duration.",
-        "Do not gather external information - create content based on knowledge.",
-        "Return final JSON with the script.",
-        "No markdown, explanations, or extra text — only valid JSON."
-    ],
-    success_criteria="""
-    - Generate a script matching the topic, style, and duration.
-    - Script is appropriate length for the requested duration.
-    - Final output is valid JSON with the script.
-    """
-)
+@registry.register
+def simple_audiobook_team(**overrides):
+    return new_team(
+        overrides,
+        name="Simple Audiobook Team",
+        mode="coordinate",
+        model=openai_chat("gpt-4o"),
+        response_model=AudiobookScriptOutput,
+        members=[registry.simple_audiobook_agent],
+        show_members_responses=True,
+        instructions=[
+            "Generate an audiobook script based on the topic, style, and duration.",
+            "Do not gather external information - create content based on knowledge.",
+            "Return final JSON with the script.",
+            "No markdown, explanations, or extra text — only valid JSON."
+        ],
+        success_criteria="""
+        - Generate a script matching the topic, style, and duration.
+        - Script is appropriate length for the requested duration.
+        - Final output is valid JSON with the script.
+        """
+    )
 
-storyboard_team = Team(
-    name="Storyboard Generation Team",
-    mode="coordinate",
-    model=OpenAIChat("gpt-4o"),
-    members=[storyboard_content_agent],
-    show_members_responses=True,
-    instructions=[
-        "Create {number_of_boards} storyboard scenes for the given topic.",
-        "Each scene should have an image prompt and supporting text.",
-        "Return final JSON with complete storyboard data.",
-        "No markdown, explanations, or extra text — only valid JSON."
-    ],
-    success_criteria="""
-    - Create the requested number of storyboard scenes.
-    - Each storyboard has scene_number, image_prompt, and supporting_text.
-    - Final output is valid JSON with complete storyboard data.
-    """
-)
+@registry.register
+def storyboard_team(**overrides):
+    return new_team(
+        overrides,
+        name="Storyboard Generation Team",
+        mode="coordinate",
+        model=openai_chat("gpt-4o"),
+        response_model=StoryboardsOutput,
+        members=[registry.storyboard_content_agent],
+        show_members_responses=True,
+        instructions=[
+            "Create {number_of_boards} storyboard scenes for the given topic.",
+            "Each scene should have an image prompt and supporting text.",
+            "Return final JSON with complete storyboard data.",
+            "No markdown, explanations, or extra text — only valid JSON."
+        ],
+        success_criteria="""
+        - Create the requested number of storyboard scenes.
+        - Each storyboard has scene_number, image_prompt, and supporting_text.
+        - Final output is valid JSON with complete storyboard data.
+        """
+    )
 
 # Helper
 def is_valid_url(url):
     return re.match(r"^https?://", url) or re.match(r"^[\w\.-]+\.[a-z]{2,}", url)
 
+def is_fresh(data):
+    """
+    Whether a request asks to bypass the caches; only a JSON true does
+    """
+    return data.get('fresh') is True
+
+def validate_generation_mode(data, modes):
+    """
+    Validate the optional mode of a generation request.
+    Returns (mode, error_response).
+    """
+    mode = data.get('mode', GENERATION_MODE)
+    if mode not in modes:
+        return None, (jsonify({
+            "status": "error",
+            "message": f"Mode must be one of: {', '.join(modes)}"
+        }), 400)
+    return mode, None
+
 def estimate_tokens(text):
     """
-    Rough estimation of tokens (1 token ≈ 4 characters for English text)
+    Count tokens with the gpt-4o tokenizer
     """
-    return len(text) // 4
+    return count_tokens(text)
 
 def validate_token_limit(text, max_tokens=25000):
     """
     Validate if text is within token limits
     """
-    estimated_tokens = estimate_tokens(text)
-    return estimated_tokens <= max_tokens, estimated_tokens
+    return within_token_limit(text, max_tokens)
 
 def truncate_content(content, max_tokens=20000):
     """
@@ -395,21 +674,17 @@ def truncate_content(content, max_tokens=20000):
     if not content:
         return content
     
-    estimated_tokens = estimate_tokens(content)
-    if estimated_tokens <= max_tokens:
+    truncated = truncate_to_tokens(content, max_tokens)
+    if truncated == content:
         return content
     
-    # Calculate how many characters we can keep
-    max_chars = max_tokens * 4
-    truncated = content[:max_chars]
-    
     # Try to truncate at a sentence boundary
     last_period = truncated.rfind('.')
     last_exclamation = truncated.rfind('!')
     last_question = truncated.rfind('?')
     
     last_sentence_end = max(last_period, last_exclamation, last_question)
-    if last_sentence_end > max_chars * 0.8:  # If we can find a sentence end in the last 20%
+    if last_sentence_end > len(truncated) * 0.8:  # If we can find a sentence end in the last 20%
         truncated = truncated[:last_sentence_end + 1]
     
     return truncated + " [Content truncated due to length limits]"
@@ -437,190 +712,724 @@ def handle_openai_rate_limit_error(error_message):
             "error_type": "general"
         }
 
-def safe_team_run(team, task, max_tokens=25000):
+def estimate_run_usage(runner, task):
+    """
+    Estimate the (tokens, requests) a single agent or team run will consume.
+    Coordinate-mode teams make several model calls and resend the task to each.
+    """
+    from agno.team import Team
+
+    calls = TEAM_CALLS_PER_RUN if isinstance(runner, Team) else 1
+    return (estimate_tokens(task) + RUN_OUTPUT_TOKENS) * calls, calls
+
+def run_metric(result, name):
+    """
+    Sum of one metric over the model calls in an agno run response, or None if unavailable
+    """
+    metrics = getattr(result, "metrics", None)
+    if not isinstance(metrics, dict) or name not in metrics:
+        return None
+    values = metrics[name]
+    return sum(value for value in values if value) if isinstance(values, list) else values
+
+def response_token_usage(result):
+    """
+    Total tokens reported in an agno run response's metrics, or None if unavailable.
+    A team's metrics only cover its leader, so members' runs are added in.
+    """
+    total = run_metric(result, "total_tokens")
+    if total is None:
+        return None
+    for member in getattr(result, "member_responses", None) or []:
+        total += response_token_usage(member) or 0
+    return total
+
+def stream_token_usage(runner, run_id, streamed, reservation):
+    """
+    Tokens used by the streamed run whose events carried run_id. The runner's
+    run_response is only trusted if it is still that run; otherwise usage is the
+    reserved prompt estimate plus the tokens of the streamed content.
+    """
+    result = getattr(runner, "run_response", None)
+    if run_id and getattr(result, "run_id", None) == run_id:
+        usage = response_token_usage(result)
+        if usage is not None:
+            return usage
+    prompt_tokens = reservation.tokens - RUN_OUTPUT_TOKENS * reservation.requests
+    return prompt_tokens + estimate_tokens("".join(streamed))
+
+def record_run_metrics(runner, result):
+    """
+    Export token counts for a finished run. For coordinate-mode teams the
+    members' latency and tokens are exported separately from the leader's.
+    """
+    record_tokens(runner.name, run_metric(result, "input_tokens"), run_metric(result, "output_tokens"))
+    for member in getattr(result, "member_responses", None) or []:
+        name = getattr(member, "agent_name", None) or getattr(member, "team_name", None) or "member"
+        record_tokens(name, run_metric(member, "input_tokens"), run_metric(member, "output_tokens"))
+        observe_stage(f"member:{name}", run_metric(member, "time"))
+
+def budgeted_run(runner, task, max_wait=None, **kwargs):
+    """
+    Run an agent or team after reserving its estimated tokens from the shared
+    budget, then reconcile the reservation with the actual usage.
+    max_wait overrides RATE_BUDGET_MAX_WAIT for the reservation.
+    """
+    tokens, calls = estimate_run_usage(runner, task)
+    reservation = token_budget.reserve(tokens, calls, max_wait=max_wait)
+    if kwargs.get("stream"):
+        return reconciled_stream(runner, runner.run(task, **kwargs), reservation)
+
+    with track(f"run:{runner.name}"):
+        result = runner.run(task, **kwargs)
+    token_budget.reconcile(reservation, response_token_usage(result))
+    record_run_metrics(runner, result)
+    return result
+
+def reconciled_stream(runner, stream, reservation):
+    """
+    Pass a streamed run's events through, then reconcile its reservation with the
+    run's usage; a stream closed early keeps the full reservation
+    """
+    run_id, streamed, finished = None, [], False
+    try:
+        for event in stream:
+            run_id = run_id or getattr(event, "run_id", None)
+            if isinstance(getattr(event, "content", None), str):
+                streamed.append(event.content)
+            yield event
+        finished = True
+    finally:
+        usage = stream_token_usage(runner, run_id, streamed, reservation) if finished else None
+        token_budget.reconcile(reservation, usage)
+
+def safe_team_run(team, task, max_tokens=25000, max_wait=None):
     """
     Safely run a team with error handling for rate limits
     """
     try:
         # Validate task length
-        is_valid, token_count = validate_token_limit(task, max_tokens)
-        if not is_valid:
-            return None, {
-                "status": "error",
-                "message": f"Request too long ({token_count} tokens). Please use shorter input.",
-                "error_type": "token_limit"
-            }
-        
-        result = team.run(task)
+        error = token_limit_error(task, max_tokens)
+        if error:
+            return None, error
+
+        result = budgeted_run(team, task, max_wait=max_wait)
         return result, None
         
     except Exception as e:
-        error_str = str(e)
-        app.logger.error(f"Team run error: {error_str}")
-        
-        # Handle OpenAI rate limit errors
-        if "Request too large" in error_str or "tokens per min" in error_str:
-            return None, handle_openai_rate_limit_error(error_str)
-        elif "rate limit" in error_str.lower():
-            return None, handle_openai_rate_limit_error(error_str)
-        else:
-            return None, {
-                "status": "error",
-                "message": f"Processing failed: {error_str}",
-                "error_type": "general"
-            }
+        return None, team_run_error(e)
 
-def validate_storyboard_params(data):
+def token_limit_error(task, max_tokens=25000):
     """
-    Validate storyboard generation parameters
+    Error response for a task over the token limit, or None if it fits
     """
-    required_fields = ['description', 'number_of_boards']
-    
-    for field in required_fields:
-        if field not in data:
-            return False, f"Missing required field: {field}"
-    
-    # Validate number_of_boards
-    try:
-        num_boards = int(data['number_of_boards'])
-        if num_boards < 1 or num_boards > 10:
-            return False, "number_of_boards must be between 1 and 10"
-    except (ValueError, TypeError):
-        return False, "number_of_boards must be a valid integer"
-    
-    return True, "Valid"
+    is_valid, token_count = validate_token_limit(task, max_tokens)
+    if is_valid:
+        return None
+    record_error("safe_team_run", "token_limit")
+    return {
+        "status": "error",
+        "message": f"Request too long ({token_count} tokens). Please use shorter input.",
+        "error_type": "token_limit"
+    }
+
+def team_run_error(e):
+    """
+    Error response for a failed agent or team run
+    """
+    error_str = str(e)
+    app.logger.error(f"Team run error: {error_str}")
+
+    # Handle OpenAI rate limit errors
+    if "Request too large" in error_str or "tokens per min" in error_str:
+        error = handle_openai_rate_limit_error(error_str)
+    elif "rate limit" in error_str.lower():
+        error = handle_openai_rate_limit_error(error_str)
+    else:
+        error = {
+            "status": "error",
+            "message": f"Processing failed: {error_str}",
+            "error_type": "general"
+        }
+    record_error("safe_team_run", error["error_type"])
+    return error
 
-# Add CORS preflight handler
-@app.before_request
-def handle_preflight():
-    if request.method == "OPTIONS":
-        response = app.make_default_options_response()
-        origin = request.headers.get("Origin")
-        if origin in ALLOWED_ORIGINS:
-            response.headers["Access-Control-Allow-Origin"] = origin
-        else:
-            response.headers["Access-Control-Allow-Origin"] = "*"
-        response.headers["Access-Control-Allow-Methods"] = "GET, POST, OPTIONS"
-        response.headers["Access-Control-Allow-Headers"] = "Content-Type, Accept, Authorization"
-        response.headers["Access-Control-Allow-Credentials"] = "true"
-        return response
+def extract_url_content(url):
+    """
+    Extract page text for a URL directly through the Tavily extract toolkit
+    """
+    return extracted_text(registry.extract_toolkit.extract_results([url]))
 
-@app.after_request
-def after_request(response):
-    # Add CORS headers to all responses
-    origin = request.headers.get("Origin")
-    if origin in ALLOWED_ORIGINS:
-        response.headers["Access-Control-Allow-Origin"] = origin
-    else:
-        # For development or if origin is not in allowed list, allow all
-        response.headers["Access-Control-Allow-Origin"] = "*"
-    response.headers["Access-Control-Allow-Methods"] = "GET, POST, OPTIONS"
-    response.headers["Access-Control-Allow-Headers"] = "Content-Type, Accept, Authorization"
-    response.headers["Access-Control-Allow-Credentials"] = "true"
-    return response
+def extracted_text(response):
+    """
+    Page text from a Tavily extract response, with boilerplate and repeated paragraphs removed
+    """
+    return normalize_extract_response(response)
 
-@app.route('/')
-def index():
-    return 'Hello, 100Agents!'
+def search_query_content(query):
+    """
+    Search for a query through the Tavily search toolkit and return the answer and page text
+    """
+    return search_text(registry.search_toolkit.search_results(query))
 
-@app.route('/generate-flashcards', methods=['POST', 'OPTIONS'])
-def generate_flashcards():
-    if request.method == 'OPTIONS':
-        return '', 200
-        
-    try:
-        data = request.get_json()
-        if not data:
-            return jsonify({
-                "status": "error",
-                "message": "No JSON data provided"
-            }), 400
-            
-        url = data.get('url')
-        if not url:
-            return jsonify({
-                "status": "error",
-                "message": "URL is required"
-            }), 400
+def search_text(response):
+    """
+    Answer and page text from a Tavily search response, with boilerplate and repeated paragraphs removed
+    """
+    return normalize_search_response(response)
 
-        # Validate URL
-        if not is_valid_url(url):
-            return jsonify({
-                "status": "error",
-                "message": "Invalid URL provided"
-            }), 400
+# Goals given to the generator agents along with the extracted content
+FLASHCARDS_GOAL = "Generate flashcards from the content below and return them in valid JSON format."
+SUMMARY_GOAL = "Generate a concise summary of the content below and return it in valid JSON format."
+NOTES_GOAL = "Generate detailed, structured notes from the content below and return them in valid JSON format."
 
-        # Normalize URL if needed
-        if not url.startswith(("http://", "https://")):
-            url = "https://" + url
+def quiz_goal(num_questions, difficulty):
+    return (
+        f"Generate a quiz with {num_questions} questions at {difficulty} difficulty from the content below. "
+        "Each question should have 4 options and one correct answer. Return the quiz in valid JSON format."
+    )
 
-        # Build task
-        task = f"""
-        Input URL: {url}
+def build_content_task(url, goal, content):
+    """
+    Task for a generator agent that receives already-extracted content
+    """
+    return f"""
+    Source URL: {url}
 
-        GOAL:
-        - Extract content from the provided URL
-        - Generate flashcards from the extracted content
-        - Return flashcards in valid JSON format
-        """
+    GOAL:
+    {goal}
 
-        result, error = safe_team_run(tavily_flashcard_team, task)
-        if error:
-            return jsonify(error), 500
-        
-        raw_output = result.content.strip()
+    CONTENT:
+    {content}
+    """
 
-        # Clean up any code fences and extract JSON
-        cleaned_output = re.sub(r"^```json|^```|```$", "", raw_output, flags=re.MULTILINE).strip()
-        app.logger.info(f"Team raw output: {cleaned_output}")
+def copy_agent(agent, **update):
+    """
+    Fresh, unshared instance of a registry agent, built by its factory with fields replaced by update.
+    Agent.deep_copy() fails for team members once their team has run, so copies are rebuilt instead.
+    """
+    return registry.build(registry.name_of(agent), **update)
 
-        # Extract JSON part from the response
-        json_match = re.search(r'(\{.*\})', cleaned_output, re.DOTALL)
-        if not json_match:
-            return jsonify({
-                "status": "error",
-                "message": "No valid JSON found in response"
-            }), 500
+def copy_team(team, **update):
+    """
+    Fresh, unshared instance of a registry team whose members are fresh copies too
+    """
+    members = [copy_agent(member) for member in team.members]
+    return registry.build(registry.name_of(team), members=members, **update)
 
-        json_str = json_match.group(1)
-        response_data = json.loads(json_str)
-        
-        # Format the response to match the expected structure
-        return jsonify({
-            "status": "success",
-            "data": {
-                "flashcards": response_data.get("flashcards", [])
-            }
-        })
+def summarize_chunk(url, index, total, chunk):
+    """
+    Map step: condense one chunk of a long document
+    """
+    # Agents keep per-run state on the instance, so each thread runs its own copy
+    agent = copy_agent(registry.chunk_summary_agent)
+    return safe_team_run(agent, build_chunk_task(url, index, total, chunk), max_wait=map_wait(total))
 
-    except json.JSONDecodeError as e:
-        app.logger.error(f"JSON decode failed: {str(e)}")
-        return jsonify({
-            "status": "error",
-            "message": "Invalid JSON returned by team"
-        }), 500
+def build_chunk_task(url, index, total, chunk):
+    return build_content_task(url, f"Condense section {index + 1} of {total} of the document.", chunk)
 
-    except Exception as e:
-        app.logger.error(f"General error: {str(e)}")
-        return jsonify({
-            "status": "error",
-            "message": str(e)
-        }), 500
+def map_chunks(url, content):
+    """
+    Split content for the map step
+    """
+    chunks = split_into_token_chunks(content, MAP_REDUCE_CHUNK_TOKENS)
+    app.logger.info(f"{url} split into {len(chunks)} chunks for the map step")
+    return chunks
 
+def paced_wait(tokens):
+    """
+    Budget wait for a run queued behind tokens worth of the same document's reservations:
+    the usual RATE_BUDGET_MAX_WAIT plus the time the bucket takes to refill them, so a long
+    document is paced over as many budget windows as it needs instead of failing
+    """
+    return token_budget.max_wait + tokens * 60.0 / token_budget.tokens_per_minute
 
-@app.route('/generate-summary', methods=['POST', 'OPTIONS'])
-def generate_summary():
-    if request.method == 'OPTIONS':
-        return '', 200
-        
-    try:
-        data = request.get_json()
-        if not data:
-            return jsonify({
-                "status": "error",
-                "message": "No JSON data provided"
-            }), 400
-            
+def map_wait(chunk_count):
+    return paced_wait(chunk_count * MAP_REDUCE_CHUNK_COST)
+
+def reduce_wait():
+    # The reduce run follows a map step that drained the bucket, and its condensed
+    # content is at most MAP_REDUCE_THRESHOLD_TOKENS
+    return paced_wait(MAP_REDUCE_THRESHOLD_TOKENS + RUN_OUTPUT_TOKENS)
+
+def join_sections(outcomes):
+    """
+    Combine the map step's (result, error) outcomes into ordered section summaries.
+    Returns (content, error).
+    """
+    sections = []
+    for index, (result, error) in enumerate(outcomes):
+        if error:
+            return None, error
+        sections.append(f"[Section {index + 1}]\n{result.content.strip()}")
+    return "\n\n".join(sections), None
+
+def condense_content(url, content):
+    """
+    Condense content into ordered section summaries that fit the generation budget.
+    Returns (condensed_content, error) in the same style as safe_team_run.
+    """
+    for _ in range(MAP_REDUCE_MAX_ROUNDS):
+        chunks = map_chunks(url, content)
+        with ThreadPoolExecutor(max_workers=min(MAP_REDUCE_MAX_WORKERS, len(chunks))) as executor:
+            outcomes = list(executor.map(
+                lambda item: summarize_chunk(url, item[0], len(chunks), item[1]),
+                enumerate(chunks)
+            ))
+
+        content, error = join_sections(outcomes)
+        if error:
+            return None, error
+
+        if count_tokens(content) <= MAP_REDUCE_THRESHOLD_TOKENS:
+            return content, None
+
+    return truncate_content(content, MAP_REDUCE_THRESHOLD_TOKENS), None
+
+def build_reduce_goal(agent_goal):
+    return agent_goal + " The content consists of ordered section summaries that together cover the whole document."
+
+def map_reduce_generation(agent, agent_goal, url, content, max_tokens=25000):
+    """
+    Reduce step: generate the final output from the condensed sections of a long document.
+    Content that already fits in one chunk is passed to the agent as is.
+    """
+    max_wait = None
+    if count_tokens(content) > MAP_REDUCE_CHUNK_TOKENS:
+        content, error = condense_content(url, content)
+        if error:
+            return None, error
+        agent_goal = build_reduce_goal(agent_goal)
+        max_wait = reduce_wait()
+
+    task = build_content_task(url, agent_goal, content)
+    return safe_team_run(copy_agent(agent), task, max_tokens, max_wait=max_wait)
+
+def run_url_generation(team, team_task, agent, agent_goal, url, mode=None, max_tokens=25000, map_reduce=False):
+    """
+    Run a URL-based generation.
+    In "pipeline" mode the content is extracted directly and passed to the single
+    generator agent; the coordinate-mode team is used when mode is "team" or when
+    direct extraction fails or returns nothing.
+    With map_reduce enabled, content over MAP_REDUCE_THRESHOLD_TOKENS (or any content
+    in "mapreduce" mode) goes through map_reduce_generation instead of being truncated.
+    """
+    mode = mode or GENERATION_MODE
+    if mode in ("pipeline", "mapreduce"):
+        try:
+            content = extract_url_content(url)
+        except Exception as e:
+            app.logger.error(f"Direct extraction failed, falling back to team: {str(e)}")
+            content = ""
+
+        if content:
+            if map_reduce and (mode == "mapreduce" or count_tokens(content) > MAP_REDUCE_THRESHOLD_TOKENS):
+                return map_reduce_generation(agent, agent_goal, url, content, max_tokens)
+            task = build_content_task(url, agent_goal, truncate_content(content))
+            return safe_team_run(copy_agent(agent), task, max_tokens)
+
+        app.logger.info(f"No content extracted for {url}, falling back to team")
+
+    return safe_team_run(copy_team(team), team_task, max_tokens)
+
+def parse_json_output(raw_output):
+    """
+    Strip code fences from a plain-text agent response and parse the JSON object in it
+    """
+    cleaned_output = re.sub(r"^```json|^```|```$", "", raw_output.strip(), flags=re.MULTILINE).strip()
+    json_match = re.search(r'(\{.*\})', cleaned_output, re.DOTALL)
+    if not json_match:
+        raise ValueError("No valid JSON found in response")
+    return json.loads(json_match.group(1))
+
+def parse_structured_output(content):
+    """
+    Return an agent or team response as a dict.
+    Runs with a response_model carry the parsed pydantic object; plain-text
+    responses (streamed runs, or a reply the model failed to structure) are
+    parsed with parse_json_output.
+    """
+    if isinstance(content, BaseModel):
+        return content.model_dump()
+    if isinstance(content, dict):
+        return content
+    return parse_json_output(content or "")
+
+def generation_payload(result, error, output_key, default):
+    """
+    Turn a generation run into the endpoint's (payload, status_code) response
+    """
+    if error:
+        return error, 500
+
+    app.logger.info(f"Team raw output: {result.content}")
+    try:
+        response_data = parse_structured_output(result.content)
+    except json.JSONDecodeError as e:
+        app.logger.error(f"JSON decode failed: {str(e)}")
+        return {
+            "status": "error",
+            "message": "Invalid JSON returned by team"
+        }, 500
+    except ValueError as e:
+        return {
+            "status": "error",
+            "message": str(e)
+        }, 500
+
+    return {
+        "status": "success",
+        "data": {
+            output_key: response_data.get(output_key, default)
+        }
+    }, 200
+
+def prompt_version(*runners):
+    """
+    Fingerprint of the prompts behind a generation.
+    Cached responses are keyed on it, so editing an agent's role or a team's
+    instructions invalidates them.
+    """
+    parts = []
+    for runner in runners:
+        parts.append([
+            runner.name,
+            getattr(runner, "role", None),
+            runner.description,
+            runner.instructions,
+            getattr(runner, "success_criteria", None),
+            getattr(runner.model, "id", None)
+        ])
+    return make_cache_key(*parts)[:16]
+
+# Response cache keys: endpoint, normalized input, parameters and prompt version
+def flashcards_cache_key(url, mode):
+    return make_cache_key("flashcards", normalize_url(url), mode, prompt_version(registry.tavily_flashcard_team, registry.tavily_agent, registry.flashcard_agent))
+
+def summary_cache_key(url, mode):
+    return make_cache_key("summary", normalize_url(url), mode, prompt_version(registry.tavily_summary_team, registry.tavily_agent, registry.summary_agent, registry.chunk_summary_agent))
+
+def notes_cache_key(url, mode):
+    return make_cache_key("notes", normalize_url(url), mode, prompt_version(registry.tavily_note_team, registry.tavily_agent, registry.note_agent, registry.chunk_summary_agent))
+
+def quiz_cache_key(url, query, num_questions, difficulty, mode):
+    return make_cache_key(
+        "quiz", normalize_url(url) if url else query.strip().lower(), num_questions, difficulty, mode,
+        prompt_version(registry.tavily_quiz_team, registry.tavily_agent, registry.quiz_agent)
+    )
+
+def cached_generation(key, fresh, fn, *args):
+    """
+    Serve a generation from the response cache, or run it once for all concurrent
+    identical requests and cache it if it succeeded. fresh skips the cache lookup.
+    """
+    if not fresh:
+        payload = response_cache.get(key)
+        if payload is not None:
+            return payload, 200
+
+    def generate():
+        payload, status_code = fn(*args)
+        if status_code == 200:
+            response_cache.set(key, payload)
+        return payload, status_code
+
+    return single_flight.do(key, generate)
+
+def build_flashcards(url, mode):
+    """
+    Generate flashcards for a URL
+    """
+    # Build task
+    task = f"""
+    Input URL: {url}
+
+    GOAL:
+    - Extract content from the provided URL
+    - Generate flashcards from the extracted content
+    - Return flashcards in valid JSON format
+    """
+
+    result, error = run_url_generation(
+        registry.tavily_flashcard_team, task,
+        registry.flashcard_agent, FLASHCARDS_GOAL,
+        url, mode
+    )
+    return generation_payload(result, error, "flashcards", [])
+
+def build_summary(url, mode):
+    """
+    Generate a summary for a URL
+    """
+    # Build task
+    task = f"""
+    Input URL: {url}
+
+    GOAL:
+    - Extract content from the provided URL
+    - Generate a concise summary of the content
+    - Return summary in valid JSON format
+    """
+
+    result, error = run_url_generation(
+        registry.tavily_summary_team, task,
+        registry.summary_agent, SUMMARY_GOAL,
+        url, mode, map_reduce=True
+    )
+    return generation_payload(result, error, "summary", "")
+
+def build_notes(url, mode):
+    """
+    Generate notes for a URL
+    """
+    # Build task
+    task = f"""
+    Input URL: {url}
+
+    GOAL:
+    - Extract content from the provided URL.
+    - Generate detailed, structured notes from the extracted content.
+    - Return notes in valid JSON format.
+    """
+
+    result, error = run_url_generation(
+        registry.tavily_note_team, task,
+        registry.note_agent, NOTES_GOAL,
+        url, mode, map_reduce=True
+    )
+    return generation_payload(result, error, "notes", {})
+
+def build_quiz(url, query, num_questions, difficulty, mode):
+    """
+    Generate a quiz for a URL or search query
+    """
+    # Build task
+    task = f"""
+    Input: {url if url else query}
+    Input Type: {"URL" if url else "Search Query"}
+    Number of Questions: {num_questions}
+    Difficulty Level: {difficulty}
+
+    GOAL:
+    - If URL is provided, extract content from it
+    - If search query is provided, search for relevant content
+    - Generate a quiz with {num_questions} questions at {difficulty} difficulty
+    - Each question should have 4 options and one correct answer
+    - Return quiz in valid JSON format
+    """
+
+    if url:
+        result, error = run_url_generation(
+            registry.tavily_quiz_team, task,
+            registry.quiz_agent,
+            quiz_goal(num_questions, difficulty),
+            url, mode
+        )
+    else:
+        result, error = safe_team_run(copy_team(registry.tavily_quiz_team), task)
+    return generation_payload(result, error, "quiz", {})
+
+def job_accepted_response(job_id):
+    """
+    Response body for a generation accepted as a background job
+    """
+    return {
+        "status": "pending",
+        "data": {
+            "job_id": job_id,
+            "status_url": f"/jobs/{job_id}"
+        }
+    }
+
+def wait_for_job(job_id, accepted, timeout=25):
+    """
+    Respond with the job's result if it finishes within timeout; otherwise accept it
+    with 202 and the accepted body, and the client polls for the result
+    """
+    job = job_queue.wait(job_id, timeout=timeout)
+    if job is None:
+        return jsonify(accepted), 202
+    return jsonify(job_result_payload(job)), job["status_code"] or 500
+
+def job_result_payload(job):
+    """
+    Endpoint response body for a finished job
+    """
+    if job["result"] is not None:
+        return job["result"]
+    return {
+        "status": "error",
+        "message": job["error"] or "Job failed"
+    }
+
+def sse_event(event, data):
+    """
+    Format one Server-Sent Events message with a JSON payload
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def stream_agent_content(agent, task, max_wait=None):
+    """
+    Run an agent with streaming enabled and yield the text deltas as they arrive
+    """
+    # Structured output only arrives once the run is complete, so stream from a
+    # plain-text copy of the agent; its role still asks for the same JSON shape.
+    # The copy also keeps this run's usage apart for reconciling the token budget.
+    agent = copy_agent(agent, response_model=None)
+    for chunk in budgeted_run(agent, task, max_wait=max_wait, stream=True):
+        event = getattr(chunk, "event", None)
+        if event in ("RunError", "TeamRunError"):
+            raise Exception(chunk.content or "Streaming run failed")
+        if event in ("RunResponseContent", "TeamRunResponseContent") and isinstance(chunk.content, str) and chunk.content:
+            yield chunk.content
+
+def stream_error(e):
+    """
+    Payload of the "error" event for a streamed generation that failed
+    """
+    app.logger.error(f"Streaming generation failed: {str(e)}")
+    error = handle_openai_rate_limit_error(str(e))
+    if error["error_type"] == "general":
+        error["message"] = str(e)
+    return error
+
+def sse_response(generator):
+    """
+    Wrap an event generator in an unbuffered text/event-stream response
+    """
+    return Response(
+        stream_with_context(generator),
+        mimetype="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+def validate_audiobook_params(data):
+    """
+    Validate audiobook generation parameters
+    """
+    if not data.get('topic'):
+        return False, "Topic is required"
+
+    # Validate style
+    valid_styles = ['Educational', 'Conversational', 'Storytelling', 'Interview']
+    if data.get('style', 'Educational') not in valid_styles:
+        return False, f"Style must be one of: {', '.join(valid_styles)}"
+
+    # Validate duration (in seconds)
+    duration = data.get('duration', 30)
+    if not isinstance(duration, int) or duration < 10 or duration > 300:
+        return False, "Duration must be between 10 and 300 seconds"
+
+    return True, "Valid"
+
+def build_audiobook_task(topic, style, duration):
+    """
+    Task for audiobook script generation
+    """
+    return f"""
+        Topic: {topic}
+        Style: {style}
+        Duration: {duration} seconds
+        
+        Generate an audiobook script for {duration} seconds of audio content.
+        The script should be appropriate for {duration} seconds of spoken audio.
+        """
+
+def finalize_audiobook(script, audio_result, topic, style, duration, voice_id):
+    """
+    Store the audio record for a synthesized audiobook and build the response data.
+    The record keeps the ElevenLabs history item ids the synthesis responses carried;
+    cached audio keeps the ids recorded when it was first synthesized.
+    """
+    audio_data = {
+        "script": script,
+        "audio_url": f"/audio-files/{audio_result['audio_file_name']}",  # Local file URL
+        "audio_file": audio_result["audio_file"],  # Local file path
+        "audio_file_name": audio_result["audio_file_name"],
+        "topic": topic,
+        "style": style,
+        "duration": duration,
+        "voice_id": voice_id
+    }
+    history_item_ids = audio_result.get("history_item_ids")
+    if history_item_ids is None:
+        previous = registry.elabs_toolkit.read_audio_record(audio_result["audio_file_name"]) or {}
+        history_item_ids = previous.get("history_item_ids", [])
+    registry.elabs_toolkit.save_audio_record(
+        audio_result["audio_file_name"], dict(audio_data, history_item_ids=history_item_ids)
+    )
+
+    return audio_data
+
+def validate_storyboard_params(data):
+    """
+    Validate storyboard generation parameters
+    """
+    required_fields = ['description', 'number_of_boards']
+    
+    for field in required_fields:
+        if field not in data:
+            return False, f"Missing required field: {field}"
+    
+    # Validate number_of_boards
+    try:
+        num_boards = int(data['number_of_boards'])
+        if num_boards < 1 or num_boards > 10:
+            return False, "number_of_boards must be between 1 and 10"
+    except (ValueError, TypeError):
+        return False, "number_of_boards must be a valid integer"
+    
+    return True, "Valid"
+
+# Add CORS preflight handler
+@app.before_request
+def handle_preflight():
+    if request.method == "OPTIONS":
+        response = app.make_default_options_response()
+        origin = request.headers.get("Origin")
+        if origin in ALLOWED_ORIGINS:
+            response.headers["Access-Control-Allow-Origin"] = origin
+        else:
+            response.headers["Access-Control-Allow-Origin"] = "*"
+        response.headers["Access-Control-Allow-Methods"] = "GET, POST, OPTIONS"
+        response.headers["Access-Control-Allow-Headers"] = "Content-Type, Accept, Authorization"
+        response.headers["Access-Control-Allow-Credentials"] = "true"
+        return response
+
+@app.after_request
+def after_request(response):
+    # Add CORS headers to all responses
+    origin = request.headers.get("Origin")
+    if origin in ALLOWED_ORIGINS:
+        response.headers["Access-Control-Allow-Origin"] = origin
+    else:
+        # For development or if origin is not in allowed list, allow all
+        response.headers["Access-Control-Allow-Origin"] = "*"
+    response.headers["Access-Control-Allow-Methods"] = "GET, POST, OPTIONS"
+    response.headers["Access-Control-Allow-Headers"] = "Content-Type, Accept, Authorization"
+    response.headers["Access-Control-Allow-Credentials"] = "true"
+    return response
+
+@app.route('/')
+def index():
+    return 'Hello, 100Agents!'
+
+@app.route('/generate-flashcards', methods=['POST', 'OPTIONS'])
+def generate_flashcards():
+    if request.method == 'OPTIONS':
+        return '', 200
+        
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({
+                "status": "error",
+                "message": "No JSON data provided"
+            }), 400
+            
         url = data.get('url')
         if not url:
             return jsonify({
@@ -639,52 +1448,568 @@ def generate_summary():
         if not url.startswith(("http://", "https://")):
             url = "https://" + url
 
-        # Build task
-        task = f"""
-        Input URL: {url}
+        mode, error = validate_generation_mode(data, GENERATION_MODES)
+        if error:
+            return error
 
-        GOAL:
-        - Extract content from the provided URL
-        - Generate a concise summary of the content
-        - Return summary in valid JSON format
-        """
+        # Repeated requests are answered from the response cache unless fresh is set;
+        # identical requests in flight at the same time share one generation
+        fresh = is_fresh(data)
+        payload, status_code = cached_generation(
+            flashcards_cache_key(url, mode),
+            fresh, build_flashcards, url, mode
+        )
+        return jsonify(payload), status_code
+
+    except Exception as e:
+        app.logger.error(f"General error: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 500
+
+@app.route('/generate-flashcards/stream', methods=['POST', 'OPTIONS'])
+def generate_flashcards_stream():
+    """
+    Stream flashcard generation as Server-Sent Events.
+    Each card is sent as a "flashcard" event as soon as the model finishes it.
+    """
+    if request.method == 'OPTIONS':
+        return '', 200
+
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({
+            "status": "error",
+            "message": "No JSON data provided"
+        }), 400
 
-        result, error = safe_team_run(tavily_summary_team, task)
+    url = data.get('url')
+    if not url:
+        return jsonify({
+            "status": "error",
+            "message": "URL is required"
+        }), 400
+
+    if not is_valid_url(url):
+        return jsonify({
+            "status": "error",
+            "message": "Invalid URL provided"
+        }), 400
+
+    # Normalize URL if needed
+    if not url.startswith(("http://", "https://")):
+        url = "https://" + url
+
+    return sse_response(stream_url_generation(
+        registry.flashcard_agent, FLASHCARDS_GOAL,
+        url, "flashcards", [], item_path=("flashcards",), item_event="flashcard"
+    ))
+
+@app.route('/generate-summary', methods=['POST', 'OPTIONS'])
+def generate_summary():
+    if request.method == 'OPTIONS':
+        return '', 200
+        
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({
+                "status": "error",
+                "message": "No JSON data provided"
+            }), 400
+            
+        url = data.get('url')
+        if not url:
+            return jsonify({
+                "status": "error",
+                "message": "URL is required"
+            }), 400
+
+        # Validate URL
+        if not is_valid_url(url):
+            return jsonify({
+                "status": "error",
+                "message": "Invalid URL provided"
+            }), 400
+
+        # Normalize URL if needed
+        if not url.startswith(("http://", "https://")):
+            url = "https://" + url
+
+        mode, error = validate_generation_mode(data, MAP_REDUCE_MODES)
+        if error:
+            return error
+
+        # Repeated requests are answered from the response cache unless fresh is set;
+        # identical requests in flight at the same time share one generation
+        fresh = is_fresh(data)
+        payload, status_code = cached_generation(
+            summary_cache_key(url, mode),
+            fresh, build_summary, url, mode
+        )
+        return jsonify(payload), status_code
+
+    except Exception as e:
+        app.logger.error(f"General error: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 500
+
+def stream_url_generation(agent, agent_goal, url, output_key, default, map_reduce=False,
+                          item_path=None, item_event=None, query=None):
+    """
+    Event generator for streamed URL generations.
+    Emits "status" events per stage, "token" events with the raw model deltas
+    (partial JSON) and a final "result" event with the validated payload.
+    With map_reduce enabled, long content is condensed before the streamed reduce step.
+    With item_path set, each completed element of that array is emitted as an
+    item_event event instead of the token events.
+    A query instead of a url generates from Tavily search results.
+    """
+    try:
+        if url:
+            yield sse_event("status", {"stage": "extracting"})
+            content = extract_url_content(url)
+        else:
+            yield sse_event("status", {"stage": "searching"})
+            content = search_query_content(query)
+        if not content:
+            yield sse_event("error", {
+                "status": "error",
+                "message": "No content could be extracted from the URL" if url else "No search results found for the query"
+            })
+            return
+        source = url or query
+
+        max_wait = None
+        if map_reduce and count_tokens(content) > MAP_REDUCE_THRESHOLD_TOKENS:
+            yield sse_event("status", {"stage": "condensing"})
+            content, error = condense_content(source, content)
+            if error:
+                yield sse_event("error", error)
+                return
+            agent_goal = build_reduce_goal(agent_goal)
+            max_wait = reduce_wait()
+
+        task = build_content_task(source, agent_goal, truncate_content(content))
+        error = token_limit_error(task)
         if error:
-            return jsonify(error), 500
+            yield sse_event("error", error)
+            return
+
+        yield sse_event("status", {"stage": "generating"})
+        items = JsonArrayStream(item_path) if item_path else None
+        item_index = 0
+        raw_output = ""
+        for delta in stream_agent_content(agent, task, max_wait=max_wait):
+            raw_output += delta
+            if items is None:
+                yield sse_event("token", {"delta": delta})
+                continue
+            for item in items.feed(delta):
+                yield sse_event(item_event, {"index": item_index, item_event: item})
+                item_index += 1
+
+        response_data = parse_structured_output(raw_output)
+        yield sse_event("result", {
+            "status": "success",
+            "data": {
+                output_key: response_data.get(output_key, default)
+            }
+        })
+
+    except Exception as e:
+        yield sse_event("error", stream_error(e))
+
+@app.route('/generate-summary/stream', methods=['POST', 'OPTIONS'])
+def generate_summary_stream():
+    """
+    Stream summary generation as Server-Sent Events
+    """
+    if request.method == 'OPTIONS':
+        return '', 200
+
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({
+            "status": "error",
+            "message": "No JSON data provided"
+        }), 400
+
+    url = data.get('url')
+    if not url:
+        return jsonify({
+            "status": "error",
+            "message": "URL is required"
+        }), 400
+
+    if not is_valid_url(url):
+        return jsonify({
+            "status": "error",
+            "message": "Invalid URL provided"
+        }), 400
+
+    # Normalize URL if needed
+    if not url.startswith(("http://", "https://")):
+        url = "https://" + url
+
+    return sse_response(stream_url_generation(
+        registry.summary_agent, SUMMARY_GOAL,
+        url, "summary", "", map_reduce=True
+    ))
+
+@app.route('/generate-notes', methods=['POST', 'OPTIONS'])
+def generate_notes():
+    if request.method == 'OPTIONS':
+        return '', 200
         
-        raw_output = result.content.strip()
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({
+                "status": "error",
+                "message": "No JSON data provided"
+            }), 400
+            
+        url = data.get('url')
+        if not url:
+            return jsonify({
+                "status": "error",
+                "message": "URL is required"
+            }), 400
+
+        # Validate URL
+        if not is_valid_url(url):
+            return jsonify({
+                "status": "error",
+                "message": "Invalid URL provided"
+            }), 400
+
+        # Normalize URL if needed
+        if not url.startswith(("http://", "https://")):
+            url = "https://" + url
+
+        mode, error = validate_generation_mode(data, MAP_REDUCE_MODES)
+        if error:
+            return error
+
+        # Repeated requests are answered from the response cache unless fresh is set;
+        # identical requests in flight at the same time share one generation
+        fresh = is_fresh(data)
+        payload, status_code = cached_generation(
+            notes_cache_key(url, mode),
+            fresh, build_notes, url, mode
+        )
+        return jsonify(payload), status_code
 
-        # Clean up any code fences and extract JSON
-        cleaned_output = re.sub(r"^```json|^```|```$", "", raw_output, flags=re.MULTILINE).strip()
-        app.logger.info(f"Team raw output: {cleaned_output}")
+    except Exception as e:
+        app.logger.error(f"General error: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 500
+
+@app.route('/generate-notes/stream', methods=['POST', 'OPTIONS'])
+def generate_notes_stream():
+    """
+    Stream notes generation as Server-Sent Events
+    """
+    if request.method == 'OPTIONS':
+        return '', 200
+
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({
+            "status": "error",
+            "message": "No JSON data provided"
+        }), 400
+
+    url = data.get('url')
+    if not url:
+        return jsonify({
+            "status": "error",
+            "message": "URL is required"
+        }), 400
+
+    if not is_valid_url(url):
+        return jsonify({
+            "status": "error",
+            "message": "Invalid URL provided"
+        }), 400
+
+    # Normalize URL if needed
+    if not url.startswith(("http://", "https://")):
+        url = "https://" + url
+
+    return sse_response(stream_url_generation(
+        registry.note_agent, NOTES_GOAL,
+        url, "notes", {}, map_reduce=True
+    ))
+
+@app.route('/generate-quiz', methods=['POST', 'OPTIONS'])
+def generate_quiz():
+    if request.method == 'OPTIONS':
+        return '', 200
+        
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({
+                "status": "error",
+                "message": "No JSON data provided"
+            }), 400
+            
+        # Accept either url or query
+        url = data.get('url')
+        query = data.get('query')
+        
+        if not url and not query:
+            return jsonify({
+                "status": "error",
+                "message": "Either 'url' or 'query' is required"
+            }), 400
+
+        num_questions = data.get('num_questions', 5)  # Default to 5 questions
+        difficulty = data.get('difficulty', 'medium')  # Default to medium difficulty
+
+        # Validate inputs
+        if url and not is_valid_url(url):
+            return jsonify({
+                "status": "error",
+                "message": "Invalid URL provided"
+            }), 400
+
+        if not isinstance(num_questions, int) or num_questions < 1 or num_questions > 20:
+            return jsonify({
+                "status": "error",
+                "message": "Number of questions must be between 1 and 20"
+            }), 400
+
+        if difficulty not in ['easy', 'medium', 'hard']:
+            return jsonify({
+                "status": "error",
+                "message": "Difficulty must be 'easy', 'medium', or 'hard'"
+            }), 400
+
+        # Normalize URL if needed
+        if url and not url.startswith(("http://", "https://")):
+            url = "https://" + url
+
+        mode, error = validate_generation_mode(data, GENERATION_MODES)
+        if error:
+            return error
+
+        # Repeated requests are answered from the response cache unless fresh is set;
+        # identical requests in flight at the same time share one generation
+        fresh = is_fresh(data)
+        payload, status_code = cached_generation(
+            quiz_cache_key(url, query, num_questions, difficulty, mode),
+            fresh, build_quiz, url, query, num_questions, difficulty, mode
+        )
+        return jsonify(payload), status_code
+
+    except Exception as e:
+        app.logger.error(f"General error: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 500
+
+@app.route('/generate-quiz/stream', methods=['POST', 'OPTIONS'])
+def generate_quiz_stream():
+    """
+    Stream quiz generation as Server-Sent Events.
+    Each question is sent as a "question" event as soon as the model finishes it.
+    """
+    if request.method == 'OPTIONS':
+        return '', 200
+
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({
+            "status": "error",
+            "message": "No JSON data provided"
+        }), 400
+
+    # Accept either url or query
+    url = data.get('url')
+    query = data.get('query')
+
+    if not url and not query:
+        return jsonify({
+            "status": "error",
+            "message": "Either 'url' or 'query' is required"
+        }), 400
+
+    num_questions = data.get('num_questions', 5)
+    difficulty = data.get('difficulty', 'medium')
+
+    if url and not is_valid_url(url):
+        return jsonify({
+            "status": "error",
+            "message": "Invalid URL provided"
+        }), 400
+
+    if not isinstance(num_questions, int) or num_questions < 1 or num_questions > 20:
+        return jsonify({
+            "status": "error",
+            "message": "Number of questions must be between 1 and 20"
+        }), 400
+
+    if difficulty not in ['easy', 'medium', 'hard']:
+        return jsonify({
+            "status": "error",
+            "message": "Difficulty must be 'easy', 'medium', or 'hard'"
+        }), 400
+
+    # Normalize URL if needed
+    if url and not url.startswith(("http://", "https://")):
+        url = "https://" + url
+
+    return sse_response(stream_url_generation(
+        registry.quiz_agent,
+        quiz_goal(num_questions, difficulty),
+        url, "quiz", {}, item_path=("quiz", "questions"), item_event="question", query=query
+    ))
+
+def generate_study_pack_artifact(artifact, options, url, content):
+    """
+    Run the generator agent for one study pack artifact on already-extracted content
+    """
+    if artifact == "flashcards":
+        agent, output_key, default = registry.flashcard_agent, "flashcards", []
+        goal = FLASHCARDS_GOAL
+    elif artifact == "summary":
+        agent, output_key, default = registry.summary_agent, "summary", ""
+        goal = SUMMARY_GOAL
+    elif artifact == "notes":
+        agent, output_key, default = registry.note_agent, "notes", {}
+        goal = NOTES_GOAL
+    else:
+        agent, output_key, default = registry.quiz_agent, "quiz", {}
+        goal = quiz_goal(options['num_questions'], options['difficulty'])
+
+    # Agents keep per-run state on the instance, so each thread runs its own copy
+    task = build_content_task(url, goal, content)
+    result, error = safe_team_run(copy_agent(agent), task)
+    if error:
+        raise Exception(error["message"])
+    return parse_structured_output(result.content).get(output_key, default)
+
+@app.route('/generate-study-pack', methods=['POST', 'OPTIONS'])
+def generate_study_pack():
+    if request.method == 'OPTIONS':
+        return '', 200
+
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({
+                "status": "error",
+                "message": "No JSON data provided"
+            }), 400
+
+        url = data.get('url')
+        if not url:
+            return jsonify({
+                "status": "error",
+                "message": "URL is required"
+            }), 400
+
+        if not is_valid_url(url):
+            return jsonify({
+                "status": "error",
+                "message": "Invalid URL provided"
+            }), 400
+
+        # Artifacts may be plain names or objects like {"type": "quiz", "num_questions": 5}
+        entries = data.get('artifacts', STUDY_PACK_ARTIFACTS)
+        if not isinstance(entries, list):
+            return jsonify({
+                "status": "error",
+                "message": f"Artifacts must be a list of: {', '.join(STUDY_PACK_ARTIFACTS)}"
+            }), 400
+
+        artifacts = {}
+        for entry in entries:
+            options = dict(entry) if isinstance(entry, dict) else {"type": entry}
+            artifact = options.get("type")
+            if not isinstance(artifact, str) or artifact not in STUDY_PACK_ARTIFACTS:
+                return jsonify({
+                    "status": "error",
+                    "message": f"Artifacts must be any of: {', '.join(STUDY_PACK_ARTIFACTS)}"
+                }), 400
+            artifacts[artifact] = options
+
+        if not artifacts:
+            return jsonify({
+                "status": "error",
+                "message": "At least one artifact is required"
+            }), 400
+
+        if "quiz" in artifacts:
+            quiz_options = artifacts["quiz"]
+            quiz_options.setdefault("num_questions", data.get('num_questions', 5))
+            quiz_options.setdefault("difficulty", data.get('difficulty', 'medium'))
+
+            num_questions = quiz_options["num_questions"]
+            if not isinstance(num_questions, int) or num_questions < 1 or num_questions > 20:
+                return jsonify({
+                    "status": "error",
+                    "message": "Number of questions must be between 1 and 20"
+                }), 400
+
+            if quiz_options["difficulty"] not in ['easy', 'medium', 'hard']:
+                return jsonify({
+                    "status": "error",
+                    "message": "Difficulty must be 'easy', 'medium', or 'hard'"
+                }), 400
+
+        # Normalize URL if needed
+        if not url.startswith(("http://", "https://")):
+            url = "https://" + url
+
+        # Extract once and share the content with every generator
+        content = extract_url_content(url)
+        if not content:
+            return jsonify({
+                "status": "error",
+                "message": "No content could be extracted from the URL"
+            }), 500
+        content = truncate_content(content)
+
+        results = {}
+        errors = {}
+        with ThreadPoolExecutor(max_workers=min(len(artifacts), STUDY_PACK_MAX_WORKERS)) as executor:
+            futures = {
+                executor.submit(generate_study_pack_artifact, artifact, options, url, content): artifact
+                for artifact, options in artifacts.items()
+            }
+            for future, artifact in futures.items():
+                try:
+                    results[artifact] = future.result()
+                except Exception as e:
+                    app.logger.error(f"Study pack {artifact} generation failed: {str(e)}")
+                    errors[artifact] = str(e)
 
-        # Extract JSON part from the response
-        json_match = re.search(r'(\{.*\})', cleaned_output, re.DOTALL)
-        if not json_match:
+        if not results:
             return jsonify({
                 "status": "error",
-                "message": "No valid JSON found in response"
+                "message": "Study pack generation failed",
+                "errors": errors
             }), 500
 
-        json_str = json_match.group(1)
-        response_data = json.loads(json_str)
-        
-        # Format the response to match the expected structure
+        response_data = dict(results)
+        if errors:
+            response_data["errors"] = errors
+
         return jsonify({
             "status": "success",
-            "data": {
-                "summary": response_data.get("summary", "")
-            }
+            "data": response_data
         })
 
-    except json.JSONDecodeError as e:
-        app.logger.error(f"JSON decode failed: {str(e)}")
-        return jsonify({
-            "status": "error",
-            "message": "Invalid JSON returned by team"
-        }), 500
-
     except Exception as e:
         app.logger.error(f"General error: {str(e)}")
         return jsonify({
@@ -692,11 +2017,48 @@ def generate_summary():
             "message": str(e)
         }), 500
 
-@app.route('/generate-notes', methods=['POST', 'OPTIONS'])
-def generate_notes():
+def run_extract_batch(urls, fresh, include_content):
+    """
+    Extract a reading list into the content cache and report the outcome per URL
+    """
+    valid_urls = [url for url in urls if is_valid_url(url)]
+    entries = {}
+    if valid_urls:
+        for entry in registry.extract_toolkit.extract_batch(
+            valid_urls, max_workers=EXTRACT_BATCH_MAX_WORKERS, fresh=fresh
+        ):
+            entries[normalize_url(entry["url"])] = entry
+
+    results = []
+    for url in urls:
+        if not is_valid_url(url):
+            results.append({"url": url, "status": "failed", "error": "Invalid URL provided"})
+            continue
+
+        full_url = url if url.startswith(("http://", "https://")) else "https://" + url
+        entry = entries[normalize_url(full_url)]
+        result = {"url": url, "status": entry["status"]}
+        if entry["status"] == "failed":
+            result["error"] = entry["error"]
+        else:
+            text = entry["result"].get("raw_content") or ""
+            result["characters"] = len(text)
+            if include_content:
+                result["content"] = text
+        results.append(result)
+
+    counts = {status: sum(1 for result in results if result["status"] == status)
+              for status in ("extracted", "cached", "failed")}
+    return {
+        "status": "success",
+        "data": {"results": results, **counts}
+    }, 200
+
+@app.route('/extract-batch', methods=['POST', 'OPTIONS'])
+def extract_batch():
     if request.method == 'OPTIONS':
         return '', 200
-        
+
     try:
         data = request.get_json()
         if not data:
@@ -704,84 +2066,153 @@ def generate_notes():
                 "status": "error",
                 "message": "No JSON data provided"
             }), 400
-            
-        url = data.get('url')
-        if not url:
+
+        urls = data.get('urls')
+        if not isinstance(urls, list) or not urls or not all(isinstance(url, str) and url for url in urls):
             return jsonify({
                 "status": "error",
-                "message": "URL is required"
+                "message": "urls must be a non-empty list of URLs"
             }), 400
 
-        # Validate URL
-        if not is_valid_url(url):
+        if len(urls) > EXTRACT_BATCH_MAX_URLS:
             return jsonify({
                 "status": "error",
-                "message": "Invalid URL provided"
+                "message": f"Maximum {EXTRACT_BATCH_MAX_URLS} URLs allowed per batch"
             }), 400
 
-        # Normalize URL if needed
-        if not url.startswith(("http://", "https://")):
-            url = "https://" + url
+        job_id = job_queue.submit(
+            "extract_batch", run_extract_batch, urls,
+            is_fresh(data), bool(data.get('include_content', False))
+        )
 
-        # Build task
-        task = f"""
-        Input URL: {url}
+        # Async clients get the job id straight away and poll /jobs/<job_id>
+        if data.get('async', False):
+            return jsonify(job_accepted_response(job_id)), 202
 
-        GOAL:
-        - Extract content from the provided URL.
-        - Generate detailed, structured notes from the extracted content.
-        - Return notes in valid JSON format.
-        """
+        return wait_for_job(job_id, job_accepted_response(job_id))
 
-        result, error = safe_team_run(tavily_note_team, task)
-        if error:
-            return jsonify(error), 500
-        
-        raw_output = result.content.strip()
+    except Exception as e:
+        app.logger.error(f"General error: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 500
 
-        # Clean up any code fences and extract JSON
-        cleaned_output = re.sub(r"^```json|^```|```$", "", raw_output, flags=re.MULTILINE).strip()
-        app.logger.info(f"Team raw output: {cleaned_output}")
+def run_crawl(crawl_id):
+    """
+    Map the site (on the first run only), then extract the pending pages in concurrent
+    batches, storing each batch as soon as it returns, and index the fetched pages
+    """
+    if not crawl_store.claim(crawl_id):
+        crawl = crawl_store.get(crawl_id)
+        return {
+            "status": "error",
+            "message": "Crawl not found" if crawl is None else f"Crawl is already {crawl['status']}",
+            "crawl_id": crawl_id
+        }, 409
 
-        # Extract JSON part from the response
-        json_match = re.search(r'(\{.*\})', cleaned_output, re.DOTALL)
-        if not json_match:
-            return jsonify({
-                "status": "error",
-                "message": "No valid JSON found in response"
-            }), 500
+    try:
+        crawl = crawl_store.get(crawl_id)
+        options = crawl["options"]
+        if not crawl["mapped"]:
+            urls = registry.map_toolkit.map_urls(
+                crawl["root_url"],
+                max_depth=options["max_depth"],
+                limit=options["max_pages"] * 2,
+                instructions=options.get("instructions"),
+                select_paths=options.get("include_paths"),
+                exclude_paths=options.get("exclude_paths")
+            )
+            crawl_store.add_pages(crawl_id, prioritize_urls(
+                urls,
+                crawl["root_url"],
+                include_paths=options.get("include_paths"),
+                exclude_paths=options.get("exclude_paths"),
+                max_pages=options["max_pages"]
+            ))
+
+        pending_urls = crawl_store.pending_urls(crawl_id)
+        for outcomes in registry.extract_toolkit.iter_extract_groups(
+            pending_urls, max_workers=CRAWL_MAX_WORKERS, fresh=options.get("fresh") is True
+        ):
+            crawl_store.record_pages(crawl_id, outcomes)
+
+        # Index the fetched pages now so generation requests only have to search.
+        # A failure here leaves the pages usable; the next generation request re-queues it.
+        try:
+            index_crawl(crawl_id)
+        except Exception as e:
+            app.logger.error(f"Indexing crawl {crawl_id} failed: {str(e)}")
 
-        json_str = json_match.group(1)
-        response_data = json.loads(json_str)
-        
-        # Format the response to match the expected structure
-        return jsonify({
+        crawl_store.finish(crawl_id, "completed")
+        return {
             "status": "success",
-            "data": {
-                "notes": response_data.get("notes", {})
-            }
-        })
-
-    except json.JSONDecodeError as e:
-        app.logger.error(f"JSON decode failed: {str(e)}")
-        return jsonify({
-            "status": "error",
-            "message": "Invalid JSON returned by team"
-        }), 500
+            "data": crawl_store.get(crawl_id)
+        }, 200
 
     except Exception as e:
-        app.logger.error(f"General error: {str(e)}")
-        return jsonify({
+        app.logger.error(f"Crawl {crawl_id} failed: {str(e)}")
+        crawl_store.finish(crawl_id, "failed", error=str(e))
+        return {
             "status": "error",
-            "message": str(e)
-        }), 500
-    
+            "message": f"Crawl failed: {str(e)}",
+            "crawl_id": crawl_id
+        }, 500
 
-@app.route('/generate-quiz', methods=['POST', 'OPTIONS'])
-def generate_quiz():
+def crawl_accepted_response(crawl_id, job_id):
+    """
+    Response body for a crawl queued as a background job
+    """
+    return {
+        "status": "pending",
+        "data": {
+            "crawl_id": crawl_id,
+            "job_id": job_id,
+            "status_url": f"/crawls/{crawl_id}",
+            "pages_url": f"/crawls/{crawl_id}/pages"
+        }
+    }
+
+def validate_crawl_params(data):
+    """
+    Validate crawl parameters and return (options, error_message)
+    """
+    max_depth = data.get('max_depth', 2)
+    if not isinstance(max_depth, int) or max_depth < 1 or max_depth > CRAWL_MAX_DEPTH:
+        return None, f"max_depth must be between 1 and {CRAWL_MAX_DEPTH}"
+
+    max_pages = data.get('max_pages', 100)
+    if not isinstance(max_pages, int) or max_pages < 1 or max_pages > CRAWL_MAX_PAGES:
+        return None, f"max_pages must be between 1 and {CRAWL_MAX_PAGES}"
+
+    instructions = data.get('instructions')
+    if instructions is not None and not isinstance(instructions, str):
+        return None, "instructions must be a string"
+
+    options = {
+        "max_depth": max_depth,
+        "max_pages": max_pages,
+        "instructions": instructions or None,
+        "fresh": is_fresh(data)
+    }
+    for field in ('include_paths', 'exclude_paths'):
+        patterns = data.get(field) or []
+        if not isinstance(patterns, list) or not all(isinstance(pattern, str) for pattern in patterns):
+            return None, f"{field} must be a list of regular expressions"
+        for pattern in patterns:
+            try:
+                re.compile(pattern)
+            except re.error as e:
+                return None, f"Invalid pattern in {field}: {pattern} ({str(e)})"
+        options[field] = patterns
+
+    return options, None
+
+@app.route('/crawl', methods=['POST', 'OPTIONS'])
+def start_crawl():
     if request.method == 'OPTIONS':
         return '', 200
-        
+
     try:
         data = request.get_json()
         if not data:
@@ -789,91 +2220,282 @@ def generate_quiz():
                 "status": "error",
                 "message": "No JSON data provided"
             }), 400
-            
-        # Accept either url or query
+
         url = data.get('url')
-        query = data.get('query')
-        
-        if not url and not query:
+        if not url:
             return jsonify({
                 "status": "error",
-                "message": "Either 'url' or 'query' is required"
+                "message": "URL is required"
             }), 400
 
-        num_questions = data.get('num_questions', 5)  # Default to 5 questions
-        difficulty = data.get('difficulty', 'medium')  # Default to medium difficulty
-
-        # Validate inputs
-        if url and not is_valid_url(url):
+        if not is_valid_url(url):
             return jsonify({
                 "status": "error",
                 "message": "Invalid URL provided"
             }), 400
 
-        if not isinstance(num_questions, int) or num_questions < 1 or num_questions > 20:
-            return jsonify({
-                "status": "error",
-                "message": "Number of questions must be between 1 and 20"
-            }), 400
-
-        if difficulty not in ['easy', 'medium', 'hard']:
+        options, error_message = validate_crawl_params(data)
+        if error_message:
             return jsonify({
                 "status": "error",
-                "message": "Difficulty must be 'easy', 'medium', or 'hard'"
+                "message": error_message
             }), 400
 
-        # Normalize URL if needed
-        if url and not url.startswith(("http://", "https://")):
+        if not url.startswith(("http://", "https://")):
             url = "https://" + url
 
-        # Build task
-        task = f"""
-        Input: {url if url else query}
-        Input Type: {"URL" if url else "Search Query"}
-        Number of Questions: {num_questions}
-        Difficulty Level: {difficulty}
-
-        GOAL:
-        - If URL is provided, extract content from it
-        - If search query is provided, search for relevant content
-        - Generate a quiz with {num_questions} questions at {difficulty} difficulty
-        - Each question should have 4 options and one correct answer
-        - Return quiz in valid JSON format
-        """
+        crawl_id = crawl_store.create(url, options)
+        job_id = job_queue.submit("crawl", run_crawl, crawl_id)
+
+        # Async clients poll /crawls/<crawl_id> and page through /crawls/<crawl_id>/pages
+        if data.get('async', False):
+            return jsonify(crawl_accepted_response(crawl_id, job_id)), 202
+
+        return wait_for_job(job_id, crawl_accepted_response(crawl_id, job_id))
+
+    except Exception as e:
+        app.logger.error(f"General error: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 500
+
+@app.route('/crawls/<crawl_id>', methods=['GET'])
+def get_crawl(crawl_id):
+    """
+    Progress of a crawl
+    """
+    crawl = crawl_store.get(crawl_id)
+    if crawl is None:
+        return jsonify({
+            "status": "error",
+            "message": "Crawl not found"
+        }), 404
+
+    return jsonify({
+        "status": "success",
+        "data": crawl
+    })
+
+@app.route('/crawls/<crawl_id>/pages', methods=['GET'])
+def get_crawl_pages(crawl_id):
+    """
+    Pages stored so far, in priority order: ?status=done|failed|pending&offset=0&limit=50&include_content=true
+    """
+    if crawl_store.get(crawl_id) is None:
+        return jsonify({
+            "status": "error",
+            "message": "Crawl not found"
+        }), 404
+
+    status = request.args.get('status')
+    if status and status not in ('done', 'failed', 'pending'):
+        return jsonify({
+            "status": "error",
+            "message": "status must be 'done', 'failed' or 'pending'"
+        }), 400
 
-        result = tavily_quiz_team.run(task)
-        raw_output = result.content.strip()
+    try:
+        offset = max(int(request.args.get('offset', 0)), 0)
+        limit = min(max(int(request.args.get('limit', 50)), 1), 200)
+    except ValueError:
+        return jsonify({
+            "status": "error",
+            "message": "offset and limit must be integers"
+        }), 400
+
+    include_content = request.args.get('include_content', 'false').lower() == 'true'
+    pages = crawl_store.pages(crawl_id, status=status, offset=offset, limit=limit, include_content=include_content)
+    return jsonify({
+        "status": "success",
+        "data": {
+            "pages": pages,
+            "offset": offset,
+            "limit": limit
+        }
+    })
 
-        # Clean up any code fences and extract JSON
-        cleaned_output = re.sub(r"^```json|^```|```$", "", raw_output, flags=re.MULTILINE).strip()
-        app.logger.info(f"Team raw output: {cleaned_output}")
+@app.route('/crawls/<crawl_id>/resume', methods=['POST', 'OPTIONS'])
+def resume_crawl(crawl_id):
+    if request.method == 'OPTIONS':
+        return '', 200
 
-        # Extract JSON part from the response
-        json_match = re.search(r'(\{.*\})', cleaned_output, re.DOTALL)
-        if not json_match:
+    try:
+        data = request.get_json(silent=True) or {}
+        crawl = crawl_store.get(crawl_id)
+        if crawl is None:
             return jsonify({
                 "status": "error",
-                "message": "No valid JSON found in response"
-            }), 500
+                "message": "Crawl not found"
+            }), 404
 
-        json_str = json_match.group(1)
-        response_data = json.loads(json_str)
-        
-        # Format the response to match the expected structure
-        return jsonify({
-            "status": "success",
-            "data": {
-                "quiz": response_data.get("quiz", {})
-            }
-        })
+        if data.get('retry_failed', False):
+            crawl_store.retry_failed(crawl_id)
+            crawl = crawl_store.get(crawl_id)
 
-    except json.JSONDecodeError as e:
-        app.logger.error(f"JSON decode failed: {str(e)}")
+        if crawl["status"] == "completed":
+            return jsonify({
+                "status": "error",
+                "message": "Crawl is already completed"
+            }), 409
+
+        job_id = job_queue.submit("crawl", run_crawl, crawl_id)
+        return jsonify(crawl_accepted_response(crawl_id, job_id)), 202
+
+    except Exception as e:
+        app.logger.error(f"General error: {str(e)}")
         return jsonify({
             "status": "error",
-            "message": "Invalid JSON returned by team"
+            "message": str(e)
         }), 500
 
+def crawl_index_id(crawl_id):
+    return f"crawl-{crawl_id}"
+
+def index_crawl(crawl_id):
+    """
+    Build or refresh the retrieval index over a crawl's fetched pages.
+    The index is versioned by the pages' content: an unchanged crawl is not re-indexed,
+    and any change rebuilds the whole index, since paragraphs are deduplicated across pages.
+    """
+    version = crawl_store.content_version(crawl_id)
+    if version is None:
+        return 0
+    index_id = crawl_index_id(crawl_id)
+    return single_flight.do(
+        make_cache_key("retrieval_index", index_id, version),
+        retrieval_index.ensure, index_id, version, lambda: crawl_store.page_contents(crawl_id)
+    )
+
+def run_crawl_index(crawl_id):
+    """
+    Background job: index a finished crawl whose index is missing or out of date
+    """
+    return {
+        "status": "success",
+        "data": {
+            "crawl_id": crawl_id,
+            "chunks": index_crawl(crawl_id)
+        }
+    }, 200
+
+def crawl_retrieved_content(crawl, topic):
+    """
+    The chunks of a crawl's indexed pages most relevant to topic (or spread across its
+    pages when there is no topic). run_crawl builds the index; a finished crawl whose
+    index is missing or out of date gets an indexing job instead.
+    Returns (content, error) where error is a (payload, status_code) response.
+    """
+    crawl_id = crawl["crawl_id"]
+    if not crawl["pages"]["done"]:
+        return None, ({
+            "status": "error",
+            "message": "The crawl has no fetched pages yet"
+        }, 409)
+
+    index_id = crawl_index_id(crawl_id)
+    indexed_version = retrieval_index.version(index_id)
+    running = crawl["status"] in ("pending", "running")
+    if not running and indexed_version != crawl_store.content_version(crawl_id):
+        job_queue.submit("crawl_index", run_crawl_index, crawl_id)
+    if indexed_version is None:
+        return None, ({
+            "status": "error",
+            "message": (
+                "The crawl is still running; its pages are indexed once it finishes" if running
+                else "The crawl's pages are being indexed; try again shortly"
+            )
+        }, 409)
+
+    chunks = retrieval_index.search(index_id, topic or "", k=RETRIEVAL_TOP_K, max_tokens=RETRIEVAL_MAX_TOKENS)
+    if not chunks and topic:
+        return None, ({
+            "status": "error",
+            "message": f"Nothing in the crawled pages matches the topic: {topic}"
+        }, 404)
+    if not chunks:
+        return None, ({
+            "status": "error",
+            "message": "No content could be retrieved from the crawl"
+        }, 500)
+    return format_chunks(chunks), None
+
+def build_crawl_generation(crawl_id, topic, agent, agent_goal, output_key, default):
+    """
+    Run a generator agent on the retrieved chunks of a crawl
+    """
+    crawl = crawl_store.get(crawl_id)
+    content, error = crawl_retrieved_content(crawl, topic)
+    if error:
+        return error
+
+    if topic:
+        agent_goal += f" Focus on this topic: {topic}."
+    task = build_content_task(crawl["root_url"], agent_goal, content)
+    result, error = safe_team_run(copy_agent(agent), task)
+    return generation_payload(result, error, output_key, default)
+
+def build_crawl_notes(crawl_id, topic):
+    return build_crawl_generation(crawl_id, topic, registry.note_agent, NOTES_GOAL, "notes", {})
+
+def build_crawl_quiz(crawl_id, topic, num_questions, difficulty):
+    return build_crawl_generation(
+        crawl_id, topic, registry.quiz_agent, quiz_goal(num_questions, difficulty), "quiz", {}
+    )
+
+def crawl_generation_cache_key(kind, crawl, topic, *params):
+    # Keyed by the index version that will be searched, so refreshed pages miss the cache
+    return make_cache_key(
+        kind, crawl["crawl_id"], retrieval_index.version(crawl_index_id(crawl["crawl_id"])),
+        (topic or "").strip().lower(), *params,
+        prompt_version(registry.note_agent if kind == "crawl_notes" else registry.quiz_agent)
+    )
+
+def parse_crawl_generation_request(crawl_id):
+    """
+    Look up the crawl and validate the optional topic of a crawl generation request.
+    Returns (crawl, data, topic, error_response).
+    """
+    data = request.get_json(silent=True) or {}
+    crawl = crawl_store.get(crawl_id)
+    if crawl is None:
+        return None, data, None, (jsonify({
+            "status": "error",
+            "message": "Crawl not found"
+        }), 404)
+
+    topic = data.get('topic')
+    if topic is not None and not isinstance(topic, str):
+        return None, data, None, (jsonify({
+            "status": "error",
+            "message": "topic must be a string"
+        }), 400)
+
+    # A topic made only of stopwords would match nothing and silently select arbitrary pages
+    if topic and topic.strip() and not terms(topic):
+        return None, data, None, (jsonify({
+            "status": "error",
+            "message": "topic must contain at least one searchable word"
+        }), 400)
+
+    return crawl, data, (topic or "").strip() or None, None
+
+@app.route('/crawls/<crawl_id>/notes', methods=['POST', 'OPTIONS'])
+def generate_crawl_notes(crawl_id):
+    if request.method == 'OPTIONS':
+        return '', 200
+
+    try:
+        crawl, data, topic, error = parse_crawl_generation_request(crawl_id)
+        if error:
+            return error
+
+        payload, status_code = cached_generation(
+            crawl_generation_cache_key("crawl_notes", crawl, topic),
+            is_fresh(data), build_crawl_notes, crawl_id, topic
+        )
+        return jsonify(payload), status_code
+
     except Exception as e:
         app.logger.error(f"General error: {str(e)}")
         return jsonify({
@@ -881,38 +2503,50 @@ def generate_quiz():
             "message": str(e)
         }), 500
 
-@app.route('/generate-storyboards', methods=['POST', 'OPTIONS'])
-def generate_storyboards():
+@app.route('/crawls/<crawl_id>/quiz', methods=['POST', 'OPTIONS'])
+def generate_crawl_quiz(crawl_id):
     if request.method == 'OPTIONS':
         return '', 200
-        
+
     try:
-        data = request.get_json()
-        if not data:
-            return jsonify({
-                "status": "error",
-                "message": "No JSON data provided"
-            }), 400
-        
-        # Validate parameters
-        is_valid, error_message = validate_storyboard_params(data)
-        if not is_valid:
+        crawl, data, topic, error = parse_crawl_generation_request(crawl_id)
+        if error:
+            return error
+
+        num_questions = data.get('num_questions', 5)
+        difficulty = data.get('difficulty', 'medium')
+
+        if not isinstance(num_questions, int) or num_questions < 1 or num_questions > 20:
             return jsonify({
                 "status": "error",
-                "message": error_message
+                "message": "Number of questions must be between 1 and 20"
             }), 400
-        
-        description = data.get('description')
-        number_of_boards = int(data.get('number_of_boards'))
-        skip_images = data.get('skip_images', False)  # New parameter
-        
-        # Limit number of boards for Heroku to prevent timeouts
-        if number_of_boards > 5:
+
+        if difficulty not in ['easy', 'medium', 'hard']:
             return jsonify({
                 "status": "error",
-                "message": "Maximum 5 storyboards allowed to prevent timeout"
+                "message": "Difficulty must be 'easy', 'medium', or 'hard'"
             }), 400
 
+        payload, status_code = cached_generation(
+            crawl_generation_cache_key("crawl_quiz", crawl, topic, num_questions, difficulty),
+            is_fresh(data), build_crawl_quiz, crawl_id, topic, num_questions, difficulty
+        )
+        return jsonify(payload), status_code
+
+    except Exception as e:
+        app.logger.error(f"General error: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 500
+
+def run_storyboard_generation(description, number_of_boards, skip_images):
+    """
+    Generate storyboard scenes and the comprehensive storyboard image.
+    Returns a (payload, status_code) tuple so it can run inline or as a background job.
+    """
+    try:
         # Build task for storyboard generation
         task = f"""
         Topic: {description}
@@ -922,56 +2556,17 @@ def generate_storyboards():
         Each scene should have an image prompt and supporting text.
         """
         
-        # Run the storyboard team with timeout
         try:
-            import threading
-            import queue
-            
-            def run_storyboard_team():
-                try:
-                    result = storyboard_team.run(task)
-                    result_queue.put(("success", result))
-                except Exception as e:
-                    result_queue.put(("error", str(e)))
-            
-            result_queue = queue.Queue()
-            team_thread = threading.Thread(target=run_storyboard_team)
-            team_thread.daemon = True
-            team_thread.start()
-            
-            # Wait for result with timeout (25 seconds)
-            try:
-                result_type, result_data = result_queue.get(timeout=25)
-                if result_type == "error":
-                    raise Exception(result_data)
-                raw_output = result_data.content.strip()
-            except queue.Empty:
-                return jsonify({
-                    "status": "error",
-                    "message": "Storyboard generation timed out. Please try with fewer boards."
-                }), 408
-                
+            result = budgeted_run(copy_team(registry.storyboard_team), task)
         except Exception as e:
             app.logger.error(f"Storyboard team execution failed: {str(e)}")
-            return jsonify({
+            return {
                 "status": "error",
                 "message": f"Storyboard generation failed: {str(e)}"
-            }), 500
+            }, 500
         
-        # Clean up any code fences and extract JSON
-        cleaned_output = re.sub(r"^```json|^```|```$", "", raw_output, flags=re.MULTILINE).strip()
-        app.logger.info(f"Storyboard Team raw output: {cleaned_output}")
-
-        # Extract JSON part from the response
-        json_match = re.search(r'(\{.*\})', cleaned_output, re.DOTALL)
-        if not json_match:
-            return jsonify({
-                "status": "error",
-                "message": "No valid JSON found in response"
-            }), 500
-
-        json_str = json_match.group(1)
-        response_data = json.loads(json_str)
+        app.logger.info(f"Storyboard Team raw output: {result.content}")
+        response_data = parse_structured_output(result.content)
         
         # Extract storyboards from response
         storyboards = response_data.get("storyboards", [])
@@ -1020,7 +2615,7 @@ def generate_storyboards():
                 # Create a comprehensive prompt for all scenes
                 full_prompt = f"Create a storyboard with {layout_prompt}. {comprehensive_prompt} Each panel should clearly show its respective scene. Use consistent art style across all panels."
                 
-                image_result = image_toolkit.generate_image(
+                image_result = registry.image_toolkit.generate_image(
                     prompt=full_prompt,
                     aspect_ratio="1:1",
                     size="1024x1024",
@@ -1036,7 +2631,7 @@ def generate_storyboards():
                 app.logger.error(f"Comprehensive image generation failed: {str(img_error)}")
         
         # Format the response
-        return jsonify({
+        return {
             "status": "success",
             "data": {
                 "image_url": comprehensive_image_url,
@@ -1050,14 +2645,62 @@ def generate_storyboards():
                     "comprehensive_image": not skip_images and comprehensive_prompt != ""
                 }
             }
-        })
+        }, 200
         
     except json.JSONDecodeError as e:
         app.logger.error(f"JSON decode failed: {str(e)}")
-        return jsonify({
+        return {
             "status": "error",
             "message": "Invalid JSON returned by team"
-        }), 500
+        }, 500
+        
+    except Exception as e:
+        app.logger.error(f"General error: {str(e)}")
+        return {
+            "status": "error",
+            "message": str(e)
+        }, 500
+
+@app.route('/generate-storyboards', methods=['POST', 'OPTIONS'])
+def generate_storyboards():
+    if request.method == 'OPTIONS':
+        return '', 200
+        
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({
+                "status": "error",
+                "message": "No JSON data provided"
+            }), 400
+        
+        # Validate parameters
+        is_valid, error_message = validate_storyboard_params(data)
+        if not is_valid:
+            return jsonify({
+                "status": "error",
+                "message": error_message
+            }), 400
+        
+        description = data.get('description')
+        number_of_boards = int(data.get('number_of_boards'))
+        skip_images = data.get('skip_images', False)  # New parameter
+        
+        # Limit number of boards for Heroku to prevent timeouts
+        if number_of_boards > 5:
+            return jsonify({
+                "status": "error",
+                "message": "Maximum 5 storyboards allowed to prevent timeout"
+            }), 400
+
+        job_id = job_queue.submit("storyboards", run_storyboard_generation, description, number_of_boards, skip_images)
+
+        # Async clients get the job id straight away and poll /jobs/<job_id>
+        if data.get('async', False):
+            return jsonify(job_accepted_response(job_id)), 202
+
+        # Wait up to 25 seconds for the result; a longer run is handed over to polling
+        return wait_for_job(job_id, job_accepted_response(job_id))
         
     except Exception as e:
         app.logger.error(f"General error: {str(e)}")
@@ -1066,7 +2709,6 @@ def generate_storyboards():
             "message": str(e)
         }), 500
 
-
 @app.route('/storyboard-images/<filename>', methods=['GET'])
 def serve_storyboard_image(filename):
     """
@@ -1115,7 +2757,7 @@ def generate_image():
         
         # Generate image using the toolkit
         try:
-            image_result = image_toolkit.generate_image(
+            image_result = registry.image_toolkit.generate_image(
                 prompt=prompt,
                 aspect_ratio=aspect_ratio,
                 size=size,
@@ -1162,91 +2804,36 @@ def serve_generated_image(filename):
             "message": str(e)
         }), 500
 
-@app.route('/audiobook-to-audio', methods=['POST', 'OPTIONS'])
-def generate_audiobook():
-    if request.method == 'OPTIONS':
-        return '', 200
-        
+def run_audiobook_generation(topic, style, duration, voice_id):
+    """
+    Generate an audiobook script and convert it to audio.
+    Returns a (payload, status_code) tuple so it can run inline or as a background job.
+    """
     try:
-        data = request.get_json()
-        if not data:
-            return jsonify({
-                "status": "error",
-                "message": "No JSON data provided"
-            }), 400
-        
-        # Extract parameters
-        topic = data.get('topic')
-        style = data.get('style', 'Educational')
-        duration = data.get('duration', 30)
-        voice_id = data.get('voice_id', 'JBFqnCBsd6RMkjVDRZzb')
-        
-        # Validate required parameters
-        if not topic:
-            return jsonify({
-                "status": "error",
-                "message": "Topic is required"
-            }), 400
-        
-        # Validate style
-        valid_styles = ['Educational', 'Conversational', 'Storytelling', 'Interview']
-        if style not in valid_styles:
-            return jsonify({
-                "status": "error",
-                "message": f"Style must be one of: {', '.join(valid_styles)}"
-            }), 400
-        
-        # Validate duration (in seconds)
-        if not isinstance(duration, int) or duration < 10 or duration > 300:
-            return jsonify({
-                "status": "error",
-                "message": "Duration must be between 10 and 300 seconds"
-            }), 400
-        
         # Build task for audiobook generation
-        task = f"""
-        Topic: {topic}
-        Style: {style}
-        Duration: {duration} seconds
-        
-        Generate an audiobook script for {duration} seconds of audio content.
-        The script should be appropriate for {duration} seconds of spoken audio.
-        """
+        task = build_audiobook_task(topic, style, duration)
         
         # Run the simple audiobook team
         try:
-            result = simple_audiobook_team.run(task)
-            raw_output = result.content.strip()
+            result = budgeted_run(copy_team(registry.simple_audiobook_team), task)
         except Exception as e:
             app.logger.error(f"Audiobook team execution failed: {str(e)}")
-            return jsonify({
+            return {
                 "status": "error",
                 "message": f"Audiobook generation failed: {str(e)}"
-            }), 500
-        
-        # Clean up any code fences and extract JSON
-        cleaned_output = re.sub(r"^```json|^```|```$", "", raw_output, flags=re.MULTILINE).strip()
-        app.logger.info(f"Audiobook Team raw output: {cleaned_output}")
-        
-        # Extract JSON part from the response
-        json_match = re.search(r'(\{.*\})', cleaned_output, re.DOTALL)
-        if not json_match:
-            return jsonify({
-                "status": "error",
-                "message": "No valid JSON found in response"
-            }), 500
+            }, 500
         
-        json_str = json_match.group(1)
-        response_data = json.loads(json_str)
+        app.logger.info(f"Audiobook Team raw output: {result.content}")
+        response_data = parse_structured_output(result.content)
         
         # Extract script from response
         script = response_data.get("script", "")
         
         if not script:
-            return jsonify({
+            return {
                 "status": "error",
                 "message": "No script generated"
-            }), 500
+            }, 500
         
         # Convert script to audio using ElevenLabs
         try:
@@ -1254,7 +2841,7 @@ def generate_audiobook():
             filename = f"audiobook_{uuid.uuid4().hex}.mp3"
             
             # Use ElevenLabs toolkit to generate audio
-            audio_result = elabs_toolkit.text_to_speech(
+            audio_result = registry.elabs_toolkit.text_to_speech_parallel(
                 text=script,
                 voice_id=voice_id,
                 model_id="eleven_multilingual_v2",
@@ -1262,86 +2849,67 @@ def generate_audiobook():
                 filename=filename
             )
             
-            # Small delay to ensure audio is processed in history
-            import time
-            time.sleep(2)
-            
-            # Get the temporary audio URL from ElevenLabs history
-            try:
-                from elevenlabs import ElevenLabs
-                
-                # Use ElevenLabs client to get history
-                client = ElevenLabs(api_key=ELEVENLABS_API_KEY)
-                history_data = client.history.list()
-                
-                app.logger.info(f"ElevenLabs history response: {history_data}")
-                
-                # Find the most recent audio for this script
-                audio_url = None
-                if history_data.get("history"):
-                    # Get the most recent item (should be our just-generated audio)
-                    latest_item = history_data["history"][0]
-                    history_item_id = latest_item.get("history_item_id")
-                    
-                    app.logger.info(f"Latest history item: {latest_item}")
-                    app.logger.info(f"History item ID: {history_item_id}")
-                    
-                    if history_item_id:
-                        # Try to get a shareable URL or use the local file path
-                        # The history endpoint returns binary audio, not a URL
-                        # So we'll use the local file path as the primary audio source
-                        audio_url = f"/audio-files/{audio_result['audio_file_name']}"
-                        app.logger.info(f"Using local audio URL: {audio_url}")
-                    else:
-                        app.logger.error("No history_item_id found in latest item")
-                else:
-                    app.logger.error("No history items found in response")
-                
-                # Format the response
-                return jsonify({
-                    "status": "success",
-                    "data": {
-                        "script": script,
-                        "audio_url": audio_url,  # Local file URL
-                        "audio_file": audio_result["audio_file"],  # Local file path
-                        "audio_file_name": audio_result["audio_file_name"],
-                        "topic": topic,
-                        "style": style,
-                        "duration": duration,
-                        "voice_id": voice_id
-                    }
-                })
-                
-            except Exception as history_error:
-                app.logger.error(f"Failed to get ElevenLabs history: {str(history_error)}")
-                # Fallback to local file response
-                return jsonify({
-                    "status": "success",
-                    "data": {
-                        "script": script,
-                        "audio_url": f"/audio-files/{audio_result['audio_file_name']}",  # Local file URL
-                        "audio_file": audio_result["audio_file"],
-                        "audio_file_name": audio_result["audio_file_name"],
-                        "topic": topic,
-                        "style": style,
-                        "duration": duration,
-                        "voice_id": voice_id
-                    }
-                })
+            return {
+                "status": "success",
+                "data": finalize_audiobook(script, audio_result, topic, style, duration, voice_id)
+            }, 200
             
         except Exception as audio_error:
             app.logger.error(f"Audio generation failed: {str(audio_error)}")
-            return jsonify({
+            return {
                 "status": "error",
                 "message": f"Audio generation failed: {str(audio_error)}"
-            }), 500
+            }, 500
         
     except json.JSONDecodeError as e:
         app.logger.error(f"JSON decode failed: {str(e)}")
-        return jsonify({
+        return {
             "status": "error",
             "message": "Invalid JSON returned by team"
-        }), 500
+        }, 500
+        
+    except Exception as e:
+        app.logger.error(f"General error: {str(e)}")
+        return {
+            "status": "error",
+            "message": str(e)
+        }, 500
+
+@app.route('/audiobook-to-audio', methods=['POST', 'OPTIONS'])
+def generate_audiobook():
+    if request.method == 'OPTIONS':
+        return '', 200
+        
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({
+                "status": "error",
+                "message": "No JSON data provided"
+            }), 400
+        
+        # Validate parameters
+        is_valid, error_message = validate_audiobook_params(data)
+        if not is_valid:
+            return jsonify({
+                "status": "error",
+                "message": error_message
+            }), 400
+
+        # Extract parameters
+        topic = data.get('topic')
+        style = data.get('style', 'Educational')
+        duration = data.get('duration', 30)
+        voice_id = data.get('voice_id', 'JBFqnCBsd6RMkjVDRZzb')
+
+        job_id = job_queue.submit("audiobook", run_audiobook_generation, topic, style, duration, voice_id)
+
+        # Async clients get the job id straight away and poll /jobs/<job_id>
+        if data.get('async', False):
+            return jsonify(job_accepted_response(job_id)), 202
+
+        # Wait up to 25 seconds for the result; a longer run is handed over to polling
+        return wait_for_job(job_id, job_accepted_response(job_id))
         
     except Exception as e:
         app.logger.error(f"General error: {str(e)}")
@@ -1350,6 +2918,125 @@ def generate_audiobook():
             "message": str(e)
         }), 500
 
+@app.route('/audiobook-to-audio/stream', methods=['POST', 'OPTIONS'])
+def generate_audiobook_stream():
+    """
+    Stream the audiobook script as Server-Sent Events, then synthesize the audio.
+    The final "result" event carries the same payload as /audiobook-to-audio.
+    """
+    if request.method == 'OPTIONS':
+        return '', 200
+
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({
+            "status": "error",
+            "message": "No JSON data provided"
+        }), 400
+
+    # Validate parameters
+    is_valid, error_message = validate_audiobook_params(data)
+    if not is_valid:
+        return jsonify({
+            "status": "error",
+            "message": error_message
+        }), 400
+
+    topic = data.get('topic')
+    style = data.get('style', 'Educational')
+    duration = data.get('duration', 30)
+    voice_id = data.get('voice_id', 'JBFqnCBsd6RMkjVDRZzb')
+
+    def generate():
+        try:
+            yield sse_event("status", {"stage": "scripting"})
+            raw_output = ""
+            for delta in stream_agent_content(registry.simple_audiobook_agent, build_audiobook_task(topic, style, duration)):
+                raw_output += delta
+                yield sse_event("token", {"delta": delta})
+
+            script = parse_structured_output(raw_output).get("script", "")
+            if not script:
+                yield sse_event("error", {
+                    "status": "error",
+                    "message": "No script generated"
+                })
+                return
+            yield sse_event("script", {"script": script})
+
+            yield sse_event("status", {"stage": "synthesizing"})
+            audio_result = registry.elabs_toolkit.text_to_speech_parallel(
+                text=script,
+                voice_id=voice_id,
+                model_id="eleven_multilingual_v2",
+                output_format="mp3_44100_128",
+                filename=f"audiobook_{uuid.uuid4().hex}.mp3"
+            )
+
+            yield sse_event("result", {
+                "status": "success",
+                "data": finalize_audiobook(script, audio_result, topic, style, duration, voice_id)
+            })
+
+        except Exception as e:
+            app.logger.error(f"Streaming audiobook generation failed: {str(e)}")
+            yield sse_event("error", {
+                "status": "error",
+                "message": f"Audiobook generation failed: {str(e)}"
+            })
+
+    return sse_response(generate())
+
+@app.route('/text-to-audio/stream', methods=['GET', 'POST', 'OPTIONS'])
+def stream_text_to_audio():
+    """
+    Stream synthesized speech as chunked audio/mpeg while caching it to disk.
+    Accepts "text" and optional "voice_id"/"model_id" as JSON or query parameters;
+    the cached file URL is returned in the X-Audio-Url header for replay.
+    """
+    if request.method == 'OPTIONS':
+        return '', 200
+
+    data = request.get_json(silent=True) or request.args
+    text = data.get('text')
+    if not text:
+        return jsonify({
+            "status": "error",
+            "message": "Text is required"
+        }), 400
+
+    if len(text) > MAX_TTS_STREAM_CHARS:
+        return jsonify({
+            "status": "error",
+            "message": f"Text must be at most {MAX_TTS_STREAM_CHARS} characters"
+        }), 400
+
+    voice_id = data.get('voice_id', 'JBFqnCBsd6RMkjVDRZzb')
+    model_id = data.get('model_id', 'eleven_multilingual_v2')
+    filename = registry.elabs_toolkit.audio_file_name_for(
+        text, voice_id, model_id, "mp3_44100_128", f"speech_{uuid.uuid4().hex}.mp3"
+    )
+
+    audio_stream = registry.elabs_toolkit.stream_text_to_speech(
+        text=text,
+        voice_id=voice_id,
+        model_id=model_id,
+        output_format="mp3_44100_128",
+        filename=filename
+    )
+
+    return Response(
+        stream_with_context(audio_stream),
+        mimetype="audio/mpeg",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+            "X-Audio-Url": f"/audio-files/{filename}",
+            "X-Audio-File-Name": filename,
+            "Access-Control-Expose-Headers": "X-Audio-Url, X-Audio-File-Name"
+        }
+    )
+
 @app.route('/audio-files/<filename>', methods=['GET'])
 def serve_audio_file(filename):
     """
@@ -1371,6 +3058,88 @@ def serve_audio_file(filename):
             "message": str(e)
         }), 500
 
+@app.route('/audio-files/<filename>/metadata', methods=['GET'])
+def serve_audio_record(filename):
+    """
+    Serve the stored record for a generated audio file
+    """
+    try:
+        record = registry.elabs_toolkit.read_audio_record(os.path.basename(filename))
+        if record is None:
+            return jsonify({
+                "status": "error",
+                "message": "Audio record not found"
+            }), 404
+        return jsonify({
+            "status": "success",
+            "data": record
+        })
+    except Exception as e:
+        app.logger.error(f"Error serving audio record: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 500
+
+@app.route('/audio-cache/stats', methods=['GET'])
+def audio_cache_stats():
+    """
+    Hit/miss counters and size of the content-addressed audio cache
+    """
+    try:
+        return jsonify({
+            "status": "success",
+            "data": registry.elabs_toolkit.audio_store.stats()
+        })
+    except Exception as e:
+        app.logger.error(f"Error reading audio cache stats: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 500
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """
+    Prometheus metrics, aggregated across gunicorn workers
+    """
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Poll the status and result of a background job
+    """
+    try:
+        job = job_queue.get(job_id)
+        if job is None:
+            return jsonify({
+                "status": "error",
+                "message": "Job not found"
+            }), 404
+
+        response_data = {
+            "job_id": job["job_id"],
+            "kind": job["kind"],
+            "status": job["status"],
+            "created_at": job["created_at"],
+            "updated_at": job["updated_at"]
+        }
+        if job["status"] in ("completed", "failed"):
+            response_data["result"] = job_result_payload(job)
+
+        return jsonify({
+            "status": "success",
+            "data": response_data
+        })
+    except Exception as e:
+        app.logger.error(f"Error reading job: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 500
+
 if __name__ == '__main__':
     # Enable debug mode for development
     app.debug = True
@@ -0,0 +1,94 @@
+import os
+import time
+from contextlib import contextmanager
+
+# prometheus_client is optional; without it every recording call is a no-op.
+# Under gunicorn, set PROMETHEUS_MULTIPROC_DIR (gunicorn.conf.py does) before
+# this module is imported so all workers write to shared metric files.
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+    )
+except ImportError:
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+    Counter = Histogram = None
+
+# Upstream calls range from tens of milliseconds (cache, Tavily) to minutes (team runs, long TTS)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+if Counter is not None:
+    STAGE_LATENCY = Histogram(
+        "stage_latency_seconds", "Latency of each pipeline stage", ["stage"], buckets=LATENCY_BUCKETS
+    )
+    STAGE_ERRORS = Counter(
+        "stage_errors_total", "Failed pipeline stages by error type", ["stage", "error_type"]
+    )
+    LLM_TOKENS = Counter(
+        "llm_tokens_total", "Tokens reported by OpenAI runs", ["runner", "direction"]
+    )
+    CACHE_REQUESTS = Counter(
+        "cache_requests_total", "Cache lookups by cache and result", ["cache", "result"]
+    )
+
+
+def metrics_enabled():
+    return Counter is not None
+
+
+@contextmanager
+def track(stage):
+    """
+    Time a block as one pipeline stage and count it as an error if it raises
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        record_error(stage, type(e).__name__)
+        raise
+    finally:
+        if Counter is not None:
+            STAGE_LATENCY.labels(stage).observe(time.perf_counter() - start)
+
+
+def observe_stage(stage, seconds):
+    """
+    Record a stage latency measured elsewhere (e.g. from agno run metrics)
+    """
+    if Counter is not None and seconds:
+        STAGE_LATENCY.labels(stage).observe(seconds)
+
+
+def record_error(stage, error_type):
+    if Counter is not None:
+        STAGE_ERRORS.labels(stage, error_type).inc()
+
+
+def record_tokens(runner, input_tokens, output_tokens):
+    if Counter is None:
+        return
+    if input_tokens:
+        LLM_TOKENS.labels(runner, "in").inc(input_tokens)
+    if output_tokens:
+        LLM_TOKENS.labels(runner, "out").inc(output_tokens)
+
+
+def record_cache(cache, hit):
+    if Counter is not None:
+        CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def render_metrics():
+    """
+    Return (body, content_type) in the Prometheus text format, aggregated
+    across gunicorn workers when running in multiprocess mode
+    """
+    if Counter is None:
+        return "# prometheus_client is not installed\n", CONTENT_TYPE_LATEST
+
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        from prometheus_client import REGISTRY as registry
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,176 @@
+import os
+import time
+import asyncio
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+
+class RateBudgetExceeded(Exception):
+    """
+    Raised when a reservation can't be satisfied within its wait timeout
+    """
+
+
+class Reservation:
+    def __init__(self, tokens, requests):
+        self.tokens = tokens
+        self.requests = requests
+
+
+class TokenBudget:
+    """
+    Shared tokens-per-minute / requests-per-minute token buckets for OpenAI calls.
+    Bucket state lives in SQLite and is updated under an IMMEDIATE transaction,
+    so all gunicorn workers draw from the same budget.
+    Usage:
+        budget = TokenBudget("cache/rate_budget.sqlite3", tokens_per_minute=30000, requests_per_minute=500)
+        reservation = budget.reserve(4000)      # waits until 4000 tokens are available
+        ...                                     # make the OpenAI call
+        budget.reconcile(reservation, 3120)     # refund or charge the difference
+    """
+
+    def __init__(self, path="cache/rate_budget.sqlite3", tokens_per_minute=30000, requests_per_minute=500, max_wait=30):
+        self.path = path
+        self.tokens_per_minute = tokens_per_minute
+        self.requests_per_minute = requests_per_minute
+        self.max_wait = max_wait
+        self._local_lock = threading.Lock()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS budget_buckets (
+                    name TEXT PRIMARY KEY,
+                    available REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the database write lock, serializing bucket updates across processes
+        with self._local_lock, self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _refill(self, conn, name, capacity, now):
+        row = conn.execute(
+            "SELECT available, updated_at FROM budget_buckets WHERE name = ?", (name,)
+        ).fetchone()
+        if row is None:
+            return capacity
+        available, updated_at = row
+        return min(capacity, available + (now - updated_at) * capacity / 60.0)
+
+    def _save(self, conn, name, available, now):
+        conn.execute(
+            "INSERT OR REPLACE INTO budget_buckets (name, available, updated_at) VALUES (?, ?, ?)",
+            (name, available, now),
+        )
+
+    def reserve(self, tokens, requests=1, max_wait=None):
+        """
+        Reserve tokens and requests from the shared budget, waiting for the
+        buckets to refill if needed. Raises RateBudgetExceeded if that would take
+        longer than max_wait seconds.
+        """
+        tokens, requests, max_wait, deadline = self._limits(tokens, requests, max_wait)
+        while True:
+            reservation, wait = self._try_reserve(tokens, requests, max_wait, deadline)
+            if reservation is not None:
+                return reservation
+            time.sleep(wait)
+
+    async def areserve(self, tokens, requests=1, max_wait=None):
+        """
+        reserve() for the ASGI app: the SQLite transaction runs in a worker
+        thread and the wait for a refill doesn't block the event loop
+        """
+        tokens, requests, max_wait, deadline = self._limits(tokens, requests, max_wait)
+        while True:
+            reservation, wait = await asyncio.to_thread(self._try_reserve, tokens, requests, max_wait, deadline)
+            if reservation is not None:
+                return reservation
+            await asyncio.sleep(wait)
+
+    def _limits(self, tokens, requests, max_wait):
+        # A single call can never need more than a full minute of budget
+        tokens = min(tokens, self.tokens_per_minute)
+        requests = min(requests, self.requests_per_minute)
+        max_wait = self.max_wait if max_wait is None else max_wait
+        return tokens, requests, max_wait, time.time() + max_wait
+
+    def _try_reserve(self, tokens, requests, max_wait, deadline):
+        """
+        One reservation attempt. Returns (reservation, None) on success or
+        (None, seconds to wait before retrying).
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            available_tokens = self._refill(conn, "tokens", self.tokens_per_minute, now)
+            available_requests = self._refill(conn, "requests", self.requests_per_minute, now)
+
+            if available_tokens >= tokens and available_requests >= requests:
+                self._save(conn, "tokens", available_tokens - tokens, now)
+                self._save(conn, "requests", available_requests - requests, now)
+                return Reservation(tokens, requests), None
+
+        # Time until both buckets have refilled enough for this reservation
+        wait = max(
+            (tokens - available_tokens) * 60.0 / self.tokens_per_minute,
+            (requests - available_requests) * 60.0 / self.requests_per_minute,
+            0.05
+        )
+        # Fail fast when the buckets can't refill before the deadline
+        remaining = deadline - time.time()
+        if wait > remaining:
+            raise RateBudgetExceeded(
+                f"Rate limit budget exhausted: {tokens} tokens not available within {max_wait}s"
+            )
+        return None, min(wait, 1.0)
+
+    def reconcile(self, reservation, actual_tokens):
+        """
+        Adjust the token bucket once the real usage of a reserved call is known
+        """
+        if actual_tokens is None:
+            return
+        now = time.time()
+        with self._transaction() as conn:
+            available = self._refill(conn, "tokens", self.tokens_per_minute, now)
+            self._save(conn, "tokens", min(self.tokens_per_minute, available + reservation.tokens - actual_tokens), now)
+
+    async def areconcile(self, reservation, actual_tokens):
+        await asyncio.to_thread(self.reconcile, reservation, actual_tokens)
+
+    def state(self):
+        """
+        Currently available tokens and requests
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            return {
+                "tokens_available": int(self._refill(conn, "tokens", self.tokens_per_minute, now)),
+                "requests_available": int(self._refill(conn, "requests", self.requests_per_minute, now)),
+                "tokens_per_minute": self.tokens_per_minute,
+                "requests_per_minute": self.requests_per_minute
+            }
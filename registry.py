@@ -0,0 +1,80 @@
+import threading
+
+
+class Registry:
+    """
+    Builds named components (agents, teams, API clients) on first use instead of at import.
+    Factories may look up other components; each one runs at most once per process.
+    Usage:
+        registry = Registry()
+
+        @registry.register
+        def flashcard_agent():
+            return Agent(...)
+
+        registry.flashcard_agent.run(task)  # built by the first caller, shared afterwards
+        registry.preload()                  # build everything now, e.g. before gunicorn forks
+        registry.build("flashcard_agent")    # an unshared instance, for factories taking overrides
+    """
+
+    def __init__(self):
+        self._factories = {}
+        self._instances = {}
+        # Re-entrant so a factory can build the components it depends on
+        self._lock = threading.RLock()
+
+    def register(self, factory, name=None):
+        self._factories[name or factory.__name__] = factory
+        return factory
+
+    def get(self, name):
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+
+        with self._lock:
+            instance = self._instances.get(name)
+            if instance is None:
+                if name not in self._factories:
+                    raise KeyError(f"No component named {name!r}")
+                instance = self._factories[name]()
+                self._instances[name] = instance
+            return instance
+
+    def build(self, name, **overrides):
+        """
+        Build a new instance that is not shared, passing overrides to the factory
+        """
+        if name not in self._factories:
+            raise KeyError(f"No component named {name!r}")
+        return self._factories[name](**overrides)
+
+    def name_of(self, instance):
+        """
+        Name under which a shared instance was built
+        """
+        for name, built in list(self._instances.items()):
+            if built is instance:
+                return name
+        raise KeyError(f"{instance!r} was not built by this registry")
+
+    def __getattr__(self, name):
+        if name.startswith("_") or name not in self._factories:
+            raise AttributeError(name)
+        return self.get(name)
+
+    def preload(self, names=None):
+        """
+        Build the given components, or all of them.
+        Returns {name: exception} for the ones that failed; they are retried on first use.
+        """
+        errors = {}
+        for name in names or list(self._factories):
+            try:
+                self.get(name)
+            except Exception as e:
+                errors[name] = e
+        return errors
+
+    def built(self):
+        return sorted(self._instances)
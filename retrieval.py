@@ -0,0 +1,370 @@
+import os
+import re
+import math
+import time
+import sqlite3
+import hashlib
+from contextlib import contextmanager
+
+from content_normalizer import dedupe_documents, source_marker
+from token_counter import count_tokens, split_into_token_chunks
+
+TERM = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from has have how if in into is it its of on or "
+    "so than that the their then there these they this to was were what when where which while who "
+    "why will with you your".split()
+)
+
+# BM25 parameters (the usual defaults)
+BM25_K1 = 1.5
+BM25_B = 0.75
+# Reciprocal rank fusion constant for combining BM25 and vector rankings
+RRF_K = 60
+
+
+def terms(text):
+    """
+    Lowercased index terms of text, without stopwords; a trailing plural "s" is dropped
+    """
+    result = []
+    for term in TERM.findall((text or "").lower()):
+        if term in STOPWORDS or len(term) < 2:
+            continue
+        if len(term) > 4 and term.endswith("s") and not term.endswith("ss"):
+            term = term[:-1]
+        result.append(term)
+    return result
+
+
+def chunk_documents(documents, chunk_tokens=400):
+    """
+    Split [(source, text)] into [(source, chunk_text, tokens)]: boilerplate and repeated
+    paragraphs are removed first, then paragraphs are packed into chunks of about chunk_tokens
+    """
+    chunks = []
+    for source, paragraphs in dedupe_documents(documents):
+        current, current_tokens = [], 0
+        for paragraph in paragraphs:
+            tokens = count_tokens(paragraph)
+            if tokens > chunk_tokens:
+                pieces = split_into_token_chunks(paragraph, chunk_tokens)
+            else:
+                pieces = [paragraph]
+            for piece in pieces:
+                piece_tokens = tokens if len(pieces) == 1 else count_tokens(piece)
+                if current and current_tokens + piece_tokens > chunk_tokens:
+                    chunks.append((source, "\n\n".join(current), current_tokens))
+                    current, current_tokens = [], 0
+                current.append(piece)
+                current_tokens += piece_tokens
+        if current:
+            chunks.append((source, "\n\n".join(current), current_tokens))
+    return chunks
+
+
+def format_chunks(chunks):
+    """
+    Prompt text for retrieved chunks, with a [Source: ...] marker whenever the source changes
+    """
+    sections = []
+    previous_source = None
+    for chunk in chunks:
+        if chunk["source"] != previous_source:
+            sections.append(source_marker(chunk["source"]))
+            previous_source = chunk["source"]
+        sections.append(chunk["text"])
+    return "\n\n".join(sections)
+
+
+class RetrievalIndex:
+    """
+    On-disk BM25 index over chunked document text, shared by every gunicorn worker.
+    When an embed function is given and NumPy is installed, chunk vectors are also kept
+    in a memory-mapped .npy file per index and ranked together with BM25.
+    Usage:
+        index = RetrievalIndex("cache/retrieval.sqlite3")
+        index.ensure("crawl-abc", version, lambda: [(url, text), ...])   # builds if missing or stale
+        chunks = index.search("crawl-abc", "photosynthesis light reactions", k=12, max_tokens=6000)
+        prompt_content = format_chunks(chunks)
+    """
+
+    def __init__(self, path="cache/retrieval.sqlite3", vectors_dir=None, embed=None, chunk_tokens=400):
+        self.path = path
+        self.embed = embed
+        self.chunk_tokens = chunk_tokens
+        directory = os.path.dirname(self.path)
+        self.vectors_dir = vectors_dir or os.path.join(directory, "retrieval_vectors")
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS indexes (
+                    id TEXT PRIMARY KEY,
+                    version TEXT NOT NULL,
+                    chunk_count INTEGER NOT NULL,
+                    average_length REAL NOT NULL,
+                    vectors TEXT,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS chunks (
+                    index_id TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    source TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    tokens INTEGER NOT NULL,
+                    length INTEGER NOT NULL,
+                    PRIMARY KEY (index_id, position)
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS postings (
+                    index_id TEXT NOT NULL,
+                    term TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    frequency INTEGER NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_postings_term ON postings (index_id, term)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def version(self, index_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT version FROM indexes WHERE id = ?", (index_id,)).fetchone()
+        return row[0] if row else None
+
+    def ensure(self, index_id, version, documents_fn):
+        """
+        Build the index from documents_fn() unless it already exists at this version.
+        Returns the number of chunks indexed.
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT version, chunk_count FROM indexes WHERE id = ?", (index_id,)).fetchone()
+        if row is not None and row[0] == version:
+            return row[1]
+        return self.build(index_id, version, documents_fn())
+
+    def build(self, index_id, version, documents):
+        """
+        (Re)index [(source, text)] under index_id, replacing any previous version
+        """
+        chunks = chunk_documents(documents, self.chunk_tokens)
+        rows = []
+        postings = []
+        for position, (source, text, tokens) in enumerate(chunks):
+            chunk_terms = terms(text)
+            rows.append((index_id, position, source, text, tokens, len(chunk_terms)))
+            frequencies = {}
+            for term in chunk_terms:
+                frequencies[term] = frequencies.get(term, 0) + 1
+            postings.extend((index_id, term, position, count) for term, count in frequencies.items())
+
+        average_length = sum(row[5] for row in rows) / len(rows) if rows else 0.0
+        vectors = self._write_vectors(index_id, version, [text for _, text, _ in chunks])
+
+        with self._transaction() as conn:
+            previous = conn.execute("SELECT vectors FROM indexes WHERE id = ?", (index_id,)).fetchone()
+            conn.execute("DELETE FROM chunks WHERE index_id = ?", (index_id,))
+            conn.execute("DELETE FROM postings WHERE index_id = ?", (index_id,))
+            conn.executemany(
+                "INSERT INTO chunks (index_id, position, source, text, tokens, length) VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            conn.executemany(
+                "INSERT INTO postings (index_id, term, position, frequency) VALUES (?, ?, ?, ?)", postings
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO indexes (id, version, chunk_count, average_length, vectors, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (index_id, version, len(rows), average_length, vectors, time.time()),
+            )
+
+        if previous and previous[0] and previous[0] != vectors:
+            try:
+                os.remove(previous[0])
+            except OSError:
+                pass
+        return len(rows)
+
+    def delete(self, index_id):
+        with self._transaction() as conn:
+            row = conn.execute("SELECT vectors FROM indexes WHERE id = ?", (index_id,)).fetchone()
+            conn.execute("DELETE FROM chunks WHERE index_id = ?", (index_id,))
+            conn.execute("DELETE FROM postings WHERE index_id = ?", (index_id,))
+            conn.execute("DELETE FROM indexes WHERE id = ?", (index_id,))
+        if row and row[0]:
+            try:
+                os.remove(row[0])
+            except OSError:
+                pass
+
+    def search(self, index_id, query, k=12, max_tokens=6000):
+        """
+        The most relevant chunks for query, at most k of them and max_tokens in total,
+        returned in document order as [{"position", "source", "text", "tokens", "score"}].
+        Without query terms the first chunk of each source comes first, then the second, and so on;
+        a query none of whose terms occur in the index (and without vectors) returns [].
+        """
+        with self._connect() as conn:
+            index = conn.execute(
+                "SELECT chunk_count, average_length, vectors FROM indexes WHERE id = ?", (index_id,)
+            ).fetchone()
+            if index is None or not index[0]:
+                return []
+            chunk_count, average_length, vectors = index
+
+            query_terms = sorted(set(terms(query)))
+            if query_terms:
+                ranking = self._bm25(conn, index_id, query_terms, chunk_count, average_length)
+                if vectors:
+                    ranking = self._fuse(ranking, self._vector_ranking(vectors, query))
+            else:
+                ranking = self._spread(conn, index_id)
+
+            ordered = sorted(ranking, key=lambda position: -ranking[position])
+            selected = []
+            total_tokens = 0
+            for offset in range(0, len(ordered), 500):
+                batch = ordered[offset:offset + 500]
+                placeholders = ",".join("?" * len(batch))
+                found = {
+                    row[0]: row for row in conn.execute(
+                        f"SELECT position, source, text, tokens FROM chunks WHERE index_id = ? AND position IN ({placeholders})",
+                        [index_id] + batch,
+                    ).fetchall()
+                }
+                for position in batch:
+                    row = found.get(position)
+                    if row is None or total_tokens + row[3] > max_tokens:
+                        continue
+                    selected.append({
+                        "position": row[0],
+                        "source": row[1],
+                        "text": row[2],
+                        "tokens": row[3],
+                        "score": ranking[position],
+                    })
+                    total_tokens += row[3]
+                    if len(selected) >= k:
+                        break
+                if len(selected) >= k:
+                    break
+
+        return sorted(selected, key=lambda chunk: chunk["position"])
+
+    def _bm25(self, conn, index_id, query_terms, chunk_count, average_length):
+        placeholders = ",".join("?" * len(query_terms))
+        postings = conn.execute(
+            f"SELECT p.term, p.position, p.frequency, c.length FROM postings p "
+            f"JOIN chunks c ON c.index_id = p.index_id AND c.position = p.position "
+            f"WHERE p.index_id = ? AND p.term IN ({placeholders})",
+            [index_id] + query_terms,
+        ).fetchall()
+
+        document_frequency = {}
+        for term, _, _, _ in postings:
+            document_frequency[term] = document_frequency.get(term, 0) + 1
+
+        scores = {}
+        for term, position, frequency, length in postings:
+            df = document_frequency[term]
+            idf = math.log(1 + (chunk_count - df + 0.5) / (df + 0.5))
+            norm = frequency + BM25_K1 * (1 - BM25_B + BM25_B * length / (average_length or 1))
+            scores[position] = scores.get(position, 0.0) + idf * frequency * (BM25_K1 + 1) / norm
+        return scores
+
+    def _spread(self, conn, index_id):
+        """
+        Rank chunks round-robin across sources so an unranked selection covers every page
+        """
+        rows = conn.execute(
+            "SELECT position, source FROM chunks WHERE index_id = ? ORDER BY position", (index_id,)
+        ).fetchall()
+        seen = {}
+        ranks = []
+        for position, source in rows:
+            ranks.append((seen.get(source, 0), position))
+            seen[source] = seen.get(source, 0) + 1
+        ordered = sorted(ranks)
+        return {position: float(len(ordered) - rank) for rank, (_, position) in enumerate(ordered)}
+
+    def _fuse(self, *rankings):
+        scores = {}
+        for ranking in rankings:
+            ordered = sorted(ranking, key=lambda position: -ranking[position])
+            for rank, position in enumerate(ordered):
+                scores[position] = scores.get(position, 0.0) + 1.0 / (RRF_K + rank + 1)
+        return scores
+
+    def _numpy(self):
+        # NumPy is optional; without it (or without an embed function) the index is BM25 only
+        if self.embed is None:
+            return None
+        try:
+            import numpy
+        except ImportError:
+            return None
+        return numpy
+
+    def _write_vectors(self, index_id, version, texts):
+        """
+        Embed the chunks into a memory-mapped .npy file; returns its path, or None
+        """
+        numpy = self._numpy()
+        if numpy is None or not texts:
+            return None
+
+        embeddings = numpy.asarray(self.embed(texts), dtype=numpy.float32)
+        norms = numpy.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings /= numpy.where(norms == 0, 1, norms)
+
+        os.makedirs(self.vectors_dir, exist_ok=True)
+        name = hashlib.sha256(f"{index_id}:{version}".encode("utf-8")).hexdigest()[:32]
+        path = os.path.join(self.vectors_dir, f"{name}.npy")
+        temporary = f"{path}.{os.getpid()}.tmp"
+        vectors = numpy.lib.format.open_memmap(temporary, mode="w+", dtype=numpy.float32, shape=embeddings.shape)
+        vectors[:] = embeddings
+        vectors.flush()
+        del vectors
+        # Readers only ever see a complete file
+        os.replace(temporary, path)
+        return path
+
+    def _vector_ranking(self, path, query):
+        numpy = self._numpy()
+        if numpy is None or not os.path.exists(path):
+            return {}
+
+        query_vector = numpy.asarray(self.embed([query])[0], dtype=numpy.float32)
+        query_vector /= numpy.linalg.norm(query_vector) or 1
+        vectors = numpy.load(path, mmap_mode="r")
+        similarities = vectors @ query_vector
+        return {int(position): float(similarities[position]) for position in range(len(similarities))}
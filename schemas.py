@@ -0,0 +1,64 @@
+from typing import List
+
+from pydantic import BaseModel, Field
+
+# Response models for the generator agents and teams.
+# OpenAI structured outputs enforce these schemas, so every field is required
+# and has no default.
+
+
+class Flashcard(BaseModel):
+    question: str
+    answer: str
+
+
+class FlashcardsOutput(BaseModel):
+    flashcards: List[Flashcard] = Field(..., description="5-10 flashcards covering the content")
+
+
+class SummaryOutput(BaseModel):
+    summary: str = Field(..., description="2-3 paragraph summary capturing the main points")
+
+
+class Notes(BaseModel):
+    title: str
+    key_points: List[str]
+    detailed_summary: str = Field(..., description="A few paragraphs of detailed summary")
+
+
+class NotesOutput(BaseModel):
+    notes: Notes
+
+
+class QuizQuestion(BaseModel):
+    question: str
+    options: List[str] = Field(..., description="Exactly 4 answer options")
+    correct_answer: str = Field(..., description="The correct option, copied verbatim from options")
+
+
+class Quiz(BaseModel):
+    title: str
+    description: str
+    questions: List[QuizQuestion]
+
+
+class QuizOutput(BaseModel):
+    quiz: Quiz
+
+
+class AudiobookScriptOutput(BaseModel):
+    script: str
+
+
+class Storyboard(BaseModel):
+    scene_number: int
+    image_prompt: str
+    supporting_text: str
+
+
+class StoryboardsOutput(BaseModel):
+    storyboards: List[Storyboard]
+
+
+class BrainstormOutput(BaseModel):
+    ideas: List[str]
@@ -0,0 +1,244 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import sqlite3
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+
+class SingleFlightError(Exception):
+    """
+    Raised in waiting callers when the shared computation failed in another worker
+    """
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls so only one of them does the work.
+    Threads in the same process wait on an in-memory future; other gunicorn workers
+    see a claim row in SQLite and poll it until the owner stores the result.
+    A claim whose owner died is taken over once its lease expires.
+    Results must be JSON-serializable; callers in other workers receive the
+    JSON round-tripped value (tuples come back as lists).
+    Usage:
+        flights = SingleFlight("cache/singleflight.sqlite3", lease=300)
+        payload, status_code = flights.do(key, build_quiz, url, None, 5, "medium", "pipeline")
+        payload, status_code = await flights.ado(key, abuild_quiz, url, None, 5, "medium", "pipeline")
+    """
+
+    def __init__(self, path="cache/singleflight.sqlite3", lease=300, poll_interval=0.25, result_ttl=60):
+        self.path = path
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.result_ttl = result_ttl
+        self._inflight = {}
+        # Futures of coroutine flights, used from the event loop thread only
+        self._ainflight = {}
+        self._lock = threading.Lock()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS flights (
+                    key TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    expires_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE serializes claims across processes
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def do(self, key, fn, *args, **kwargs):
+        """
+        Return fn(*args, **kwargs), sharing one execution among all concurrent callers with the same key
+        """
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+
+        if not leader:
+            return future.result()
+
+        try:
+            future.set_result(self._run_shared(key, fn, args, kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+        return future.result()
+
+    async def ado(self, key, fn, *args, **kwargs):
+        """
+        do() for a coroutine function, for callers on an event loop.
+        Waiting for the result, locally or in another worker, doesn't block the loop.
+        """
+        future = self._ainflight.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._ainflight[key] = future
+        try:
+            future.set_result(await self._arun_shared(key, fn, args, kwargs))
+        except asyncio.CancelledError:
+            # The leader's request went away; release the waiters rather than leave them hanging
+            future.set_exception(SingleFlightError("Shared computation was cancelled"))
+            raise
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            self._ainflight.pop(key, None)
+        return future.result()
+
+    async def _arun_shared(self, key, fn, args, kwargs):
+        owner = uuid.uuid4().hex
+        while True:
+            if await asyncio.to_thread(self._claim, key, owner):
+                try:
+                    result = await fn(*args, **kwargs)
+                    payload = self._serialize(result)
+                except BaseException as e:
+                    # Shielded so a request cancelled again meanwhile still releases its claim
+                    await asyncio.shield(asyncio.to_thread(
+                        self._finish, key, owner, "failed", error=str(e) or type(e).__name__
+                    ))
+                    raise
+                await asyncio.to_thread(self._finish, key, owner, "done", payload=payload)
+                return result
+
+            found, result = await self._await(key)
+            if found:
+                return result
+
+    def _run_shared(self, key, fn, args, kwargs):
+        owner = uuid.uuid4().hex
+        while True:
+            if self._claim(key, owner):
+                try:
+                    result = fn(*args, **kwargs)
+                    payload = self._serialize(result)
+                except BaseException as e:
+                    # Also on KeyboardInterrupt/SystemExit, so waiters aren't left until the lease expires
+                    self._finish(key, owner, "failed", error=str(e) or type(e).__name__)
+                    raise
+                self._finish(key, owner, "done", payload=payload)
+                return result
+
+            found, result = self._wait(key)
+            if found:
+                return result
+            # The owner's lease expired or its row was purged: try to take over
+
+    def _claim(self, key, owner):
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "DELETE FROM flights WHERE status != 'pending' AND updated_at < ?",
+                (now - self.result_ttl,),
+            )
+            row = conn.execute(
+                "SELECT status, expires_at FROM flights WHERE key = ?", (key,)
+            ).fetchone()
+            # A finished row belongs to an earlier flight; only a live pending claim blocks us
+            if row is not None and row[0] == "pending" and row[1] > now:
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO flights (key, owner, status, result, error, expires_at, updated_at) "
+                "VALUES (?, ?, 'pending', NULL, NULL, ?, ?)",
+                (key, owner, now + self.lease, now),
+            )
+            return True
+
+    def _serialize(self, result):
+        """
+        JSON payload stored for waiters; serialized before the claim is finished so a
+        result that can't be stored fails the claim instead of leaving it pending
+        """
+        return json.dumps(result) if result is not None else None
+
+    def _finish(self, key, owner, status, payload=None, error=None):
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE flights SET status = ?, result = ?, error = ?, updated_at = ? WHERE key = ? AND owner = ?",
+                (
+                    status,
+                    payload,
+                    error,
+                    time.time(),
+                    key,
+                    owner,
+                ),
+            )
+
+    def _wait(self, key):
+        """
+        Poll another worker's claim. Returns (True, result) once it finishes,
+        or (False, None) if the claim disappeared or its lease expired.
+        """
+        while True:
+            time.sleep(self.poll_interval)
+            state, result = self._poll(key)
+            if state != "pending":
+                return state == "done", result
+
+    async def _await(self, key):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            state, result = await asyncio.to_thread(self._poll, key)
+            if state != "pending":
+                return state == "done", result
+
+    def _poll(self, key):
+        """
+        Current state of a claim: ("done", result), ("pending", None), or
+        ("gone", None) if it disappeared or its lease expired
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT status, result, error, expires_at FROM flights WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return "gone", None
+
+        status, result, error, expires_at = row
+        if status == "done":
+            return "done", json.loads(result) if result is not None else None
+        if status == "failed":
+            raise SingleFlightError(error or "Shared computation failed")
+        if expires_at <= time.time():
+            return "gone", None
+        return "pending", None
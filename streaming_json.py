@@ -0,0 +1,105 @@
+import json
+
+
+class JsonArrayStream:
+    """
+    Incremental parser that pulls completed elements out of one array in a JSON
+    document while the document is still being streamed.
+    Text before the root object (such as a ```json fence) and after it is ignored.
+    Usage:
+        stream = JsonArrayStream(("quiz", "questions"))
+        for delta in deltas:
+            for question in stream.feed(delta):
+                ...  # each question dict as soon as its closing brace arrives
+    """
+
+    def __init__(self, path):
+        self.path = tuple(path)
+        self.buffer = ""
+        self._pos = 0
+        self._started = False
+        self._done = False
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        # One frame per open container: [kind, path, current_key, expecting_key]
+        self._stack = []
+        self._item_start = None
+
+    def feed(self, text):
+        """
+        Append streamed text and return the array elements completed by it
+        """
+        self.buffer += text
+        items = []
+        buffer = self.buffer
+
+        for i in range(self._pos, len(buffer)):
+            char = buffer[i]
+
+            if self._done:
+                break
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    self._end_string(i)
+                continue
+
+            if not self._started:
+                if char == "{":
+                    self._started = True
+                    self._stack.append(["object", (), None, True])
+                continue
+
+            if self._in_target() and self._item_start is None and char not in " \t\r\n,]":
+                self._item_start = i
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = i
+            elif char in "{[":
+                self._stack.append(["object" if char == "{" else "array", self._child_path(), None, char == "{"])
+            elif char in "}]":
+                if char == "]" and self._in_target():
+                    self._emit_scalar(i, items)
+                self._stack.pop()
+                if self._in_target() and self._item_start is not None:
+                    items.append(self._take(i + 1))
+                if not self._stack:
+                    self._done = True
+            elif char == ",":
+                if self._in_target():
+                    self._emit_scalar(i, items)
+                elif self._stack[-1][0] == "object":
+                    self._stack[-1][3] = True
+            elif char == ":" and self._stack[-1][0] == "object":
+                self._stack[-1][3] = False
+
+        self._pos = len(buffer)
+        return items
+
+    def _in_target(self):
+        return bool(self._stack) and self._stack[-1][0] == "array" and self._stack[-1][1] == self.path
+
+    def _child_path(self):
+        kind, path, key, _ = self._stack[-1]
+        return path + (key,) if kind == "object" else path + ("*",)
+
+    def _end_string(self, end):
+        frame = self._stack[-1] if self._stack else None
+        if frame is not None and frame[0] == "object" and frame[3]:
+            frame[2] = json.loads(self.buffer[self._string_start:end + 1])
+
+    def _emit_scalar(self, end, items):
+        if self._item_start is not None:
+            items.append(self._take(end))
+
+    def _take(self, end):
+        item = json.loads(self.buffer[self._item_start:end])
+        self._item_start = None
+        return item
@@ -1,87 +1,344 @@
 import json
+import asyncio
 import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from agno.tools import Toolkit
-from tavily import TavilyClient
+from tavily import TavilyClient, AsyncTavilyClient
+from content_cache import normalize_url, make_cache_key
+from metrics import track
+from content_normalizer import normalize_extract_response, normalize_search_response
+
+def match_extract_results(urls: list[str], response: dict):
+    """
+    Pair an extract response with the requested URLs.
+    Results carry the page's final URL, so a redirected or canonicalized page is paired with
+    the next requested URL that has no exact match (Tavily keeps the request order).
+    Returns ({normalized requested url: result}, {normalized requested url: error}).
+    """
+    requested = {normalize_url(url) for url in urls}
+    results, errors, unmatched = {}, {}, []
+    for result in response.get("results", []):
+        key = normalize_url(result.get("url") or "")
+        if key in requested and key not in results:
+            results[key] = result
+        else:
+            unmatched.append(result)
+    for failed in response.get("failed_results", []):
+        key = normalize_url(failed.get("url") or "")
+        if key in requested and key not in results:
+            errors[key] = failed.get("error") or "Extraction failed"
+
+    remaining = []
+    for url in urls:
+        key = normalize_url(url)
+        if key not in results and key not in errors and key not in remaining:
+            remaining.append(key)
+    results.update(zip(remaining, unmatched))
+    return results, errors
 
 class TavilyCrawlToolkit(Toolkit):
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, cache=None, api_base_url: str = None, max_depth: int = 1,
+                 max_breadth: int = 20, limit: int = 50, instructions: str = None):
         super().__init__(name="tavily_crawl_toolkit")
-        self.client = TavilyClient(api_key)
+        self.client = TavilyClient(api_key, api_base_url=api_base_url)
+        self.cache = cache
+        self.max_depth = max_depth
+        self.max_breadth = max_breadth
+        self.limit = limit
+        self.instructions = instructions
         self.register(self.crawl_page)
 
-    def crawl_page(self, url: str) -> str:
+    def crawl_page(self, url: str, instructions: str = None) -> str:
+        """
+        Crawl a site starting from url. instructions optionally tells the crawler which pages to focus on.
+        """
         try:
             if not url.startswith(("http://", "https://")):
                 url = "https://" + url
+            instructions = instructions or self.instructions
 
-            response = self.client.crawl(
-                url=url,
-                max_depth=1,
-                max_breadth=20,
-                limit=50,
-                instructions="Python SDK",
-                allow_external=False,
-                include_images=False,
-                extract_depth="basic",
-                format="markdown"
+            cache_key = make_cache_key(
+                "crawl", normalize_url(url), "basic", "markdown",
+                self.max_depth, self.max_breadth, self.limit, instructions or ""
             )
-            return json.dumps(response)
+            if self.cache is not None:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    return normalize_extract_response(cached) or "No content could be crawled"
+
+            with track("tavily_crawl"):
+                response = self.client.crawl(
+                    url=url,
+                    max_depth=self.max_depth,
+                    max_breadth=self.max_breadth,
+                    limit=self.limit,
+                    instructions=instructions,
+                    allow_external=False,
+                    include_images=False,
+                    extract_depth="basic",
+                    format="markdown"
+                )
+            if self.cache is not None:
+                self.cache.set(cache_key, response)
+            return normalize_extract_response(response) or "No content could be crawled"
         except Exception as e:
             raise Exception(f"Tavily crawl failed: {str(e)}")
 
 class TavilyExtractToolkit(Toolkit):
-    def __init__(self, api_key: str):
+    # Tavily's extract endpoint accepts at most 20 URLs per request
+    MAX_URLS_PER_REQUEST = 20
+
+    def __init__(self, api_key: str, cache=None, extract_depth: str = "basic", format: str = "markdown",
+                 api_base_url: str = None):
         super().__init__(name="tavily_extract_toolkit")
-        self.client = TavilyClient(api_key)
+        self.client = TavilyClient(api_key, api_base_url=api_base_url)
+        self.api_key = api_key
+        self.api_base_url = api_base_url
+        self._async_client = None
+        self.cache = cache
+        self.extract_depth = extract_depth
+        self.format = format
         self.register(self.extract_data)
 
     def extract_data(self, urls: list[str]) -> str:
         try:
-            processed_urls = [
-                url if url.startswith(("http://", "https://")) else "https://" + url
-                for url in urls
-            ]
-
-            response = self.client.extract(
-                urls=processed_urls,
-                include_images=False,
-                extract_depth="basic",
-                format="markdown"
-            )
-            return json.dumps(response)
+            return normalize_extract_response(self.extract_results(urls)) or "No content could be extracted"
         except Exception as e:
             raise Exception(f"Tavily extract failed: {str(e)}")
 
+    def extract_results(self, urls: list[str]) -> dict:
+        """
+        Extract the given URLs, serving per-URL results from the cache when possible.
+        Returns the Tavily response shape: {"results": [...], "failed_results": [...]}
+        """
+        processed_urls, cached_results, missing_urls = self._lookup(urls)
+        response = {"results": [], "failed_results": []}
+        if missing_urls:
+            with track("tavily_extract"):
+                response = self.client.extract(**self._extract_params(missing_urls))
+        return self._merge(processed_urls, cached_results, response)
+
+    async def aextract_results(self, urls: list[str]) -> dict:
+        """
+        extract_results() over the async Tavily client, for the ASGI app
+        """
+        processed_urls, cached_results, missing_urls = await asyncio.to_thread(self._lookup, urls)
+        response = {"results": [], "failed_results": []}
+        if missing_urls:
+            with track("tavily_extract"):
+                response = await self.async_client.extract(**self._extract_params(missing_urls))
+        return await asyncio.to_thread(self._merge, processed_urls, cached_results, response)
+
+    def extract_batch(self, urls: list[str], max_workers: int = 4, fresh: bool = False) -> list[dict]:
+        """
+        Extract a reading list in grouped requests of up to MAX_URLS_PER_REQUEST URLs,
+        run concurrently, caching every page that comes back. fresh skips the cache lookup.
+        Returns one entry per distinct URL, in request order:
+        {"url", "status": "cached" | "extracted" | "failed", "result" or "error"}
+        """
+        processed_urls = []
+        seen = set()
+        for url in urls:
+            url = url if url.startswith(("http://", "https://")) else "https://" + url
+            if normalize_url(url) not in seen:
+                seen.add(normalize_url(url))
+                processed_urls.append(url)
+
+        outcomes = {}
+        for group_outcomes in self.iter_extract_groups(processed_urls, max_workers=max_workers, fresh=fresh):
+            outcomes.update(group_outcomes)
+
+        entries = []
+        for url in processed_urls:
+            outcome = outcomes.get(normalize_url(url), {"status": "failed", "error": "No content returned"})
+            entry = {"url": url, "status": outcome["status"]}
+            if "result" in outcome:
+                entry["result"] = outcome["result"]
+            else:
+                entry["error"] = outcome["error"]
+            entries.append(entry)
+        return entries
+
+    def iter_extract_groups(self, urls: list[str], max_workers: int = 4, fresh: bool = False):
+        """
+        Yield {normalized url: outcome} as results become available: cached pages first,
+        then each extract call's pages as soon as that call returns.
+        An outcome is {"status": "cached" | "extracted", "result": ...} or {"status": "failed", "error": ...}
+        """
+        if fresh:
+            missing_urls = list(urls)
+        else:
+            _, cached_results, missing_urls = self._lookup(urls)
+            if cached_results:
+                yield {key: {"status": "cached", "result": result} for key, result in cached_results.items()}
+
+        groups = [
+            missing_urls[i:i + self.MAX_URLS_PER_REQUEST]
+            for i in range(0, len(missing_urls), self.MAX_URLS_PER_REQUEST)
+        ]
+        if not groups:
+            return
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(groups))) as executor:
+            futures = [executor.submit(self._extract_group, group) for group in groups]
+            for future in as_completed(futures):
+                yield future.result()
+
+    def _extract_group(self, urls: list[str]) -> dict:
+        """
+        One multi-URL extract call. Returns {normalized url: outcome} for every requested URL
+        """
+        try:
+            with track("tavily_extract"):
+                response = self.client.extract(**self._extract_params(urls))
+        except Exception as e:
+            return {
+                normalize_url(url): {"status": "failed", "error": f"Tavily extract failed: {str(e)}"}
+                for url in urls
+            }
+
+        results, errors = match_extract_results(urls, response)
+        self._cache_results(urls, results)
+        outcomes = {}
+        for url in urls:
+            key = normalize_url(url)
+            if key in results:
+                outcomes[key] = {"status": "extracted", "result": results[key]}
+            else:
+                outcomes[key] = {"status": "failed", "error": errors.get(key, "No content returned")}
+        return outcomes
+
+    @property
+    def async_client(self):
+        # Created on first use so sync workers never open an async connection pool
+        if self._async_client is None:
+            self._async_client = AsyncTavilyClient(self.api_key, api_base_url=self.api_base_url)
+        return self._async_client
+
+    def _extract_params(self, urls: list[str]) -> dict:
+        return {
+            "urls": urls,
+            "include_images": False,
+            "extract_depth": self.extract_depth,
+            "format": self.format
+        }
+
+    def _lookup(self, urls: list[str]):
+        """
+        Normalize the URLs and split them into cached results and URLs still to extract
+        """
+        processed_urls = [
+            url if url.startswith(("http://", "https://")) else "https://" + url
+            for url in urls
+        ]
+
+        cached_results = {}
+        missing_urls = []
+        for url in processed_urls:
+            cached = self.cache.get(self._cache_key(url)) if self.cache is not None else None
+            if cached is not None:
+                cached_results[normalize_url(url)] = cached
+            else:
+                missing_urls.append(url)
+        return processed_urls, cached_results, missing_urls
+
+    def _merge(self, processed_urls, cached_results, response):
+        """
+        Cache the fresh results and combine them with the cached ones
+        """
+        missing_urls = [url for url in processed_urls if normalize_url(url) not in cached_results]
+        fresh_results, _ = match_extract_results(missing_urls, response)
+        self._cache_results(missing_urls, fresh_results)
+
+        # Keep results in the order the URLs were requested
+        results = []
+        for key in dict.fromkeys(normalize_url(url) for url in processed_urls):
+            result = cached_results.get(key) or fresh_results.get(key)
+            if result is not None:
+                results.append(result)
+
+        response["results"] = results
+        response.setdefault("failed_results", [])
+        return response
+
+    def _cache_results(self, urls: list[str], results: dict):
+        """
+        Cache each result under the URL it was requested as, and under its final URL if that differs
+        """
+        if self.cache is None:
+            return
+        for url in urls:
+            result = results.get(normalize_url(url))
+            if result is None:
+                continue
+            self.cache.set(self._cache_key(url), result)
+            if result.get("url") and normalize_url(result["url"]) != normalize_url(url):
+                self.cache.set(self._cache_key(result["url"]), result)
+
+    def _cache_key(self, url: str) -> str:
+        return make_cache_key("extract", normalize_url(url), self.extract_depth, self.format)
+
 class TavilySearchToolkit(Toolkit):
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, api_base_url: str = None):
         super().__init__(name="tavily_search_toolkit")
-        self.client = TavilyClient(api_key)
+        self.client = TavilyClient(api_key, api_base_url=api_base_url)
+        self.api_key = api_key
+        self.api_base_url = api_base_url
+        self._async_client = None
         self.register(self.search_query)
 
     def search_query(self, query: str) -> str:
+        return normalize_search_response(self.search_results(query)) or "No results found"
+
+    def search_results(self, query: str) -> dict:
+        """
+        The full Tavily search response for a query
+        """
         try:
             if not query or not query.strip():
                 raise ValueError("Search query cannot be empty")
 
-            response = self.client.search(
-                query=query.strip(),
-                search_depth="basic",
-                chunks_per_source=3,
-                max_results=1,
-                include_answer=True,
-                include_raw_content=True,
-                include_images=False,
-                include_image_descriptions=False
-            )
-            return json.dumps(response)
+            with track("tavily_search"):
+                return self.client.search(**self._search_params(query))
+        except Exception as e:
+            raise Exception(f"Tavily search failed: {str(e)}")
+
+    async def asearch_results(self, query: str) -> dict:
+        """
+        search_results() over the async Tavily client, for the ASGI app
+        """
+        try:
+            if not query or not query.strip():
+                raise ValueError("Search query cannot be empty")
+
+            with track("tavily_search"):
+                return await self.async_client.search(**self._search_params(query))
         except Exception as e:
             raise Exception(f"Tavily search failed: {str(e)}")
 
+    @property
+    def async_client(self):
+        # Created on first use so sync workers never open an async connection pool
+        if self._async_client is None:
+            self._async_client = AsyncTavilyClient(self.api_key, api_base_url=self.api_base_url)
+        return self._async_client
+
+    def _search_params(self, query: str) -> dict:
+        return {
+            "query": query.strip(),
+            "search_depth": "basic",
+            "chunks_per_source": 3,
+            "max_results": 1,
+            "include_answer": True,
+            "include_raw_content": True,
+            "include_images": False,
+            "include_image_descriptions": False
+        }
+
 class TavilyMapToolkit(Toolkit):
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, api_base_url: str = None):
         super().__init__(name="tavily_map_toolkit")
         self.api_key = api_key
-        self.base_url = "https://api.tavily.com/map"
+        self.base_url = f"{api_base_url or 'https://api.tavily.com'}/map"
         self.register(self.map_site)
 
     def map_site(self,
@@ -90,23 +347,47 @@ class TavilyMapToolkit(Toolkit):
         """
         Performs a site map using the Tavily API.
         """
-        try:
-            if not url.startswith(("http://", "https://")):
-                url = "https://" + url
+        if not url.startswith(("http://", "https://")):
+            url = "https://" + url
+        return self._post({"url": url, "max_depth": max_depth}).text
 
-            payload = {
-                "url": url,
-                "max_depth": max_depth,
-            }
+    def map_urls(self, url: str, max_depth: int = 1, max_breadth: int = 20, limit: int = 50,
+                 instructions: str = None, select_paths: list[str] = None,
+                 exclude_paths: list[str] = None) -> list[str]:
+        """
+        Map a site and return the discovered URLs (same site only)
+        """
+        if not url.startswith(("http://", "https://")):
+            url = "https://" + url
+
+        payload = {
+            "url": url,
+            "max_depth": max_depth,
+            "max_breadth": max_breadth,
+            "limit": limit,
+            "allow_external": False,
+        }
+        if instructions:
+            payload["instructions"] = instructions
+        if select_paths:
+            payload["select_paths"] = select_paths
+        if exclude_paths:
+            payload["exclude_paths"] = exclude_paths
 
+        results = self._post(payload).json().get("results", [])
+        return [result if isinstance(result, str) else result.get("url", "") for result in results]
+
+    def _post(self, payload: dict):
+        try:
             headers = {
                 "Authorization": f"Bearer {self.api_key}",
                 "Content-Type": "application/json"
             }
 
-            response = requests.post(self.base_url, json=payload, headers=headers)
-            response.raise_for_status()
-            return response.text
+            with track("tavily_map"):
+                response = requests.post(self.base_url, json=payload, headers=headers)
+                response.raise_for_status()
+            return response
 
         except requests.exceptions.HTTPError as e:
             # This will catch 4xx and 5xx errors and provide a more detailed message
@@ -0,0 +1,131 @@
+from functools import lru_cache
+
+# Model whose BPE encoding is used for counting (o200k_base for gpt-4o)
+TOKENIZER_MODEL = "gpt-4o"
+
+# Strings up to this length are memoized; topics, prompts and URLs repeat a lot
+SHORT_TEXT_CHARS = 256
+
+
+@lru_cache(maxsize=None)
+def get_encoding():
+    """
+    Load the tiktoken encoding on first use.
+    Returns None when tiktoken is not installed or its BPE file can't be loaded
+    (it is downloaded on first use), in which case counts fall back to the
+    4-characters-per-token estimate.
+    """
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+
+    try:
+        try:
+            return tiktoken.encoding_for_model(TOKENIZER_MODEL)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
+
+
+@lru_cache(maxsize=4096)
+def _count_short(text):
+    return len(get_encoding().encode_ordinary(text))
+
+
+def count_tokens(text):
+    """
+    Count the tokens text encodes to for gpt-4o
+    """
+    if not text:
+        return 0
+
+    encoding = get_encoding()
+    if encoding is None:
+        return len(text) // 4
+
+    if len(text) <= SHORT_TEXT_CHARS:
+        return _count_short(text)
+    return len(encoding.encode_ordinary(text))
+
+
+def within_token_limit(text, max_tokens):
+    """
+    Return (is_within_limit, token_count) for text.
+    Every token covers at least one UTF-8 byte, so text with no more bytes than
+    max_tokens is accepted without running the tokenizer; the byte length is then
+    returned as an upper bound on the token count.
+    """
+    if not text:
+        return True, 0
+
+    if get_encoding() is not None and len(text) <= max_tokens:
+        byte_length = len(text.encode("utf-8"))
+        if byte_length <= max_tokens:
+            return True, byte_length
+
+    token_count = count_tokens(text)
+    return token_count <= max_tokens, token_count
+
+
+def truncate_to_tokens(text, max_tokens):
+    """
+    Cut text to at most max_tokens tokens at an exact token boundary
+    """
+    if not text:
+        return text
+
+    encoding = get_encoding()
+    if encoding is None:
+        return text[:max_tokens * 4]
+
+    tokens = encoding.encode_ordinary(text)
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+
+def _split_long_text(text, max_tokens):
+    encoding = get_encoding()
+    if encoding is None:
+        step = max_tokens * 4
+        return [text[i:i + step] for i in range(0, len(text), step)]
+
+    tokens = encoding.encode_ordinary(text)
+    return [encoding.decode(tokens[i:i + max_tokens]) for i in range(0, len(tokens), max_tokens)]
+
+
+def split_into_token_chunks(text, max_tokens):
+    """
+    Split text into pieces of at most max_tokens tokens.
+    Paragraphs are kept together where possible; a paragraph longer than
+    max_tokens is cut at token boundaries.
+    """
+    if not text:
+        return []
+
+    chunks = []
+    current = []
+    current_tokens = 0
+    for paragraph in text.split("\n\n"):
+        if not paragraph.strip():
+            continue
+        paragraph_tokens = count_tokens(paragraph)
+
+        if paragraph_tokens > max_tokens:
+            if current:
+                chunks.append("\n\n".join(current))
+                current, current_tokens = [], 0
+            chunks.extend(_split_long_text(paragraph, max_tokens))
+            continue
+
+        if current and current_tokens + paragraph_tokens > max_tokens:
+            chunks.append("\n\n".join(current))
+            current, current_tokens = [], 0
+        current.append(paragraph)
+        current_tokens += paragraph_tokens
+
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks